@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Traitement par lots sans interface graphique
+Vidéos → panoramas → tableau final pour tous les dossiers semaine d'une racine
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import as_completed, wait
+from datetime import datetime
+from pathlib import Path
+
+from config import config
+from build_manifest import BuildManifest
+from panorama_runner import (
+    VIDEO_EXTENSIONS, detect_day_from_filename, estimate_job_cost, estimate_job_memory_mb,
+    probe_video, run_panorama, split_parts_for, stitch_parameters, video_fingerprint
+)
+from eta import EtaEstimator, format_duration
+from job_scheduler import JobScheduler, detect_memory_budget_mb
+from run_history import RunHistory
+from run_metrics import RunMetrics
+from table_generator import TableGenerator
+
+
+def log(message):
+    """Affiche un message horodaté (une seule écriture: lignes non entremêlées entre threads)"""
+    sys.stdout.write(f"[{time.strftime('%H:%M:%S')}] {message}\n")
+    sys.stdout.flush()
+
+
+def find_week_folders(root):
+    """
+    Dossiers semaine ('sXwY dd-mm dd-mm') d'une racine.
+    Si la racine est elle-même un dossier semaine, elle est seule retournée.
+    """
+    return TableGenerator.find_week_folders(root)
+
+
+def find_day_videos(folder):
+    """
+    Vidéos d'un dossier semaine, avec les mêmes règles que l'interface.
+    
+    Returns:
+        Dict {jour: chemin de la vidéo}
+    """
+    videos = {}
+    for path in sorted(folder.iterdir()):
+        if not path.is_file() or path.suffix.lower() not in VIDEO_EXTENSIONS:
+            continue
+        
+        day = detect_day_from_filename(path.stem, config.days)
+        if day is None:
+            log(f"⚠️ Jour non reconnu, ignoré: {path.name}")
+            continue
+        if day in videos:
+            log(f"⚠️ Plusieurs vidéos pour {day}, ignoré: {path.name}")
+            continue
+        
+        videos[day] = path
+    return videos
+
+
+def process_video(folder, day, video_path, params, manifest, force=False, parts=1, eta=None,
+                  cancel_event=None, profile=False):
+    """
+    Traite une vidéo (sauf si déjà à jour), découpée en `parts` morceaux
+    assemblés en parallèle si parts > 1. La progression alimente `eta`.
+    Avec `profile`, la trace des étapes est écrite dans <jour>.trace.json.
+    
+    Returns:
+        Dict décrivant le résultat (entrée du rapport)
+    """
+    output_path = folder / f"{day}.png"
+    entry = {
+        'day': day,
+        'video': video_path.name,
+        'output': output_path.name,
+        'status': None,
+        'elapsed': 0.0,
+        'error': None,
+    }
+    
+    name = f"{folder.name}/{day}"
+    key = f"day:{day}"
+    current = video_fingerprint(video_path, params)
+    if not force and manifest.is_up_to_date(key, current, output_path, inputs=[video_path]):
+        entry['status'] = 'skipped'
+        log(f"⏭️ {name}: À jour")
+        if eta:
+            eta.finish(name)
+        return entry
+    
+    log(f"🎬 Début: {name}")
+    if profile:
+        params = dict(params, PANORAMA_TRACE=str(folder / f"{day}.trace.json"))
+    start_time = time.time()
+    on_progress = None
+    if eta:
+        eta.start(name)
+        on_progress = lambda current, total: eta.update(name, current, total)
+    
+    success, stats, error = run_panorama(
+        video_path, output_path, params, on_progress, parts, cancel_event
+    )
+    entry['elapsed'] = round(time.time() - start_time, 2)
+    if eta:
+        eta.finish(name, success)
+    entry['stats'] = stats
+    
+    if success:
+        manifest.record(key, current, output_path)
+        entry['status'] = 'done'
+        log(f"✅ {name}: Terminé ({entry['elapsed']:.1f}s)")
+    else:
+        entry['status'] = 'cancelled' if cancel_event is not None and cancel_event.is_set() else 'failed'
+        entry['error'] = error
+        log(f"❌ {name}: {error}")
+    
+    return entry
+
+
+def run_batch(root, params, workers, force=False, tables=True, split=1, profile=False,
+              metrics_folder=None):
+    """
+    Traite tous les dossiers semaine d'une racine.
+    
+    Returns:
+        Dict du rapport d'exécution
+    """
+    started = datetime.now()
+    start_time = time.time()
+    metrics = RunMetrics('batch')
+    weeks = find_week_folders(root)
+    
+    report = {
+        'root': str(Path(root).resolve()),
+        'started': started.isoformat(timespec='seconds'),
+        'workers': workers,
+        'split': split,
+        'params': params,
+        'weeks': [],
+    }
+    
+    week_reports = {}
+    jobs = []
+    for folder in weeks:
+        manifest = BuildManifest(folder)
+        videos = find_day_videos(folder)
+        week_reports[folder] = {'folder': folder.name, 'videos': [], 'table': None}
+        for day, video_path in videos.items():
+            jobs.append((folder, day, video_path, manifest))
+    
+    log(f"📊 {len(weeks)} semaine(s), {len(jobs)} vidéo(s), {workers} worker(s)")
+    log(f"💾 Budget mémoire: {detect_memory_budget_mb()} Mo")
+    
+    # Assemblage des panoramas: une seule file pour toutes les semaines,
+    # les vidéos les plus longues d'abord pour raccourcir la fin du traitement
+    scheduler = JobScheduler(max_workers=workers)
+    history = RunHistory()
+    eta = EtaEstimator(scheduler.capacity, history)
+    cancel_event = threading.Event()
+    futures = {}
+    for folder, day, video_path, manifest in jobs:
+        name = f"{folder.name}/{day}"
+        info = probe_video(video_path)
+        parts = split_parts_for(video_path, split, info)
+        eta.add_job(name, info['frames'], parts)
+        future = scheduler.submit(
+            process_video, folder, day, video_path, params, manifest, force, parts, eta,
+            cancel_event, profile,
+            cost=estimate_job_cost(video_path),
+            memory_mb=estimate_job_memory_mb(video_path, history, info, parts),
+            name=name, slots=parts
+        )
+        futures[future] = folder
+    
+    if jobs:
+        log(f"⏱️ Temps estimé: {format_duration(eta.remaining_seconds())}")
+    
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            week_reports[futures[future]]['videos'].append(future.result())
+            if done < len(futures):
+                log(f"⏱️ {done}/{len(futures)} | ETA: {format_duration(eta.remaining_seconds())}")
+    except KeyboardInterrupt:
+        # Vidéos en file abandonnées, assemblages en cours tués
+        log("⛔ Annulation: arrêt des assemblages en cours...")
+        cancel_event.set()
+        scheduler.shutdown(cancel_pending=True)
+        wait(futures, timeout=30)
+        raise
+    scheduler.shutdown()
+    
+    # Tableaux finaux (reconstruits seulement si une entrée a changé)
+    for folder in weeks:
+        week = week_reports[folder]
+        week['videos'].sort(key=lambda entry: config.all_days.index(entry['day']))
+        
+        if tables:
+            success, output_path, error = TableGenerator.generate_from_folder(folder, force=force)
+            week['table'] = {
+                'status': 'done' if success else 'failed',
+                'output': output_path.name if output_path else None,
+                'error': error,
+            }
+            if success:
+                log(f"🎨 Tableau: {output_path.name}")
+            else:
+                log(f"❌ Tableau {folder.name}: {error}")
+        
+        report['weeks'].append(week)
+    
+    # Métriques par vidéo (JSON/CSV, Prometheus si configuré)
+    for week in report['weeks']:
+        for entry in week['videos']:
+            metrics.add_video(
+                week['folder'], entry['day'], entry['status'], entry['elapsed'],
+                entry.get('stats'), entry['error']
+            )
+    metrics_path = metrics.write(metrics_folder)
+    report['metrics'] = str(metrics_path) if metrics_path else None
+    
+    statuses = [entry['status'] for week in report['weeks'] for entry in week['videos']]
+    report['finished'] = datetime.now().isoformat(timespec='seconds')
+    report['elapsed'] = round(time.time() - start_time, 2)
+    report['summary'] = {
+        'videos': len(statuses),
+        'done': statuses.count('done'),
+        'skipped': statuses.count('skipped'),
+        'failed': statuses.count('failed'),
+        'tables_failed': sum(
+            1 for week in report['weeks'] if week['table'] and week['table']['status'] == 'failed'
+        ),
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Traite tous les dossiers semaine ('sXwY dd-mm dd-mm') sans interface"
+    )
+    parser.add_argument('root', help="Dossier racine contenant les dossiers semaine")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Nombre de vidéos traitées en parallèle (défaut: nombre de cœurs)")
+    parser.add_argument('--template-height', type=int, default=config.template_height)
+    parser.add_argument('--quality', type=float, default=config.quality_threshold)
+    parser.add_argument('--roi-auto', action='store_true', default=config.roi_auto,
+                        help="Détecter automatiquement les bandes fixes")
+    parser.add_argument('--split', type=int, default=config.split_parts,
+                        help="Découper les longues vidéos en N morceaux assemblés en parallèle")
+    parser.add_argument('--force', action='store_true',
+                        help="Retraiter même les jours et tableaux à jour")
+    parser.add_argument('--no-tables', action='store_true',
+                        help="Ne pas générer les tableaux finaux")
+    parser.add_argument('--profile', action='store_true',
+                        help="Écrire la trace des étapes d'assemblage (<jour>.trace.json)")
+    parser.add_argument('--metrics-dir',
+                        help="Dossier des métriques JSON/CSV (défaut: ~/.lastwar_metrics)")
+    parser.add_argument('--report', help="Fichier JSON du rapport (défaut: dans la racine)")
+    args = parser.parse_args()
+    
+    root = Path(args.root)
+    if not root.is_dir():
+        print(f"Error: {root} is not a valid directory")
+        sys.exit(1)
+    
+    params = stitch_parameters(
+        template_height=args.template_height,
+        quality_threshold=args.quality,
+        roi_auto=args.roi_auto,
+    )
+    
+    try:
+        report = run_batch(
+            root, params, max(1, args.workers),
+            force=args.force, tables=not args.no_tables, split=max(1, args.split),
+            profile=args.profile, metrics_folder=args.metrics_dir
+        )
+    except KeyboardInterrupt:
+        log("⛔ Traitement annulé")
+        sys.exit(130)
+    
+    report_path = Path(args.report) if args.report else (
+        root / f"batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    summary = report['summary']
+    log(f"🏁 {summary['done']} traitée(s), {summary['skipped']} à jour, "
+        f"{summary['failed']} échec(s) en {report['elapsed']:.1f}s")
+    log(f"📄 Rapport: {report_path}")
+    if report['metrics']:
+        log(f"📈 Métriques: {report['metrics']}")
+    
+    if summary['failed'] or summary['tables_failed']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Manifeste de construction d'un dossier semaine
+Mémorise l'empreinte (métadonnées des entrées + paramètres) de chaque sortie
+pour ne reconstruire que ce qui a changé
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+
+def input_metadata(path):
+    """Métadonnées d'un fichier d'entrée (nom, date de modification, taille)"""
+    path = Path(path)
+    stat = path.stat()
+    return {'name': path.name, 'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+def fingerprint(data):
+    """Empreinte SHA-1 d'une structure sérialisable en JSON"""
+    payload = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()
+
+
+class BuildManifest:
+    """Empreintes des sorties d'un dossier semaine (thread-safe)"""
+    
+    FILENAME = '.lastwar_manifest.json'
+    
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.path = self.folder / self.FILENAME
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Une écriture du fichier à la fois
+        self.entries = {}
+        self.load()
+    
+    def load(self):
+        """Charge le manifeste (vide s'il est absent ou illisible)"""
+        if not self.path.exists():
+            return False
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('entries', {})
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Manifeste ignoré ({self.path.name}): {e}")
+            self.entries = {}
+            return False
+    
+    def save(self):
+        """Écrit le manifeste de façon atomique"""
+        # Copie prise sous le verrou d'écriture: la dernière écriture contient
+        # toujours les dernières entrées enregistrées
+        with self._write_lock:
+            with self._lock:
+                data = {'entries': dict(self.entries)}
+            
+            tmp_path = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                return True
+            except OSError as e:
+                print(f"Erreur sauvegarde manifeste: {e}")
+                tmp_path.unlink(missing_ok=True)
+                return False
+    
+    def is_up_to_date(self, key, current_fingerprint, output_path, inputs=()):
+        """
+        Vérifie qu'une sortie est à jour.
+        
+        Args:
+            key: Identifiant de la sortie (ex: 'day:lundi')
+            current_fingerprint: Empreinte actuelle des entrées et paramètres
+            output_path: Fichier produit
+            inputs: Fichiers d'entrée dont la sortie doit être plus récente
+        """
+        output_path = Path(output_path)
+        if not output_path.exists():
+            return False
+        
+        with self._lock:
+            entry = self.entries.get(key)
+        if not entry or entry.get('fingerprint') != current_fingerprint:
+            return False
+        
+        output_mtime = output_path.stat().st_mtime
+        return all(Path(p).stat().st_mtime <= output_mtime for p in inputs if Path(p).exists())
+    
+    def record(self, key, current_fingerprint, output_path, save=True):
+        """Enregistre l'empreinte d'une sortie qui vient d'être construite"""
+        with self._lock:
+            self.entries[key] = {
+                'fingerprint': current_fingerprint,
+                'output': Path(output_path).name,
+            }
+        if save:
+            self.save()
+    
+    def invalidate(self, key, save=True):
+        """Oublie une sortie (elle sera reconstruite)"""
+        with self._lock:
+            removed = self.entries.pop(key, None) is not None
+        if removed and save:
+            self.save()
+        return removed
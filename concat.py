@@ -2,30 +2,79 @@
 """
 Script de concaténation des panoramas
 Version simplifiée utilisant TableGenerator
+
+Usage:
+    python concat.py [--force] <dossier_semaine>
+    python concat.py --season [--force] [--workers N] [--overview] [--overview-path IMAGE] <dossier_saison>
 """
 
+import argparse
 import os
 import sys
+import time
 from pathlib import Path
 
 from table_generator import TableGenerator
 
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python concat.py <folder_path>")
+def run_season(root, workers, force, overview, overview_path=None):
+    """Tous les dossiers semaine d'une saison, en parallèle"""
+    weeks = TableGenerator.find_week_folders(root)
+    print(f"Season: {root} ({len(weeks)} week folders, {workers} workers)")
+    start = time.time()
+    
+    def on_week(result):
+        if result['success']:
+            print(f"✅ {result['folder']}: {Path(result['output']).name}")
+        else:
+            print(f"❌ {result['folder']}: {result['error']}")
+    
+    if overview_path is not None:
+        overview_path = Path(overview_path)
+    elif overview:
+        overview_path = Path(root) / f"{Path(root).resolve().name}_overview.png"
+    
+    success, results, error = TableGenerator.generate_season(
+        root, workers=workers, force=force, overview_path=overview_path, on_week=on_week
+    )
+    
+    done = sum(1 for result in results if result['success'])
+    print(f"{done}/{len(results)} week tables in {time.time() - start:.1f} seconds")
+    if overview_path and overview_path.exists():
+        print(f"Overview: {overview_path}")
+    if not success:
+        print(f"❌ Error: {error}")
         sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tableau final d'un dossier semaine (ou d'une saison)")
+    parser.add_argument('folder_path', help="Dossier semaine, ou dossier saison avec --season")
+    parser.add_argument('--force', action='store_true', help="Regénérer même les tableaux à jour")
+    parser.add_argument('--season', action='store_true',
+                        help="Tous les dossiers semaine du dossier, en parallèle")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processus simultanés en mode saison (défaut: nombre de cœurs)")
+    parser.add_argument('--overview', action='store_true',
+                        help="Vue d'ensemble de la saison (<saison>_overview.png)")
+    parser.add_argument('--overview-path', metavar='IMAGE',
+                        help="Vue d'ensemble de la saison dans ce fichier (implique --overview)")
+    args = parser.parse_args()
     
-    folder_path = sys.argv[1]
+    folder_path = args.folder_path
     
     if not os.path.isdir(folder_path):
         print(f"Error: {folder_path} is not a valid directory")
         sys.exit(1)
     
+    if args.season:
+        run_season(folder_path, args.workers, args.force, args.overview, args.overview_path)
+        return
+    
     print(f"Processing folder: {folder_path}")
     
     # Utiliser TableGenerator
-    success, output_path, error = TableGenerator.generate_from_folder(folder_path)
+    success, output_path, error = TableGenerator.generate_from_folder(folder_path, force=args.force)
     
     if success:
         print(f"✅ Success! Saved to: {output_path}")
@@ -20,12 +20,27 @@ class Config:
     default_fps: int = 30
     min_fps: int = 10
     max_fps: int = 60
+    capture_skip_duplicates: bool = True
+    capture_change_threshold: float = 0.5  # Différence moyenne (niveaux de gris) sur la miniature
+    capture_thumbnail_width: int = 64
     
     # Traitement parallèle
     max_workers: int = 3
     min_workers: int = 1
     max_workers_limit: int = 6
-    process_timeout: int = 300  # 5 minutes
+    process_timeout: int = 300  # Assemblage arrêté après 5 minutes sans progression
+    memory_budget_mb: int = 0  # Mémoire totale des assemblages simultanés (0 = moitié de la RAM)
+    job_memory_mb: int = 1024  # Estimation par défaut de la mémoire d'un assemblage
+    max_head_bypass: int = 2  # Tâches plus petites démarrées avant la plus longue bloquée, au plus
+    base_job_memory_mb: int = 200  # Coût fixe d'un processus panorama.py
+    default_scroll_rate: float = 8.0  # Lignes de panorama par frame (sans historique)
+    split_parts: int = 1  # Morceaux assemblés en parallèle pour une longue vidéo (1 = désactivé)
+    split_min_frames: int = 600  # Frames minimales par morceau
+    split_overlap_frames: int = 15  # Frames communes à deux morceaux consécutifs
+    
+    # Métriques des traitements
+    metrics_dir: str = ""  # Vide = ~/.lastwar_metrics
+    metrics_prometheus_file: str = ""  # Fichier texte Prometheus (vide = désactivé)
     
     # Panorama
     template_height: int = 100
@@ -37,6 +52,24 @@ class Config:
     min_scroll: int = 5
     duplicate_threshold: int = 5
     
+    # Zone d'intérêt (bandes fixes exclues du matching)
+    roi_top: int = 0
+    roi_bottom: int = 0
+    roi_auto: bool = False
+    roi_samples: int = 30
+    static_band_variance: float = 2.0
+    
+    # Encodage des images (PNG par bandes parallèles)
+    png_compression: int = 1  # 0 (aucune) à 9 (maximale)
+    png_filter: str = 'sub'  # none, sub ou up
+    png_threads: int = 0  # Threads d'encodage (0 = nombre de cœurs)
+    png_strip_rows: int = 512  # Lignes par bande encodée
+    
+    # Stockage par bandes (<jour>.strips, accès aléatoire aux lignes)
+    strip_store: bool = False  # Écrire aussi le stockage par bandes des panoramas
+    strip_rows: int = 256  # Lignes par bande stockée
+    strip_compression: int = 1  # Niveau zlib des bandes (0 à 9)
+    
     # Interface
     window_width: int = 1200
     window_height: int = 800
@@ -45,11 +78,28 @@ class Config:
     zoom_default: int = 100
     zoom_step: int = 10
     
+    # Aperçus des panoramas (affichage immédiat dans l'éditeur)
+    preview_cache_dir: str = ""  # Vide = ~/.lastwar_cache/previews
+    preview_cache_mb: int = 200  # Taille maximale du cache (aperçus les moins récents supprimés)
+    preview_scale: float = 0.25  # Échelle des aperçus (réduite si besoin pour WebP, 16383 px max)
+    
     # Édition
     crop_max: int = 20000
     crop_increment: int = 10
     header_height: int = 60
     header_font_size: int = 30
+    season_overview_width: int = 480  # Largeur d'une semaine dans la vue d'ensemble de la saison
+    # Préréglages de recadrage: {nom: {"top": lignes, "bottom": lignes, "relative": bool}}
+    # relative: lignes comptées depuis les bandes fixes communes aux jours de la semaine
+    crop_presets: dict = field(default_factory=dict)
+    crop_probe_rows: int = 600  # Lignes examinées en haut et en bas pour les bandes fixes
+    crop_band_variance: float = 2.0  # Variance (entre les jours) sous laquelle une ligne est fixe
+    
+    # Détection des lignes répétées dans un panorama (assemblage raté)
+    seam_block_rows: int = 8  # Lignes par bloc haché
+    seam_min_rows: int = 64  # Répétition minimale proposée (entrées du classement: ~30 lignes semblables)
+    seam_max_offset: int = 4000  # Écart maximal entre l'original et sa répétition
+    seam_tolerance: float = 3.0  # Différence moyenne (niveaux de gris) tolérée
     
     # Chemins (non persistés)
     last_video_folder: str = ""
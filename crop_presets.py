@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Préréglages de recadrage
+Retire les mêmes lignes en haut et en bas de tous les panoramas d'une
+semaine, en parallèle. Un préréglage est absolu (nombre de lignes) ou
+relatif aux bandes fixes détectées: lignes identiques en tête (ou en pied)
+des panoramas de tous les jours.
+
+Usage:
+    python crop_presets.py <dossier_semaine> --preset NOM
+    python crop_presets.py <dossier_semaine> --top N --bottom N [--relative] [--save NOM]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from config import config
+from panorama import detect_static_bands
+from panorama_view import PanoramaView, write_view
+from strip_store import export_image, load_panorama, open_strips, remove_rows, strips_path_for
+
+
+PROBE_WIDTH = 128
+
+
+@dataclass
+class CropPreset:
+    """Lignes à retirer en haut et en bas (depuis les bandes fixes si relative)"""
+    
+    name: str = ""
+    top: int = 0
+    bottom: int = 0
+    relative: bool = False
+    
+    @classmethod
+    def load(cls, name):
+        """Préréglage enregistré dans la configuration (None s'il n'existe pas)"""
+        data = config.crop_presets.get(name)
+        if data is None:
+            return None
+        return cls(name, int(data.get('top', 0)), int(data.get('bottom', 0)), bool(data.get('relative', False)))
+    
+    def save(self):
+        """Enregistre le préréglage dans la configuration"""
+        config.crop_presets[self.name] = {'top': self.top, 'bottom': self.bottom, 'relative': self.relative}
+        return config.save()
+    
+    def resolve(self, bands=(0, 0)):
+        """Lignes (haut, bas) à retirer, compte tenu des bandes fixes détectées"""
+        if not self.relative:
+            return max(self.top, 0), max(self.bottom, 0)
+        return max(bands[0] + self.top, 0), max(bands[1] + self.bottom, 0)
+
+
+def preset_names():
+    """Noms des préréglages enregistrés"""
+    return sorted(config.crop_presets)
+
+
+def week_panoramas(folder, days=None):
+    """Panoramas existants d'un dossier semaine {jour: chemin}"""
+    folder = Path(folder)
+    days = list(config.days) if days is None else days
+    return {day: folder / f"{day}.png" for day in days if (folder / f"{day}.png").exists()}
+
+
+def _edge_rows(path, rows):
+    """Premières et dernières lignes d'un panorama, en niveaux de gris réduits"""
+    reader = open_strips(path)
+    if reader is not None:
+        # Stockage à jour: seules les bandes des extrémités sont décodées
+        with reader:
+            height = reader.height
+            top = reader.read_rows(0, rows)
+            bottom = reader.read_rows(height - rows, height)
+    else:
+        image = np.asarray(load_panorama(path).convert('RGB'))
+        top, bottom = image[:rows], image[-rows:]
+    
+    def reduce(band):
+        columns = np.linspace(0, band.shape[1] - 1, PROBE_WIDTH).astype(int)
+        return band[:, columns, :3].mean(axis=2, dtype=np.float32)
+    
+    return reduce(top), reduce(bottom)
+
+
+def detect_week_bands(paths, probe_rows=None, variance_threshold=None):
+    """
+    Bandes fixes communes aux panoramas d'une semaine: lignes dont le contenu
+    ne varie pas d'un jour à l'autre, en haut et en bas.
+    
+    Returns:
+        Tuple (top, bottom) en lignes, (0, 0) avec moins de deux panoramas
+    """
+    probe_rows = config.crop_probe_rows if probe_rows is None else probe_rows
+    variance_threshold = config.crop_band_variance if variance_threshold is None else variance_threshold
+    
+    edges = [_edge_rows(path, probe_rows) for path in paths]
+    if len(edges) < 2:
+        return 0, 0
+    
+    # Jours plus courts que la zone examinée: comparer sur la hauteur commune
+    rows = min(top.shape[0] for top, _ in edges)
+    top, _ = detect_static_bands([top[:rows] for top, _ in edges], variance_threshold)
+    _, bottom = detect_static_bands([bottom[-rows:] for _, bottom in edges], variance_threshold)
+    return top, bottom
+
+
+def crop_panorama(path, top, bottom):
+    """
+    Retire `top` lignes en haut et `bottom` en bas d'un panorama (écriture
+    atomique, stockage par bandes mis à jour s'il existe).
+    
+    Returns:
+        Tuple (success, (largeur, hauteur) ou None, error)
+    """
+    try:
+        reader = open_strips(path)
+        if reader is not None:
+            # Stockage à jour: ni décodage de l'image, seules les bandes des bords sont réécrites
+            with reader:
+                width, height = reader.size
+            if top + bottom >= height:
+                return False, None, f"Recadrage plus grand que l'image ({top}+{bottom} >= {height}px)"
+            if top or bottom:
+                strips = strips_path_for(path)
+                if bottom:
+                    remove_rows(strips, height - bottom, height)
+                if top:
+                    remove_rows(strips, 0, top)
+                export_image(strips, path)
+            return True, (width, height - top - bottom), None
+        
+        view = PanoramaView(load_panorama(path))
+        height = view.height
+        if top + bottom >= height:
+            return False, None, f"Recadrage plus grand que l'image ({top}+{bottom} >= {height}px)"
+        if not top and not bottom:
+            return True, view.size, None
+        
+        if bottom:
+            view.remove_rows(height - bottom, height)
+        if top:
+            view.remove_rows(0, top)
+        write_view(view, path)
+        return True, view.size, None
+    except Exception as e:
+        return False, None, str(e)
+
+
+def apply_preset(paths, preset, workers=None, on_day=None):
+    """
+    Applique un préréglage à plusieurs panoramas, en parallèle.
+    
+    Args:
+        paths: Dict {jour: chemin du panorama}
+        preset: CropPreset
+        workers: Processus simultanés (défaut: config.max_workers)
+        on_day: Callback(résultat) appelé à chaque jour terminé
+    
+    Returns:
+        Tuple (success, results: liste de dicts day/success/size/error, bands, error)
+    """
+    if not paths:
+        return False, [], (0, 0), "Aucun panorama"
+    
+    bands = (0, 0)
+    if preset.relative:
+        try:
+            bands = detect_week_bands(list(paths.values()))
+        except Exception as e:
+            return False, [], bands, f"Détection des bandes fixes: {e}"
+    top, bottom = preset.resolve(bands)
+    
+    workers = max(1, min(workers or config.max_workers, len(paths)))
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(crop_panorama, path, top, bottom): day for day, path in paths.items()}
+        for future in as_completed(futures):
+            success, size, error = future.result()
+            result = {'day': futures[future], 'success': success, 'size': size, 'error': error}
+            results.append(result)
+            if on_day:
+                on_day(result)
+    
+    results.sort(key=lambda result: config.all_days.index(result['day']) if result['day'] in config.all_days else 0)
+    failed = [result['day'] for result in results if not result['success']]
+    return not failed, results, bands, (f"Échec: {', '.join(failed)}" if failed else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recadre tous les panoramas d'un dossier semaine")
+    parser.add_argument('folder_path', help="Dossier semaine")
+    parser.add_argument('--preset', help="Préréglage enregistré")
+    parser.add_argument('--top', type=int, default=0, help="Lignes retirées en haut")
+    parser.add_argument('--bottom', type=int, default=0, help="Lignes retirées en bas")
+    parser.add_argument('--relative', action='store_true',
+                        help="Lignes comptées depuis les bandes fixes détectées")
+    parser.add_argument('--save', metavar='NOM', help="Enregistrer ces valeurs comme préréglage")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processus simultanés (défaut: nombre de cœurs)")
+    args = parser.parse_args()
+    
+    if args.preset:
+        preset = CropPreset.load(args.preset)
+        if preset is None:
+            print(f"Error: unknown preset '{args.preset}' (available: {', '.join(preset_names()) or 'none'})")
+            sys.exit(1)
+    else:
+        preset = CropPreset(args.save or "", args.top, args.bottom, args.relative)
+        if args.save:
+            preset.save()
+            print(f"Preset saved: {args.save}")
+    
+    paths = week_panoramas(args.folder_path)
+    print(f"Cropping {len(paths)} panoramas in {args.folder_path}")
+    start = time.time()
+    
+    def on_day(result):
+        if result['success']:
+            print(f"✅ {result['day']}: {result['size'][0]}x{result['size'][1]}px")
+        else:
+            print(f"❌ {result['day']}: {result['error']}")
+    
+    success, results, bands, error = apply_preset(paths, preset, args.workers, on_day)
+    if preset.relative:
+        print(f"Static bands: top={bands[0]}px, bottom={bands[1]}px")
+    print(f"Done in {time.time() - start:.1f} seconds")
+    if not success:
+        print(f"❌ Error: {error}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
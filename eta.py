@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Estimation du temps restant d'un traitement
+Débit mesuré en frames/s par worker (progression des assemblages en cours,
+sinon historique de la machine) et ordonnancement simulé des vidéos restantes
+"""
+
+import heapq
+import threading
+import time
+
+
+def format_duration(seconds):
+    """Formate une durée en secondes ('...' si inconnue)"""
+    if seconds is None:
+        return "..."
+    
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    elif seconds < 3600:
+        minutes = int(seconds // 60)
+        secs = int(seconds % 60)
+        return f"{minutes}m{secs:02d}s"
+    else:
+        hours = int(seconds // 3600)
+        minutes = int((seconds % 3600) // 60)
+        return f"{hours}h{minutes:02d}m"
+
+
+def makespan(durations, workers, busy=()):
+    """
+    Durée totale d'un ordonnancement "plus longues d'abord".
+    
+    Une tâche peut occuper plusieurs places (tâche découpée, comme `slots`
+    dans JobScheduler): elle démarre quand autant de places sont libres et
+    les garde jusqu'à sa fin.
+    
+    Args:
+        durations: Durées des tâches en attente, ou tuples (durée, places)
+        workers: Nombre de places
+        busy: Temps restant des tâches déjà en cours, ou tuples (durée, places)
+    
+    Returns:
+        Secondes jusqu'à la fin de la dernière tâche
+    """
+    def tasks(items):
+        return sorted(((item, 1) if not isinstance(item, tuple) else item for item in items), reverse=True)
+    
+    free_at = [0.0] * workers
+    for duration, slots in tasks(busy) + tasks(durations):
+        slots = max(1, min(slots, workers))
+        start = max(heapq.heappop(free_at) for _ in range(slots))
+        for _ in range(slots):
+            heapq.heappush(free_at, start + duration)
+    return max(free_at) if free_at else 0.0
+
+
+class EtaEstimator:
+    """
+    Suivi des tâches d'un traitement et estimation du temps restant (thread-safe).
+    
+    Chaque tâche est connue par son nombre de frames (CAP_PROP_FRAME_COUNT).
+    Le débit d'un worker est celui mesuré sur les assemblages de ce
+    traitement dès qu'il est disponible, sinon le débit médian historique de
+    la machine (RunHistory): la première estimation est donc déjà réaliste.
+    """
+    
+    def __init__(self, workers, history=None):
+        self.workers = max(1, workers)
+        self.history_rate = history.throughput() if history else None
+        self._lock = threading.Lock()
+        self._jobs = {}
+    
+    def add_job(self, name, frames, parts=1):
+        """Ajoute une tâche en attente (`parts` morceaux assemblés en parallèle)"""
+        with self._lock:
+            self._jobs[name] = {
+                'frames': max(frames, 0), 'parts': max(parts, 1),
+                'done': 0, 'started': None, 'finished': None,
+            }
+    
+    def start(self, name):
+        """Marque le début d'une tâche"""
+        with self._lock:
+            if name in self._jobs:
+                self._jobs[name]['started'] = time.time()
+    
+    def update(self, name, current, total=None):
+        """Progression d'une tâche (frames assemblées)"""
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is None:
+                return
+            if total:
+                job['frames'] = total
+            job['done'] = min(current, job['frames'])
+    
+    def finish(self, name, success=True):
+        """Marque la fin d'une tâche (un échec n'est pas compté dans le débit)"""
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is not None:
+                job['done'] = job['frames'] if success else 0
+                job['finished'] = time.time()
+    
+    def measured_rate(self):
+        """Débit moyen par worker (frames/s) mesuré pendant ce traitement, ou None"""
+        with self._lock:
+            return self._measured_rate()
+    
+    def _measured_rate(self):
+        frames = 0
+        seconds = 0.0
+        now = time.time()
+        for job in self._jobs.values():
+            if job['started'] is None or job['done'] <= 0:
+                continue
+            frames += job['done'] / job['parts']
+            seconds += (job['finished'] or now) - job['started']
+        
+        # Quelques secondes de mesure avant de remplacer l'historique
+        if seconds < 5.0 or frames <= 0:
+            return None
+        return frames / seconds
+    
+    def remaining_seconds(self):
+        """
+        Temps restant estimé pour l'ensemble des tâches, ou None si aucun
+        débit n'est encore connu.
+        """
+        with self._lock:
+            rate = self._measured_rate() or self.history_rate
+            if not rate:
+                return None
+            
+            busy = []
+            pending = []
+            for job in self._jobs.values():
+                if job['finished'] is not None:
+                    continue
+                # Les morceaux d'une tâche découpée occupent chacun une place
+                seconds = (job['frames'] - job['done']) / job['parts'] / rate
+                if job['started'] is None:
+                    pending.append((seconds, job['parts']))
+                else:
+                    busy.append((seconds, job['parts']))
+        
+        return makespan(pending, self.workers, busy)
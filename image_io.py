@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Écriture des images (panoramas, tableaux)
+Encodeur PNG par bandes: chaque bande de lignes est filtrée et compressée
+dans un thread (zlib libère le GIL), puis les flux deflate sont concaténés.
+Niveau de compression et filtre configurables, WebP sans perte en option.
+Lecture ligne par ligne des PNG produits par cet encodeur.
+
+Usage benchmark: python image_io.py --benchmark <image.png>
+"""
+
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from config import config
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_FILTERS = {'none': 0, 'sub': 1, 'up': 2}
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}  # canaux -> type de couleur PNG
+CHANNELS = {color_type: channels for channels, color_type in COLOR_TYPES.items()}
+WEBP_MAX_DIMENSION = 16383
+
+
+@dataclass
+class EncodeOptions:
+    """Paramètres d'encodage PNG"""
+    compression: int = 1
+    filter: str = 'sub'
+    threads: int = 0  # 0 = nombre de cœurs
+    strip_rows: int = 512
+    
+    @classmethod
+    def from_config(cls):
+        return cls(
+            compression=config.png_compression,
+            filter=config.png_filter,
+            threads=config.png_threads,
+            strip_rows=config.png_strip_rows,
+        )
+    
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Paramètres transmis à un sous-processus (défaut: configuration)"""
+        if environ is None:
+            environ = os.environ
+        default = cls.from_config()
+        return cls(
+            compression=int(environ.get('PNG_COMPRESSION', default.compression)),
+            filter=environ.get('PNG_FILTER', default.filter),
+            threads=int(environ.get('PNG_THREADS', default.threads)),
+            strip_rows=int(environ.get('PNG_STRIP_ROWS', default.strip_rows)),
+        )
+    
+    def to_environ(self):
+        return {
+            'PNG_COMPRESSION': str(self.compression),
+            'PNG_FILTER': self.filter,
+            'PNG_THREADS': str(self.threads),
+            'PNG_STRIP_ROWS': str(self.strip_rows),
+        }
+    
+    @property
+    def workers(self):
+        return self.threads if self.threads > 0 else (os.cpu_count() or 1)
+
+
+def adler32_combine(adler1, adler2, length2):
+    """Adler-32 de A+B à partir de ceux de A et B (port de zlib adler32_combine)"""
+    base = 65521
+    rem = length2 % base
+    sum1 = adler1 & 0xffff
+    sum2 = (rem * sum1) % base
+    sum1 += (adler2 & 0xffff) + base - 1
+    sum2 += ((adler1 >> 16) & 0xffff) + ((adler2 >> 16) & 0xffff) + base - rem
+    if sum1 >= base:
+        sum1 -= base
+    if sum1 >= base:
+        sum1 -= base
+    if sum2 >= base << 1:
+        sum2 -= base << 1
+    if sum2 >= base:
+        sum2 -= base
+    return sum1 | (sum2 << 16)
+
+
+def _filter_rows(rows, previous, png_filter):
+    """
+    Applique le filtre PNG à une bande de lignes.
+    
+    Args:
+        rows: Tableau (lignes, largeur, canaux) uint8
+        previous: Ligne précédant la bande (None pour la première)
+        png_filter: 'none', 'sub' ou 'up'
+    
+    Returns:
+        Octets filtrés (un octet de type de filtre par ligne)
+    """
+    count = rows.shape[0]
+    flat = rows.reshape(count, -1)
+    out = np.empty((count, flat.shape[1] + 1), dtype=np.uint8)
+    out[:, 0] = PNG_FILTERS[png_filter]
+    
+    if png_filter == 'up':
+        out[0, 1:] = flat[0] if previous is None else flat[0] - previous.reshape(-1)
+        np.subtract(flat[1:], flat[:-1], out=out[1:, 1:])
+    elif png_filter == 'sub':
+        channels = rows.shape[2]
+        out[:, 1:channels + 1] = flat[:, :channels]
+        np.subtract(flat[:, channels:], flat[:, :-channels], out=out[:, channels + 1:])
+    else:
+        out[:, 1:] = flat
+    return out.tobytes()
+
+
+def _encode_strip(rows, previous, png_filter, level, last, bgr):
+    """
+    Filtre et compresse une bande (exécuté dans un thread).
+    
+    Returns:
+        Tuple (données deflate brutes, adler32 des données filtrées, longueur)
+    """
+    if bgr and rows.shape[2] >= 3:
+        order = [2, 1, 0, 3][:rows.shape[2]]
+        rows = rows[..., order]
+        if previous is not None:
+            previous = previous[..., order]
+    
+    data = _filter_rows(rows, previous, png_filter)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    # Z_SYNC_FLUSH: la bande se termine sur une frontière d'octet, sans bloc final
+    compressed = compressor.compress(data)
+    compressed += compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return compressed, zlib.adler32(data), len(data)
+
+
+def _chunk(chunk_type, data):
+    return (struct.pack('>I', len(data)) + chunk_type + data
+            + struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+
+class StreamingPNGWriter:
+    """
+    Écrit un PNG ligne par ligne, sans jamais avoir l'image entière en mémoire.
+    
+    Les lignes sont regroupées en bandes de `strip_rows` lignes encodées en
+    parallèle (au plus 2 bandes en attente par thread). Le fichier est écrit
+    sous un nom temporaire puis renommé à la fermeture.
+    
+    Usage:
+        with StreamingPNGWriter(path, width, height, channels=3) as writer:
+            writer.write_rows(rows)
+    """
+    
+    def __init__(self, path, width, height, channels=3, options=None, bgr=False):
+        if channels not in COLOR_TYPES:
+            raise ValueError(f"Nombre de canaux non supporté: {channels}")
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Dimensions invalides: {width}x{height}")
+        
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.options = options or EncodeOptions.from_config()
+        self.bgr = bgr
+        
+        self._buffer = []
+        self._buffered = 0
+        self._rows_submitted = 0
+        self._previous = None
+        self._adler = 1
+        self._pending = deque()  # (future ou None, bande encodée ou None, lignes)
+        self._first = True
+        self.strips = []  # (position, longueur, adler32, octets filtrés, lignes) par bande
+        self._executor = None
+        if self.options.workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.options.workers)
+        
+        self._tmp_path = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        self._file.write(_chunk(b'IHDR', struct.pack(
+            '>IIBBBBB', width, height, 8, COLOR_TYPES[channels], 0, 0, 0
+        )))
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+    
+    def write_rows(self, rows):
+        """Ajoute des lignes (tableau (n, largeur, canaux) ou (n, largeur) uint8)"""
+        rows = np.asarray(rows, dtype=np.uint8)
+        if rows.ndim == 2:
+            rows = rows[:, :, None]
+        if rows.shape[1:] != (self.width, self.channels):
+            raise ValueError(f"Lignes de forme {rows.shape[1:]}, attendu {(self.width, self.channels)}")
+        
+        rows = rows.copy()  # Encodée plus tard: l'appelant peut réutiliser son tableau
+        self._buffer.append(rows)
+        self._buffered += rows.shape[0]
+        while self._buffered >= self.options.strip_rows:
+            self._submit(self._take(self.options.strip_rows))
+    
+    def _take(self, count):
+        """Retire `count` lignes du tampon"""
+        rows = np.concatenate(self._buffer) if len(self._buffer) > 1 else self._buffer[0]
+        strip, rest = rows[:count], rows[count:]
+        self._buffer = [rest] if rest.shape[0] else []
+        self._buffered = rest.shape[0]
+        return strip
+    
+    def _submit(self, strip, last=False):
+        if self._rows_submitted + strip.shape[0] > self.height:
+            raise ValueError(f"Plus de {self.height} lignes écrites")
+        self._rows_submitted += strip.shape[0]
+        last = last or self._rows_submitted == self.height
+        
+        args = (strip, self._previous, self.options.filter, self.options.compression, last, self.bgr)
+        self._previous = strip[-1:].copy() if strip.shape[0] else self._previous
+        
+        if self._executor is None:
+            self._pending.append((None, _encode_strip(*args), strip.shape[0]))
+        else:
+            self._pending.append((self._executor.submit(_encode_strip, *args), None, strip.shape[0]))
+        self._drain(2 * self.options.workers)
+    
+    def write_encoded(self, compressed, adler, length, rows):
+        """
+        Ajoute une bande déjà encodée (deflate brut d'une bande filtrée
+        none/sub, terminée par Z_FINISH si c'est la dernière), par exemple
+        recopiée d'un PNG précédent (voir read_png_strip).
+        """
+        if self._buffered:
+            raise ValueError("Bande encodée ajoutée au milieu d'une bande en cours")
+        if self._rows_submitted + rows > self.height:
+            raise ValueError(f"Plus de {self.height} lignes écrites")
+        self._rows_submitted += rows
+        self._previous = None
+        self._pending.append((None, (compressed, adler, length), rows))
+        self._drain(2 * self.options.workers)
+    
+    def _drain(self, keep):
+        """Écrit les bandes dans l'ordre (au plus `keep` en attente)"""
+        while len(self._pending) > keep:
+            future, encoded, rows = self._pending.popleft()
+            self._write_encoded(future.result() if future is not None else encoded, rows)
+    
+    def _write_encoded(self, encoded, rows):
+        compressed, adler, length = encoded
+        # Position des données deflate brutes (après l'en-tête du chunk)
+        self.strips.append((self._file.tell() + 8 + (2 if self._first else 0), len(compressed), adler, length, rows))
+        if self._first:
+            # En-tête zlib (CMF, FLG) avant le premier flux deflate
+            level = self.options.compression
+            flevel = 0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3
+            cmf, flg = 0x78, flevel << 6
+            flg += 31 - ((cmf * 256 + flg) % 31)
+            compressed = bytes((cmf, flg)) + compressed
+            self._first = False
+        self._adler = adler32_combine(self._adler, adler, length)
+        self._file.write(_chunk(b'IDAT', compressed))
+    
+    def close(self):
+        """Termine le flux, écrit la fin du fichier et le met en place"""
+        try:
+            if self._buffered:
+                self._submit(self._take(self._buffered))
+            if self._rows_submitted != self.height:
+                raise ValueError(f"{self._rows_submitted} lignes écrites sur {self.height}")
+            
+            self._drain(0)
+            
+            self._file.write(_chunk(b'IDAT', struct.pack('>I', self._adler)))
+            self._file.write(_chunk(b'IEND', b''))
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+    
+    def abort(self):
+        """Abandonne l'écriture (fichier temporaire supprimé)"""
+        for future, _, _ in self._pending:
+            if future is not None:
+                future.cancel()
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        try:
+            self._file.close()
+            self._tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def write_png(path, image, options=None, bgr=False):
+    """Écrit un tableau (hauteur, largeur[, canaux]) en PNG par bandes parallèles"""
+    image = np.asarray(image)
+    channels = image.shape[2] if image.ndim == 3 else 1
+    options = options or EncodeOptions.from_config()
+    with StreamingPNGWriter(path, image.shape[1], image.shape[0], channels, options, bgr) as writer:
+        for start in range(0, image.shape[0], options.strip_rows):
+            writer.write_rows(image[start:start + options.strip_rows])
+
+
+def write_webp(path, image, bgr=False):
+    """Écrit un tableau en WebP sans perte (limité à 16383 px de côté)"""
+    from PIL import Image
+    
+    image = np.asarray(image)
+    if max(image.shape[:2]) > WEBP_MAX_DIMENSION:
+        raise ValueError(f"WebP limité à {WEBP_MAX_DIMENSION}px, image de {image.shape[1]}x{image.shape[0]}")
+    if bgr and image.ndim == 3:
+        image = image[..., [2, 1, 0, 3][:image.shape[2]]]
+    
+    tmp_path = Path(path).with_name(Path(path).name + f'.{os.getpid()}.tmp')
+    Image.fromarray(image).save(tmp_path, format='WEBP', lossless=True)
+    os.replace(tmp_path, path)
+
+
+def write_image(path, image, bgr=False, options=None):
+    """
+    Écrit une image selon son extension (.png: encodeur par bandes, .webp:
+    sans perte). Accepte un tableau NumPy (BGR si `bgr`) ou une image PIL.
+    """
+    if hasattr(image, 'mode'):
+        if image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode or 'transparency' in image.info else 'RGB')
+        image = np.asarray(image)
+        bgr = False
+    
+    if Path(path).suffix.lower() == '.webp':
+        write_webp(path, image, bgr)
+    else:
+        write_png(path, image, options, bgr)
+
+
+def unfilter_rows(raw, width, channels, previous=None):
+    """
+    Défiltre des lignes PNG (filtres none/sub/up uniquement).
+    
+    Args:
+        raw: Octets filtrés (un octet de type de filtre par ligne)
+        previous: Ligne précédente défiltrée (None = ligne de zéros)
+    
+    Returns:
+        Tableau (lignes, largeur, canaux) uint8
+    
+    Raises:
+        ValueError: Autre filtre (avg, paeth)
+    """
+    stride = width * channels + 1
+    count = len(raw) // stride
+    raw = np.frombuffer(raw, dtype=np.uint8).reshape(count, stride)
+    filters = raw[:, 0]
+    data = raw[:, 1:].reshape(count, width, channels)
+    out = np.empty_like(data)
+    if previous is None:
+        previous = np.zeros((width, channels), dtype=np.uint8)
+    
+    # Suites de lignes de même filtre, défiltrées d'un bloc (arithmétique modulo 256)
+    bounds = [0, *(np.flatnonzero(np.diff(filters)) + 1), count]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        kind = filters[start]
+        if kind == 0:
+            out[start:end] = data[start:end]
+        elif kind == 1:
+            np.cumsum(data[start:end], axis=1, dtype=np.uint8, out=out[start:end])
+        elif kind == 2:
+            block = data[start:end].copy()
+            block[0] += out[start - 1] if start else previous
+            np.cumsum(block, axis=0, dtype=np.uint8, out=out[start:end])
+        else:
+            raise ValueError(f"Filtre PNG {kind} non supporté en lecture par lignes")
+    return out
+
+
+def read_png_strip(file, offset, length):
+    """Données deflate brutes d'une bande (voir StreamingPNGWriter.strips)"""
+    file.seek(offset)
+    data = file.read(length)
+    if len(data) != length:
+        raise ValueError("Bande PNG tronquée")
+    return data
+
+
+def decode_png_strip(data, width, channels):
+    """Lignes d'une bande encodée par StreamingPNGWriter (filtres none/sub)"""
+    return unfilter_rows(zlib.decompressobj(-15).decompress(data), width, channels)
+
+
+class PNGRowReader:
+    """
+    Lecture séquentielle d'un PNG par paquets de lignes, sans décoder
+    l'image entière. Limité aux PNG 8 bits non entrelacés sans palette et aux
+    filtres none/sub/up (ceux de StreamingPNGWriter): ValueError sinon, y
+    compris en cours de lecture si une ligne utilise un autre filtre.
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            if self._file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+                raise ValueError(f"{self.path.name}: pas un PNG")
+            chunk_type, data = self._next_chunk()
+            if chunk_type != b'IHDR':
+                raise ValueError(f"{self.path.name}: IHDR absent")
+            width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', data)
+            if depth != 8 or interlace or color_type not in CHANNELS:
+                raise ValueError(f"{self.path.name}: format PNG non supporté en lecture par lignes")
+        except BaseException:
+            self._file.close()
+            raise
+        
+        self.width = width
+        self.height = height
+        self.channels = CHANNELS[color_type]
+        self.rows_read = 0
+        self._stride = width * self.channels + 1
+        self._decompressor = zlib.decompressobj()
+        self._data = bytearray()
+        self._previous = np.zeros((width, self.channels), dtype=np.uint8)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+        return False
+    
+    def close(self):
+        self._file.close()
+    
+    def _next_chunk(self):
+        header = self._file.read(8)
+        if len(header) < 8:
+            raise ValueError(f"{self.path.name}: PNG tronqué")
+        length, chunk_type = struct.unpack('>I4s', header)
+        data = self._file.read(length)
+        self._file.read(4)  # CRC
+        return chunk_type, data
+    
+    def _fill(self, size):
+        """Décompresse les IDAT jusqu'à disposer de `size` octets"""
+        while len(self._data) < size:
+            chunk_type, data = self._next_chunk()
+            if chunk_type == b'IDAT':
+                self._data += self._decompressor.decompress(data)
+            elif chunk_type == b'IEND':
+                raise ValueError(f"{self.path.name}: données d'image incomplètes")
+    
+    def read_rows(self, count):
+        """Lit les `count` lignes suivantes (tableau (n, largeur, canaux) uint8)"""
+        count = min(count, self.height - self.rows_read)
+        if count <= 0:
+            return np.empty((0, self.width, self.channels), dtype=np.uint8)
+        
+        size = count * self._stride
+        self._fill(size)
+        out = unfilter_rows(bytes(self._data[:size]), self.width, self.channels, self._previous)
+        del self._data[:size]
+        self._previous = out[-1]
+        self.rows_read += count
+        return out
+
+
+def benchmark(image_path):
+    """Compare taille et temps d'encodage des différentes options sur une image"""
+    import cv2
+    import tempfile
+    
+    image = cv2.imread(str(image_path), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        print(f"Error: Could not read {image_path}")
+        sys.exit(1)
+    print(f"Image: {image_path} ({image.shape[1]}x{image.shape[0]}, {image.nbytes / 2**20:.1f} MB brut)")
+    print(f"{'Encodeur':<36}{'Temps (s)':>10}{'Taille (MB)':>13}")
+    
+    cores = os.cpu_count() or 1
+    cases = [(f"cv2 PNG niveau {level}", 'cv2', level) for level in (1, 3, 6, 9)]
+    for level in (1, 3, 6):
+        for png_filter in ('none', 'up', 'sub'):
+            for threads in sorted({1, cores}):
+                options = EncodeOptions(level, png_filter, threads)
+                cases.append((f"Bandes niveau {level} {png_filter} x{threads}", 'strips', options))
+    cases.append(("WebP sans perte", 'webp', None))
+    
+    with tempfile.TemporaryDirectory() as folder:
+        for name, kind, option in cases:
+            path = Path(folder) / ('out.webp' if kind == 'webp' else 'out.png')
+            start = time.perf_counter()
+            try:
+                if kind == 'cv2':
+                    cv2.imwrite(str(path), image, [cv2.IMWRITE_PNG_COMPRESSION, option])
+                elif kind == 'strips':
+                    write_png(path, image, option, bgr=True)
+                else:
+                    write_webp(path, image, bgr=True)
+            except ValueError as e:
+                print(f"{name:<36}{'n/a':>10}  {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"{name:<36}{elapsed:>10.2f}{path.stat().st_size / 2**20:>13.2f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != '--benchmark':
+        print("Usage: python image_io.py --benchmark <image.png>")
+        sys.exit(1)
+    benchmark(sys.argv[2])
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Planificateur persistant des tâches d'assemblage
+File d'attente unique (plusieurs semaines), tâches les plus longues d'abord,
+concurrence limitée par le nombre de cœurs et un budget mémoire global
+"""
+
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import Future
+
+from config import config
+
+
+def detect_memory_budget_mb():
+    """
+    Budget mémoire des assemblages: config.memory_budget_mb, ou la moitié
+    de la RAM physique si la valeur est 0 (4 Go si elle est inconnue).
+    """
+    if config.memory_budget_mb > 0:
+        return config.memory_budget_mb
+    
+    try:
+        total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        return int(total / 2**20 / 2)
+    except (AttributeError, ValueError, OSError):
+        pass
+    
+    try:
+        import psutil
+        return int(psutil.virtual_memory().total / 2**20 / 2)
+    except ImportError:
+        return 4096
+
+
+class Job:
+    """Tâche en attente ou en cours dans le planificateur"""
+    
+    def __init__(self, fn, args, kwargs, cost, memory_mb, name, slots=1):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cost = cost
+        self.memory_mb = memory_mb
+        self.name = name
+        self.slots = slots
+        self.bypassed = 0  # Tâches plus petites démarrées avant elle alors qu'elle attendait
+        self.future = Future()
+
+
+class JobScheduler:
+    """
+    Exécute des tâches dans des threads, par ordre de coût décroissant.
+    
+    Une tâche n'est démarrée que si les cœurs qu'elle occupe (1, ou un par
+    morceau d'une vidéo découpée) tiennent dans min(max_workers, nombre de
+    cœurs) et si la mémoire estimée des tâches en
+    cours plus la sienne tient dans le budget (une tâche seule est toujours
+    admise). Si la plus longue tâche en attente ne tient pas (cœurs ou
+    mémoire), la suivante qui tient est démarrée à sa place, au plus
+    `max_head_bypass` fois: ensuite plus rien ne démarre avant elle, les
+    ressources libérées lui sont réservées (sinon une file alimentée en
+    continu par des tâches plus petites la repousserait indéfiniment).
+    
+    Les résultats sont des concurrent.futures.Future: utilisables avec
+    as_completed() par l'interface comme par la ligne de commande.
+    """
+    
+    def __init__(self, max_workers=None, memory_budget_mb=None, max_head_bypass=None):
+        self.max_workers = max_workers or config.max_workers
+        self.memory_budget_mb = memory_budget_mb or detect_memory_budget_mb()
+        self.max_head_bypass = config.max_head_bypass if max_head_bypass is None else max_head_bypass
+        self._cond = threading.Condition()
+        self._queue = []
+        self._running = set()
+        self._sequence = itertools.count()
+        self._shutdown = False
+        self._dispatcher = None
+    
+    @property
+    def capacity(self):
+        """Nombre maximal de tâches simultanées"""
+        return max(1, min(self.max_workers, os.cpu_count() or 1))
+    
+    def set_max_workers(self, max_workers):
+        """Modifie le nombre de workers (pris en compte immédiatement)"""
+        with self._cond:
+            self.max_workers = max(1, int(max_workers))
+            self._cond.notify_all()
+    
+    def submit(self, fn, *args, cost=0, memory_mb=None, name=None, slots=1, **kwargs):
+        """
+        Ajoute une tâche à la file.
+        
+        Args:
+            fn: Fonction exécutée dans un thread du planificateur
+            cost: Coût estimé (les plus coûteuses démarrent en premier)
+            memory_mb: Mémoire estimée (défaut: config.job_memory_mb)
+            name: Nom affiché
+            slots: Cœurs occupés par la tâche
+        
+        Returns:
+            concurrent.futures.Future du résultat de fn
+        """
+        if memory_mb is None:
+            memory_mb = config.job_memory_mb
+        
+        job = Job(fn, args, kwargs, cost, memory_mb, name, max(1, slots))
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Planificateur arrêté")
+            heapq.heappush(self._queue, (-cost, next(self._sequence), job))
+            self._ensure_dispatcher()
+            self._cond.notify_all()
+        return job.future
+    
+    def pending(self):
+        """Nombre de tâches en attente"""
+        with self._cond:
+            return len(self._queue)
+    
+    def running(self):
+        """Noms des tâches en cours"""
+        with self._cond:
+            return [job.name for job in self._running]
+    
+    def shutdown(self, cancel_pending=True):
+        """Arrête le planificateur (les tâches en cours se terminent)"""
+        with self._cond:
+            self._shutdown = True
+            if cancel_pending:
+                for _, _, job in self._queue:
+                    job.future.cancel()
+                self._queue.clear()
+            self._cond.notify_all()
+    
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self._dispatcher.start()
+    
+    def _memory_in_use(self):
+        return sum(job.memory_mb for job in self._running)
+    
+    def memory_in_use(self):
+        """Mémoire estimée des tâches en cours (Mo)"""
+        with self._cond:
+            return self._memory_in_use()
+    
+    def _next_admissible(self):
+        """Index dans la file de la prochaine tâche admissible, ou None"""
+        if not self._queue:
+            return None
+        if not self._running:
+            return 0
+        
+        free_slots = self.capacity - sum(job.slots for job in self._running)
+        available = self.memory_budget_mb - self._memory_in_use()
+        entries = sorted(self._queue)
+        head = entries[0][2]
+        if head.future.cancelled() or (head.slots <= free_slots and head.memory_mb <= available):
+            return self._queue.index(entries[0])
+        
+        # Tête bloquée: remplissage par une tâche plus petite, en nombre limité
+        if head.bypassed >= self.max_head_bypass:
+            return None
+        for entry in entries[1:]:
+            job = entry[2]
+            if job.slots <= free_slots and job.memory_mb <= available:
+                head.bypassed += 1
+                return self._queue.index(entry)
+        return None
+    
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                index = self._next_admissible()
+                while index is None and not (self._shutdown and not self._queue):
+                    self._cond.wait()
+                    index = self._next_admissible()
+                if index is None:
+                    return
+                
+                _, _, job = self._queue.pop(index)
+                heapq.heapify(self._queue)
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                self._running.add(job)
+            
+            thread = threading.Thread(target=self._run_job, args=(job,), daemon=True)
+            thread.start()
+    
+    def _run_job(self, job):
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except BaseException as e:
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+        finally:
+            with self._cond:
+                self._running.discard(job)
+                self._cond.notify_all()
@@ -5,18 +5,24 @@ Version améliorée: raccourcis clavier, validation, config centralisée
 """
 
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext
+from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageTk
 from datetime import datetime
 import queue
 import re
+import threading
 
 # Importer les modules
 from config import config
+from crop_presets import CropPreset, apply_preset, preset_names
 from table_generator import TableGenerator
 from video_processor import VideoProcessor
+from panorama_runner import detect_day_from_filename
 from panorama_editor import PanoramaEditor
+from panorama_view import BackgroundSaver, PanoramaView
+from preview_cache import PreviewCache
+from strip_store import load_panorama
 from video_capture import VideoCapture
 
 
@@ -29,8 +35,7 @@ class LastWarGUI:
         # Variables
         self.video_files = {}
         self.panorama_files = {}
-        self.current_panorama = None
-        self.original_panorama = None
+        self.current_panorama = None  # PanoramaView
         self.current_day = None
         self.crop_lines = []
         self.enable_ocr = tk.BooleanVar(value=False)
@@ -38,6 +43,18 @@ class LastWarGUI:
         self.final_statuses = {}
         self.current_capture_output = None
         self.crop_drag_start = None
+        self.table_thread = None
+        self.preset_thread = None
+        self.preset_active = False  # Jusqu'au rechargement du jour affiché (on_preset_done)
+        self.panorama_saver = BackgroundSaver(lambda *event: self.update_queue.put(('save_' + event[0],) + event[1:]))
+        self.preview_cache = PreviewCache()
+        # Création des aperçus manquants: un seul thread, en pause pendant les chargements de l'éditeur
+        self.preview_condition = threading.Condition()
+        self.preview_thread = None
+        self.preview_queue = []
+        self.editor_paths = set()  # Aperçus créés par le chargement de l'éditeur
+        self.editor_loads = 0
+        self.panorama_load_id = 0  # Chargement en cours (les résultats périmés sont ignorés)
         
         # Configuration
         self.days = list(config.days)
@@ -50,12 +67,26 @@ class LastWarGUI:
         
         self.setup_ui()
         self.setup_shortcuts()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.check_update_queue()
     
+    def on_closing(self):
+        """Fermeture: laisse se terminer les sauvegardes en cours si demandé"""
+        if self.panorama_saver.busy():
+            if messagebox.askyesno(
+                "Sauvegarde en cours",
+                "Une sauvegarde est en cours. Attendre sa fin avant de quitter ?\n"
+                "(Sinon le fichier garde sa version précédente.)"
+            ):
+                self.update_status("💾 Fin des sauvegardes...")
+                self.panorama_saver.wait()
+        self.root.destroy()
+    
     def setup_shortcuts(self):
         """Configure les raccourcis clavier globaux"""
         self.root.bind('<Control-s>', lambda e: self.save_current())
         self.root.bind('<Control-z>', lambda e: self.undo_current())
+        self.root.bind('<Control-y>', lambda e: self.redo_current())
         self.root.bind('<F5>', lambda e: self.refresh_all())
         self.root.bind('<Control-o>', lambda e: self.load_videos())
         self.root.bind('<Control-p>', lambda e: self.load_panoramas())
@@ -76,6 +107,11 @@ class LastWarGUI:
         if self.current_panorama:
             self.panorama_editor.undo_changes()
     
+    def redo_current(self):
+        """Rétablit selon l'onglet actif"""
+        if self.current_panorama:
+            self.panorama_editor.redo_changes()
+    
     def refresh_all(self):
         """Rafraîchit les listes"""
         self.refresh_panorama_list()
@@ -111,7 +147,7 @@ class LastWarGUI:
         
         shortcuts_label = ttk.Label(
             status_frame, 
-            text="Ctrl+S: Sauver | Ctrl+Z: Annuler | F5: Rafraîchir | Ctrl+O: Ouvrir vidéos",
+            text="Ctrl+S: Sauver | Ctrl+Z/Y: Annuler/Rétablir | F5: Rafraîchir | Ctrl+O: Ouvrir vidéos",
             foreground="gray"
         )
         shortcuts_label.pack(side=tk.RIGHT, padx=5)
@@ -272,6 +308,37 @@ class LastWarGUI:
         self.template_height.set(config.template_height)
         self.template_height.grid(row=2, column=1, columnspan=2, padx=5, pady=5)
         
+        ttk.Label(options_frame, text="Bandes fixes (haut/bas):").grid(row=3, column=0, padx=5, pady=5)
+        self.roi_top = tk.IntVar(value=config.roi_top)
+        ttk.Spinbox(
+            options_frame, from_=0, to=config.crop_max, increment=config.crop_increment,
+            textvariable=self.roi_top, width=10
+        ).grid(row=3, column=1, padx=5, pady=5)
+        self.roi_bottom = tk.IntVar(value=config.roi_bottom)
+        ttk.Spinbox(
+            options_frame, from_=0, to=config.crop_max, increment=config.crop_increment,
+            textvariable=self.roi_bottom, width=10
+        ).grid(row=3, column=2, padx=5, pady=5)
+        
+        self.roi_auto = tk.BooleanVar(value=config.roi_auto)
+        ttk.Checkbutton(
+            options_frame, text="Détecter automatiquement les bandes fixes",
+            variable=self.roi_auto
+        ).grid(row=4, column=0, columnspan=3, padx=5, pady=5, sticky='w')
+        
+        self.force_reprocess = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            options_frame, text="Forcer le retraitement (ignorer les jours à jour)",
+            variable=self.force_reprocess
+        ).grid(row=5, column=0, columnspan=3, padx=5, pady=5, sticky='w')
+        
+        ttk.Label(options_frame, text="✂️ Morceaux par longue vidéo:").grid(row=6, column=0, padx=5, pady=5)
+        self.split_parts = tk.IntVar(value=config.split_parts)
+        ttk.Spinbox(
+            options_frame, from_=1, to=config.max_workers_limit,
+            textvariable=self.split_parts, width=10
+        ).grid(row=6, column=1, padx=5, pady=5)
+        
         # Boutons
         control_frame = ttk.Frame(self.video_tab)
         control_frame.pack(fill='x', padx=10, pady=10)
@@ -279,6 +346,7 @@ class LastWarGUI:
         ttk.Button(control_frame, text="📁 Charger vidéos (Ctrl+O)", command=self.load_videos).pack(side=tk.LEFT, padx=5)
         ttk.Button(control_frame, text="▶️ Traiter sélection", command=self.video_processor.process_selected_videos).pack(side=tk.LEFT, padx=5)
         ttk.Button(control_frame, text="⚡ Traiter tout", command=self.video_processor.process_all_videos).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="⛔ Annuler le traitement", command=self.video_processor.cancel_processing).pack(side=tk.LEFT, padx=5)
         
         # Journal
         log_frame = ttk.LabelFrame(self.video_tab, text="Journal")
@@ -347,6 +415,14 @@ class LastWarGUI:
         ttk.Button(crop_frame, text="⬆️ Haut (Home)", command=self.panorama_editor.scroll_to_top).grid(row=3, column=1, pady=3)
         ttk.Button(crop_frame, text="📏 Ajuster (Ctrl+0)", command=self.panorama_editor.fit_to_window).grid(row=4, column=0, columnspan=2, pady=3)
         
+        # Préréglages appliqués à toute la semaine
+        ttk.Label(crop_frame, text="Préréglage:").grid(row=5, column=0, padx=5, pady=5, sticky='w')
+        self.preset_combo = ttk.Combobox(crop_frame, values=preset_names(), state='readonly', width=10)
+        self.preset_combo.grid(row=5, column=1, padx=5, pady=5)
+        self.preset_btn = ttk.Button(crop_frame, text="📐 Semaine", command=self.apply_crop_preset)
+        self.preset_btn.grid(row=6, column=0, pady=3)
+        ttk.Button(crop_frame, text="➕ Enregistrer", command=self.save_crop_preset).grid(row=6, column=1, pady=3)
+        
         # Zoom
         zoom_frame = ttk.LabelFrame(control_panel, text="Zoom")
         zoom_frame.pack(fill='x', pady=10)
@@ -364,6 +440,9 @@ class LastWarGUI:
         
         ttk.Button(action_frame, text="✂️ Appliquer recadrage", command=self.panorama_editor.apply_crop).pack(fill='x', padx=5, pady=5)
         ttk.Button(action_frame, text="↩️ Annuler (Ctrl+Z)", command=self.panorama_editor.undo_changes).pack(fill='x', padx=5, pady=5)
+        ttk.Button(action_frame, text="↪️ Rétablir (Ctrl+Y)", command=self.panorama_editor.redo_changes).pack(fill='x', padx=5, pady=5)
+        ttk.Button(action_frame, text="🔎 Lignes répétées", command=self.panorama_editor.detect_repeated_rows).pack(fill='x', padx=5, pady=5)
+        ttk.Button(action_frame, text="⏭️ Répétition suivante", command=self.panorama_editor.next_seam).pack(fill='x', padx=5, pady=5)
         ttk.Button(action_frame, text="💾 Sauvegarder (Ctrl+S)", command=self.panorama_editor.save_edited_panorama).pack(fill='x', padx=5, pady=5)
         
         self.info_label = ttk.Label(control_panel, text="Aucune image chargée", wraplength=200)
@@ -403,7 +482,7 @@ Note: Le fichier 'semaine.png' ne sera PAS inclus dans le tableau final.
         button_frame = ttk.Frame(info_frame)
         button_frame.pack(pady=30)
         
-        generate_btn = tk.Button(
+        self.generate_btn = tk.Button(
             button_frame,
             text="🎨 Générer le tableau final",
             command=self.generate_and_save_final_table,
@@ -414,7 +493,7 @@ Note: Le fichier 'semaine.png' ne sera PAS inclus dans le tableau final.
             pady=15,
             cursor='hand2'
         )
-        generate_btn.pack()
+        self.generate_btn.pack()
         
         tips_frame = ttk.LabelFrame(main_frame, text="💡 Conseils")
         tips_frame.pack(fill='x', pady=10)
@@ -428,73 +507,195 @@ Note: Le fichier 'semaine.png' ne sera PAS inclus dans le tableau final.
         ttk.Label(tips_frame, text=tips_text, justify=tk.LEFT, font=('Arial', 9)).pack(padx=20, pady=10)
     
     def generate_and_save_final_table(self):
-        """Génère et sauvegarde le tableau final avec TableGenerator"""
+        """Génère et sauvegarde le tableau final avec TableGenerator (hors du thread Tk)"""
         if not self.panorama_files:
             messagebox.showwarning("Aucun panorama", "Veuillez d'abord charger des panoramas dans l'onglet 2")
             return
         
+        if self.table_thread is not None and self.table_thread.is_alive():
+            self.log("ℹ️  Génération du tableau déjà en cours")
+            return
+        
+        # Collecter les images
+        images = []
+        days_found = []
+        
+        for day in self.days:  # Uniquement lundi à samedi
+            if day in self.panorama_files:
+                img_path = self.panorama_files[day]
+                if img_path.exists():
+                    images.append(img_path)  # Lu par bandes pendant la composition
+                    days_found.append(day)
+        
+        if not images:
+            self.concat_status.config(text="❌ Aucune image trouvée", foreground="red")
+            messagebox.showerror("Erreur", "Aucun panorama trouvé pour générer le tableau")
+            return
+        
+        # Déterminer le dossier et nom de sortie
+        first_panorama = list(self.panorama_files.values())[0]
+        folder = Path(first_panorama).parent
+        folder_name = folder.name
+        output_file = folder / f"{folder_name}.png"
+        
+        self.log(f"📊 Génération du tableau avec {len(images)} jour(s): {', '.join(days_found)}")
         self.concat_status.config(text="⏳ Génération en cours...", foreground="orange")
-        self.root.update()
+        self.generate_btn.config(state=tk.DISABLED)
+        
+        # Générer les headers
+        start_date = TableGenerator.parse_folder_dates(folder_name)
+        headers = TableGenerator.generate_headers(start_date, days_found)
+        
+        last_percent = [-1]
+        
+        def progress(done, total):
+            percent = done * 100 // max(total, 1)
+            if percent != last_percent[0]:  # Une mise à jour par pourcent
+                last_percent[0] = percent
+                self.update_queue.put(('table_progress', percent))
+        
+        def worker():
+            try:
+                success, size, error = TableGenerator.generate(
+                    images, headers, output_file, transparent_bg=False, progress=progress
+                )
+            except Exception as e:
+                success, size, error = False, None, str(e)
+            self.update_queue.put(('table_done', success, size, error, output_file, days_found))
+        
+        self.table_thread = threading.Thread(target=worker, daemon=True)
+        self.table_thread.start()
+    
+    def save_crop_preset(self):
+        """
+        Enregistre un préréglage: lignes retirées en haut et en bas de chaque
+        panorama. Les valeurs sont demandées explicitement: les lignes de coupe
+        de l'éditeur (deux lignes = zone du milieu enlevée) n'ont pas ce sens.
+        """
+        # Seule une coupe basse seule correspond à une valeur de préréglage
+        initial_bottom = self.crop_bottom.get() if not self.crop_top.get() else 0
         
-        try:
-            # Collecter les images
-            images = []
-            days_found = []
-            
-            for day in self.days:  # Uniquement lundi à samedi
-                if day in self.panorama_files:
-                    img_path = self.panorama_files[day]
-                    if img_path.exists():
-                        img = Image.open(img_path)
-                        images.append(img)
-                        days_found.append(day)
-            
-            if not images:
-                self.concat_status.config(text="❌ Aucune image trouvée", foreground="red")
-                messagebox.showerror("Erreur", "Aucun panorama trouvé pour générer le tableau")
-                return
-            
-            # Déterminer le dossier et nom de sortie
-            first_panorama = list(self.panorama_files.values())[0]
-            folder = Path(first_panorama).parent
-            folder_name = folder.name
-            output_file = folder / f"{folder_name}.png"
-            
-            self.log(f"📊 Génération du tableau avec {len(images)} jour(s): {', '.join(days_found)}")
-            
-            # Générer les headers
-            start_date = TableGenerator.parse_folder_dates(folder_name)
-            headers = TableGenerator.generate_headers(start_date, days_found)
-            
-            # Générer le tableau
-            success, result, error = TableGenerator.generate(
-                images, headers, output_file, transparent_bg=False
-            )
-            
-            # Fermer les images
-            for img in images:
-                img.close()
-            
-            if success:
-                self.log(f"✅ Tableau sauvegardé: {output_file}")
-                self.log(f"   Dimensions: {result.width}x{result.height}px")
-                
-                if 'semaine' in self.panorama_files:
-                    self.log("ℹ️  Note: 'semaine.png' n'a pas été inclus")
-                
-                self.concat_status.config(text=f"✅ Tableau sauvegardé: {output_file.name}", foreground="green")
-                
-                self.root.after(100, lambda: messagebox.showinfo(
-                    "Succès",
-                    f"Tableau généré avec succès!\n\nFichier: {output_file.name}\nJours: {', '.join(days_found)}"
-                ))
+        top = simpledialog.askinteger(
+            "Préréglage", "Lignes à retirer en HAUT de chaque panorama:",
+            initialvalue=0, minvalue=-config.crop_max, maxvalue=config.crop_max
+        )
+        if top is None:
+            return
+        bottom = simpledialog.askinteger(
+            "Préréglage", "Lignes à retirer en BAS de chaque panorama:",
+            initialvalue=initial_bottom, minvalue=-config.crop_max, maxvalue=config.crop_max
+        )
+        if bottom is None:
+            return
+        relative = messagebox.askyesno(
+            "Préréglage",
+            "Compter ces lignes depuis les bandes fixes détectées (en-tête et pied\n"
+            "identiques pour tous les jours) ?\n"
+            "Non: depuis les bords de l'image (valeurs négatives ignorées)."
+        )
+        if not top and not bottom and not relative:
+            self.log("ℹ️  Préréglage vide: rien à enregistrer")
+            return
+        
+        name = simpledialog.askstring("Préréglage", f"Nom du préréglage (haut {top}px, bas {bottom}px):")
+        if not name:
+            return
+        
+        CropPreset(name, top, bottom, relative).save()
+        self.preset_combo.config(values=preset_names())
+        self.preset_combo.set(name)
+        origin = "depuis les bandes fixes" if relative else "depuis les bords"
+        self.log(f"📐 Préréglage enregistré: {name} (haut {top}px, bas {bottom}px, {origin})")
+    
+    def preset_running(self):
+        """Préréglage en cours d'application (fichiers de la semaine en cours de réécriture)"""
+        return self.preset_active
+    
+    def apply_crop_preset(self):
+        """Applique le préréglage choisi à tous les panoramas de la semaine (hors du thread Tk)"""
+        preset = CropPreset.load(self.preset_combo.get())
+        if preset is None:
+            messagebox.showwarning("Préréglage", "Choisissez un préréglage")
+            return
+        
+        paths = {day: self.panorama_files[day] for day in self.days if day in self.panorama_files}
+        if not paths:
+            messagebox.showwarning("Aucun panorama", "Veuillez d'abord charger des panoramas")
+            return
+        
+        if self.preset_running():
+            self.log("ℹ️  Recadrage de la semaine déjà en cours")
+            return
+        
+        if not messagebox.askyesno(
+            "Préréglage",
+            f"Recadrer {len(paths)} panorama(s) avec '{preset.name}' ?\n"
+            "Les fichiers sont réécrits, les modifications non sauvegardées sont perdues."
+        ):
+            return
+        
+        self.log(f"📐 Préréglage '{preset.name}' sur {len(paths)} jour(s)...")
+        self.preset_btn.config(state=tk.DISABLED)
+        
+        def on_day(result):
+            if result['success']:
+                w, h = result['size']
+                self.update_queue.put(('log', f"   ✅ {result['day']}: {w}x{h}px"))
             else:
-                raise Exception(error)
+                self.update_queue.put(('log', f"   ❌ {result['day']}: {result['error']}"))
+        
+        def worker():
+            try:
+                self.panorama_saver.wait()  # Pas de recadrage pendant une sauvegarde
+                success, results, bands, error = apply_preset(paths, preset, on_day=on_day)
+            except Exception as e:
+                success, results, bands, error = False, [], (0, 0), str(e)
+            self.update_queue.put(('preset_done', preset, success, results, bands, error))
+        
+        self.preset_active = True
+        self.preset_thread = threading.Thread(target=worker, daemon=True)
+        self.preset_thread.start()
+    
+    def on_preset_done(self, preset, success, results, bands, error):
+        """Fin du recadrage de la semaine (thread Tk)"""
+        self.preset_btn.config(state=tk.NORMAL)
+        self.preset_active = False
+        
+        # Le jour affiché a été réécrit: le recharger avant toute autre action
+        # (la vue affichée repose sur l'ancienne source)
+        if self.current_day in {result['day'] for result in results if result['success']}:
+            self.load_panorama_for_edit()
         
-        except Exception as e:
-            self.log(f"❌ Erreur lors de la génération: {e}")
-            self.concat_status.config(text=f"❌ Erreur: {str(e)}", foreground="red")
-            messagebox.showerror("Erreur", f"Impossible de générer le tableau:\n{e}")
+        if preset.relative:
+            self.log(f"   Bandes fixes: haut {bands[0]}px, bas {bands[1]}px")
+        if success:
+            self.log(f"✅ Préréglage '{preset.name}' appliqué à {len(results)} jour(s)")
+        else:
+            self.log(f"❌ Préréglage '{preset.name}': {error}")
+            messagebox.showerror("Erreur", f"Recadrage de la semaine:\n{error}")
+    
+    def on_table_done(self, success, size, error, output_file, days_found):
+        """Fin de la génération du tableau (thread Tk)"""
+        self.generate_btn.config(state=tk.NORMAL)
+        
+        if not success:
+            self.log(f"❌ Erreur lors de la génération: {error}")
+            self.concat_status.config(text=f"❌ Erreur: {error}", foreground="red")
+            messagebox.showerror("Erreur", f"Impossible de générer le tableau:\n{error}")
+            return
+        
+        self.log(f"✅ Tableau sauvegardé: {output_file}")
+        self.log(f"   Dimensions: {size[0]}x{size[1]}px")
+        
+        if 'semaine' in self.panorama_files:
+            self.log("ℹ️  Note: 'semaine.png' n'a pas été inclus")
+        
+        self.concat_status.config(text=f"✅ Tableau sauvegardé: {output_file.name}", foreground="green")
+        
+        self.root.after(100, lambda: messagebox.showinfo(
+            "Succès",
+            f"Tableau généré avec succès!\n\nFichier: {output_file.name}\nJours: {', '.join(days_found)}"
+        ))
     
     def check_update_queue(self):
         """Vérifie la queue de mises à jour"""
@@ -531,6 +732,24 @@ Note: Le fichier 'semaine.png' ne sera PAS inclus dans le tableau final.
                 elif item[0] == 'error':
                     day, error = item[1], item[2]
                     self.log(f"❌ Erreur {day}: {error}")
+                elif item[0] == 'status_bar':
+                    self.update_status(item[1])
+                elif item[0] == 'table_progress':
+                    self.concat_status.config(text=f"⏳ Génération en cours... {item[1]}%", foreground="orange")
+                elif item[0] == 'table_done':
+                    self.on_table_done(*item[1:])
+                elif item[0] == 'panorama_loaded':
+                    self.on_panorama_loaded(*item[1:])
+                elif item[0] == 'seams_found':
+                    self.panorama_editor.on_seams_found(*item[1:])
+                elif item[0] == 'preset_done':
+                    self.on_preset_done(*item[1:])
+                elif item[0] == 'save_progress':
+                    path, done, total = item[1:]
+                    self.update_status(f"💾 {path.name}: {done * 100 // max(total, 1)}%")
+                elif item[0] == 'save_done':
+                    self.update_status("Prêt")
+                    self.panorama_editor.on_save_done(*item[1:])
         except queue.Empty:
             pass
         
@@ -579,13 +798,7 @@ Note: Le fichier 'semaine.png' ne sera PAS inclus dans le tableau final.
     
     def detect_day_from_filename(self, filename):
         """Détecte le jour depuis le nom"""
-        filename_lower = filename.lower()
-        if 'semaine' in filename_lower:
-            return 'semaine'
-        for day in self.days:
-            if day in filename_lower:
-                return day
-        return None
+        return detect_day_from_filename(filename, self.days)
     
     def ask_day_for_file(self, filename):
         """Demande le jour pour un fichier"""
@@ -621,6 +834,30 @@ Note: Le fichier 'semaine.png' ne sera PAS inclus dans le tableau final.
             self.load_panorama_for_edit()
         if available_days:
             self.log(f"🔄 Onglet 2: {len(available_days)} panorama(s) ({', '.join(available_days)})")
+            # Aperçus manquants créés en arrière-plan
+            self.warm_previews(list(self.panorama_files.values()))
+    
+    def warm_previews(self, paths):
+        """Programme la création des aperçus manquants (un seul thread à la fois)"""
+        with self.preview_condition:
+            self.preview_queue = list(paths)
+            if self.preview_thread is not None:
+                return  # Le thread en cours reprend avec la nouvelle liste
+            self.preview_thread = threading.Thread(target=self._warm_worker, daemon=True)
+            self.preview_thread.start()
+    
+    def _warm_worker(self):
+        while True:
+            with self.preview_condition:
+                # Pas de décodage concurrent avec le chargement de l'éditeur
+                self.preview_condition.wait_for(lambda: self.editor_loads == 0)
+                if not self.preview_queue:
+                    self.preview_thread = None
+                    return
+                path = self.preview_queue.pop(0)
+                if path in self.editor_paths:
+                    continue  # L'éditeur crée lui-même cet aperçu
+            self.preview_cache.warm([path])
     
     def load_panoramas(self):
         """Charge des panoramas existants"""
@@ -648,13 +885,71 @@ Note: Le fichier 'semaine.png' ne sera PAS inclus dans le tableau final.
         self.current_day = day
         img_path = self.panorama_files[day]
         
-        self.current_panorama = Image.open(img_path)
-        self.original_panorama = self.current_panorama.copy()
-        
+        # Pas d'édition avant la fin du chargement
+        self.current_panorama = None
+        self.panorama_editor.clear_seams()
         self.crop_bottom.set(0)
         self.crop_top.set(0)
         self.crop_drag_start = None
         
+        # Aperçu en cache affiché immédiatement
+        self.panorama_load_id += 1
+        load_id = self.panorama_load_id
+        preview = self.preview_cache.get(img_path)
+        if preview is not None:
+            try:
+                with Image.open(img_path) as header:
+                    size = header.size
+                self.display_preview(preview, size)
+                self.info_label.config(text=f"Taille: {size[0]}x{size[1]}px\n⏳ Chargement...")
+            except OSError:
+                pass
+        
+        with self.preview_condition:
+            self.editor_paths.add(img_path)
+            self.editor_loads += 1
+        
+        # Pleine résolution en arrière-plan
+        def worker():
+            try:
+                self._load_full(img_path, load_id, day, preview)
+            finally:
+                with self.preview_condition:
+                    self.editor_loads -= 1
+                    self.preview_condition.notify_all()
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def _load_full(self, img_path, load_id, day, preview):
+        """Lecture pleine résolution (thread de chargement)"""
+        try:
+            # Une sauvegarde de ce jour en cours se termine avant la lecture
+            self.panorama_saver.wait(img_path)
+            # Stockage par bandes s'il est à jour (décodage parallèle), sinon PNG
+            image = load_panorama(img_path)
+            image.load()
+        except Exception as e:
+            with self.preview_condition:
+                self.editor_paths.discard(img_path)  # Aperçu laissé au thread de création
+            self.update_queue.put(('panorama_loaded', load_id, day, None, str(e)))
+            return
+        self.update_queue.put(('panorama_loaded', load_id, day, image, None))
+        if preview is None:
+            self.preview_cache.put(img_path, image)
+    
+    def on_panorama_loaded(self, load_id, day, image, error):
+        """Panorama chargé en pleine résolution (thread Tk)"""
+        if load_id != self.panorama_load_id:
+            return  # Un autre jour a été choisi entre-temps
+        
+        if image is None:
+            self.log(f"❌ Erreur chargement {day}: {error}")
+            messagebox.showerror("Erreur", f"Impossible de charger {day}:\n{error}")
+            return
+        
+        # Les recadrages s'appliquent à une vue: la source n'est jamais copiée
+        self.current_panorama = PanoramaView(image)
+        self.panorama_saver.loaded(self.panorama_files[day])
         self.display_image_in_canvas()
         
         w, h = self.current_panorama.size
@@ -662,17 +957,37 @@ Note: Le fichier 'semaine.png' ne sera PAS inclus dans le tableau final.
         
         self.log(f"Chargé pour édition: {day}")
     
+    def display_preview(self, preview, size):
+        """
+        Affiche l'aperçu en attendant l'image, aux dimensions du panorama au
+        zoom courant. L'agrandissement se fait par un facteur entier côté Tk
+        (PhotoImage.zoom): seul le petit aperçu est redimensionné en Python.
+        """
+        zoom = self.zoom_scale.get() / 100.0
+        new_w = max(1, int(size[0] * zoom))
+        new_h = max(1, int(size[1] * zoom))
+        
+        factor = max(1, -(-new_w // preview.width))
+        preview = preview.resize((max(1, round(new_w / factor)), max(1, round(new_h / factor))),
+                                 Image.Resampling.BILINEAR)
+        
+        self.photo = ImageTk.PhotoImage(preview)
+        if factor > 1:
+            source = self.photo
+            self.photo = tk.PhotoImage(master=self.edit_canvas)
+            self.photo.tk.call(self.photo, 'copy', source, '-zoom', factor, factor)
+        self.edit_canvas.delete("all")
+        self.edit_canvas.create_image(0, 0, anchor='nw', image=self.photo)
+        self.edit_canvas.config(scrollregion=(0, 0, new_w, new_h))
+    
     def display_image_in_canvas(self):
         """Affiche l'image dans le canvas"""
         if not self.current_panorama:
             return
         
         zoom = self.zoom_scale.get() / 100.0
-        w, h = self.current_panorama.size
-        new_w = int(w * zoom)
-        new_h = int(h * zoom)
-        
-        resized = self.current_panorama.resize((new_w, new_h), Image.Resampling.LANCZOS)
+        resized = self.current_panorama.render(zoom)
+        new_w, new_h = resized.size
         
         # Ajouter les lignes de coupe
         if self.crop_top.get() > 0 or self.crop_bottom.get() > 0:
@@ -9,6 +9,17 @@ import numpy as np
 import os
 import sys
 import time
+import json
+import zipfile
+from dataclasses import asdict, dataclass
+
+from image_io import EncodeOptions, write_image
+from profiler import NullProfiler, StageProfiler
+from strip_store import strips_path_for, write_strips
+from video_cache import file_signature, load_sidecar, save_sidecar, sidecar_path
+
+
+NULL_PROFILER = NullProfiler()
 
 
 def is_duplicate_frame(frame1, frame2, threshold=5):
@@ -43,108 +54,489 @@ def is_duplicate_frame(frame1, frame2, threshold=5):
     return change_percent < threshold
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python panorama.py <input_video>")
-        sys.exit(1)
+def detect_static_bands(gray_frames, variance_threshold=2.0, margin=2):
+    """
+    Détecte les bandes fixes (en-têtes, onglets, overlays) en haut et en bas.
+    
+    Une ligne est considérée fixe si sa variance temporelle est quasi nulle.
+    
+    Args:
+        gray_frames: Liste de frames en niveaux de gris (même taille)
+        variance_threshold: Variance moyenne en dessous de laquelle une ligne est fixe
+        margin: Lignes ajoutées à chaque bande détectée (artefacts de compression
+                à la frontière)
+    
+    Returns:
+        Tuple (top, bottom): nombre de lignes fixes en haut et en bas
+    """
+    if len(gray_frames) < 2:
+        return 0, 0
+    
+    stack = np.stack(gray_frames).astype(np.float32)
+    row_variance = stack.var(axis=0).mean(axis=1)
+    
+    moving_rows = np.flatnonzero(row_variance > variance_threshold)
+    if moving_rows.size == 0:
+        # Vidéo entièrement figée: rien à masquer
+        return 0, 0
+    
+    top = int(moving_rows[0])
+    bottom = int(row_variance.shape[0] - 1 - moving_rows[-1])
+    
+    if top > 0:
+        top += margin
+    if bottom > 0:
+        bottom += margin
+    return top, bottom
+
+
+def sample_gray_frames(cap, count, width=128):
+    """
+    Lit `count` frames réparties sur toute la vidéo, en niveaux de gris.
+    Les frames sont réduites horizontalement à `width` pixels: les lignes
+    sont conservées, ce qui suffit pour la variance par ligne.
+    La position de lecture est restaurée ensuite.
+    """
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total_frames <= 0:
+        return []
+    
+    start_position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
     
-    input_video = sys.argv[1]
-    output_file = os.path.splitext(input_video)[0] + '.png'
+    positions = np.unique(np.linspace(0, total_frames - 1, count).astype(int))
+    frames = []
+    for position in positions:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+        ret, frame = cap.read()
+        if ret:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            if gray.shape[1] > width:
+                gray = cv2.resize(gray, (width, gray.shape[0]), interpolation=cv2.INTER_AREA)
+            frames.append(gray)
     
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_position)
+    
+    # Ignorer les frames de taille différente (redimensionnement en cours de vidéo)
+    if frames:
+        frames = [f for f in frames if f.shape == frames[0].shape]
+    return frames
+
+
+def detect_scrolling_region(video_path, cap, samples=30, variance_threshold=2.0, use_cache=True):
+    """
+    Pré-passe rapide: détecte la zone qui défile à partir de frames échantillonnées.
+    
+    Le résultat est mis en cache à côté de la vidéo (clé: chemin, date, taille)
+    pour ne pas refaire l'analyse quand seuls TEMPLATE_HEIGHT/QUALITY_THRESHOLD changent.
+    
+    Returns:
+        Tuple (top, bottom, cached): lignes fixes en haut/bas, True si lu depuis le cache
+    """
+    expected = {'samples': samples, 'variance_threshold': variance_threshold}
+    
+    if use_cache:
+        cached = load_sidecar(video_path, 'bands', expected)
+        if cached is not None:
+            return cached['top'], cached['bottom'], True
+    
+    frames = sample_gray_frames(cap, samples)
+    top, bottom = detect_static_bands(frames, variance_threshold)
+    
+    if use_cache and frames:
+        save_sidecar(video_path, 'bands', dict(
+            expected, top=top, bottom=bottom, frame_height=int(frames[0].shape[0])
+        ))
+    
+    return top, bottom, False
+
+
+def crop_band(frame, roi_top, roi_bottom):
+    """Ne garde que la bande qui défile (sans les bandes fixes)"""
+    if roi_top == 0 and roi_bottom == 0:
+        return frame
+    return frame[roi_top:frame.shape[0] - roi_bottom, :]
+
+
+def print_scrolling_region(input_video):
+    """Affiche les bornes de la zone qui défile (option --detect-bands)"""
     cap = cv2.VideoCapture(input_video)
     if not cap.isOpened():
         print("Error: Could not open video file")
         sys.exit(1)
     
-    # Propriétés vidéo
-    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    samples = int(os.environ.get('ROI_SAMPLES', 30))
+    static_variance = float(os.environ.get('STATIC_BAND_VARIANCE', 2.0))
     
-    print(f"Processing: {input_video}")
-    print(f"Resolution: {frame_width}px wide, Frames: {total_frames}, FPS: {fps:.1f}")
+    start_time = time.time()
+    top, bottom, cached = detect_scrolling_region(input_video, cap, samples, static_variance)
+    cap.release()
     
-    # Lire la première frame
-    ret, prev = cap.read()
+    source = "cache" if cached else f"{samples} frames, {time.time() - start_time:.2f}s"
+    print(f"Static bands: top={top}px, bottom={bottom}px ({source})")
+    print(f"Scrolling region: rows {top} to {frame_height - bottom} of {frame_height}")
+
+
+@dataclass
+class StitchParams:
+    """Paramètres d'assemblage (transmis par variables d'environnement)"""
+    min_scroll: int = 5
+    template_height: int = 100
+    min_match_quality: float = 0.8
+    roi_top: int = 0
+    roi_bottom: int = 0
+    roi_auto: bool = False
+    roi_samples: int = 30
+    static_variance: float = 2.0
+    use_cache: bool = True
+    frame_start: int = 0
+    frame_end: int = 0  # 0 = jusqu'à la fin de la vidéo
+    
+    @classmethod
+    def from_environ(cls, environ=None):
+        """Lit les paramètres depuis l'environnement (valeurs par défaut sinon)"""
+        if environ is None:
+            environ = os.environ
+        return cls(
+            min_scroll=int(environ.get('MIN_SCROLL', 5)),
+            template_height=int(environ.get('TEMPLATE_HEIGHT', 100)),
+            min_match_quality=float(environ.get('QUALITY_THRESHOLD', 0.8)),
+            roi_top=int(environ.get('ROI_TOP', 0)),
+            roi_bottom=int(environ.get('ROI_BOTTOM', 0)),
+            roi_auto=environ.get('ROI_AUTO', '0') == '1',
+            roi_samples=int(environ.get('ROI_SAMPLES', 30)),
+            static_variance=float(environ.get('STATIC_BAND_VARIANCE', 2.0)),
+            use_cache=environ.get('MATCH_CACHE', '1') == '1',
+            frame_start=int(environ.get('FRAME_START', 0)),
+            frame_end=int(environ.get('FRAME_END', 0)),
+        )
+    
+    def accepts(self, max_val, rows):
+        """Décision d'ajout: match assez bon et assez de nouvelles lignes"""
+        return max_val > self.min_match_quality and rows > max(self.min_scroll, 0)
+
+
+class MatchLog:
+    """
+    Résultats de matching par frame, persistés à côté de la vidéo.
+    
+    Pour chaque frame après la première: doublon ou non, position du match,
+    qualité et nombre de lignes nouvelles sous le template. Ces valeurs ne
+    dépendent que du panorama courant: tant que les décisions d'ajout sont
+    les mêmes, un nouvel assemblage avec d'autres seuils peut les rejouer.
+    """
+    
+    KIND = 'matches'
+    
+    def __init__(self, min_match_quality=0.8, min_scroll=5):
+        self.min_match_quality = min_match_quality
+        self.min_scroll = min_scroll
+        self.duplicate = []
+        self.match_y = []
+        self.max_val = []
+        self.rows = []
+    
+    def __len__(self):
+        return len(self.duplicate)
+    
+    def append(self, duplicate, match_y=0, max_val=0.0, rows=0):
+        self.duplicate.append(bool(duplicate))
+        self.match_y.append(int(match_y))
+        self.max_val.append(float(max_val))
+        self.rows.append(int(rows))
+    
+    def accepted(self, index):
+        """Décision d'ajout prise lors de l'enregistrement"""
+        return (self.max_val[index] > self.min_match_quality
+                and self.rows[index] > max(self.min_scroll, 0))
+    
+    def quality_summary(self):
+        """
+        Qualité des matchs (hors doublons).
+        
+        Returns:
+            Tuple (moyenne, minimum, nombre de matchs), (None, None, 0) si aucun
+        """
+        values = [v for v, duplicate in zip(self.max_val, self.duplicate) if not duplicate]
+        if not values:
+            return None, None, 0
+        return sum(values) / len(values), min(values), len(values)
+    
+    @staticmethod
+    def cache_key(params, frame_width):
+        """Paramètres qui invalident les résultats s'ils changent"""
+        return {
+            'template_height': params.template_height,
+            'roi_top': params.roi_top,
+            'roi_bottom': params.roi_bottom,
+            'frame_width': frame_width,
+        }
+    
+    @classmethod
+    def load(cls, video_path, key):
+        """Charge les résultats s'ils correspondent à la vidéo et aux paramètres"""
+        path = sidecar_path(video_path, cls.KIND, 'npz')
+        if not path.exists():
+            return None
+        
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data['meta']))
+                if meta.get('signature') != file_signature(video_path) or meta.get('key') != key:
+                    return None
+                
+                log = cls(meta['min_match_quality'], meta['min_scroll'])
+                log.duplicate = data['duplicate'].tolist()
+                log.match_y = data['match_y'].tolist()
+                log.max_val = data['max_val'].tolist()
+                log.rows = data['rows'].tolist()
+                return log
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # Fichier tronqué (arrêt pendant l'écriture d'une ancienne version): pas de cache
+            return None
+    
+    def save(self, video_path, key):
+        """Enregistre les résultats dans <vidéo>.matches.npz"""
+        path = sidecar_path(video_path, self.KIND, 'npz')
+        meta = {
+            'signature': file_signature(video_path),
+            'key': key,
+            'min_match_quality': self.min_match_quality,
+            'min_scroll': self.min_scroll,
+        }
+        
+        tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+        
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    meta=np.array(json.dumps(meta)),
+                    duplicate=np.array(self.duplicate, dtype=bool),
+                    match_y=np.array(self.match_y, dtype=np.int32),
+                    max_val=np.array(self.max_val, dtype=np.float64),
+                    rows=np.array(self.rows, dtype=np.int32),
+                )
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"Warning: could not save match cache: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+
+
+class PanoramaBuffer:
+    """
+    Panorama en construction, stocké par morceaux.
+    
+    np.vstack à chaque frame recopie tout le panorama (coût quadratique et
+    pic mémoire double); ici chaque ajout ne copie que les nouvelles lignes
+    et l'image complète n'est assemblée qu'une fois, à la fin.
+    """
+    
+    def __init__(self, first_band):
+        self.chunks = [first_band.copy()]
+        self.height = first_band.shape[0]
+    
+    def append(self, rows):
+        """Ajoute des lignes sous le panorama"""
+        if rows.shape[0]:
+            self.chunks.append(rows.copy())
+            self.height += rows.shape[0]
+    
+    def tail(self, count):
+        """Les `count` dernières lignes (ou tout le panorama s'il est plus court)"""
+        last = self.chunks[-1]
+        if last.shape[0] >= count:
+            return last[-count:]
+        
+        parts = []
+        remaining = count
+        for chunk in reversed(self.chunks):
+            parts.append(chunk[-remaining:] if chunk.shape[0] > remaining else chunk)
+            remaining -= parts[-1].shape[0]
+            if remaining <= 0:
+                break
+        return np.concatenate(parts[::-1])
+    
+    def to_array(self):
+        """Image complète (un seul assemblage)"""
+        if len(self.chunks) > 1:
+            self.chunks = [np.concatenate(self.chunks)]
+        return self.chunks[0]
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (Mo), ou None si indisponible"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, kilo-octets ailleurs
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def print_peak_memory():
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"Peak memory: {peak:.0f} MB")
+
+
+def save_strips(output_file, panorama, params, source):
+    """Écrit aussi le stockage par bandes du panorama si STRIP_STORE=1"""
+    if os.environ.get('STRIP_STORE', '0') != '1':
+        return
+    path = strips_path_for(output_file)
+    try:
+        write_strips(path, panorama, {'source': source, 'params': asdict(params)}, bgr=True)
+        print(f"Saved strips to {path}")
+    except OSError as e:
+        print(f"Warning: could not write strips: {e}")
+
+
+def read_band(cap, frame_width, params, profiler=NULL_PROFILER):
+    """Décode la frame courante, à largeur constante, réduite à la bande qui défile"""
+    with profiler.stage('decode'):
+        ret, frame = cap.retrieve()
     if not ret:
-        print("Error: Failed to read first frame")
-        sys.exit(1)
+        return None
+    profiler.count('frames_decoded')
     
-    # Initialiser le panorama
-    panorama = prev.copy()
+    # Maintenir une largeur constante
+    if frame.shape[1] != frame_width:
+        ratio = frame_width / frame.shape[1]
+        new_height = int(frame.shape[0] * ratio)
+        with profiler.stage('resize'):
+            frame = cv2.resize(frame, (frame_width, new_height))
     
-    # Paramètres (depuis environnement ou valeurs par défaut)
-    min_scroll = int(os.environ.get('MIN_SCROLL', 5))
-    template_height = int(os.environ.get('TEMPLATE_HEIGHT', 100))
-    min_match_quality = float(os.environ.get('QUALITY_THRESHOLD', 0.8))
+    return crop_band(frame, params.roi_top, params.roi_bottom)
+
+
+def stitch(cap, first_band, frame_width, total_frames, params, cache=None, frame_limit=0,
+           profiler=NULL_PROFILER):
+    """
+    Assemble les frames restantes de la vidéo sous la première.
     
-    frame_count = 1
-    last_frame = prev.copy()
+    Args:
+        cap: cv2.VideoCapture positionné après la première frame
+        first_band: Première frame (bande qui défile)
+        frame_width: Largeur de référence
+        total_frames: Nombre total de frames (progression)
+        params: StitchParams
+        cache: MatchLog d'une exécution précédente (rejoué si possible)
+        frame_limit: Nombre de frames à assembler (0 = jusqu'à la fin)
+        profiler: StageProfiler (mesures ignorées par défaut)
+    
+    Returns:
+        Tuple (panorama, log: MatchLog, stats: dict)
+    """
+    panorama = PanoramaBuffer(first_band)
+    last_frame = first_band
+    log = MatchLog(params.min_match_quality, params.min_scroll)
     duplicates_skipped = 0
+    replayed = 0
+    diverged = cache is None
     
-    print(f"Parameters: template_height={template_height}, quality={min_match_quality}")
-    print("Processing frames...")
+    frame_count = 1
     start_time = time.time()
     
-    while True:
-        ret, curr = cap.read()
-        if not ret:
+    while frame_limit <= 0 or frame_count < frame_limit:
+        with profiler.stage('grab'):
+            grabbed = cap.grab()
+        if not grabbed:
             break
         
-        # Maintenir une largeur constante
-        if curr.shape[1] != frame_width:
-            ratio = frame_width / curr.shape[1]
-            new_height = int(curr.shape[0] * ratio)
-            curr = cv2.resize(curr, (frame_width, new_height))
+        index = len(log)
+        cached = cache is not None and index < len(cache)
+        curr = None
+        
+        # 1. Vérifier les doublons (indépendant des seuils: toujours rejouable)
+        if cached:
+            duplicate = cache.duplicate[index]
+            last_frame = None
+        else:
+            curr = read_band(cap, frame_width, params, profiler)
+            if curr is None:
+                break
+            with profiler.stage('duplicate'):
+                duplicate = is_duplicate_frame(last_frame, curr)
+            last_frame = curr
         
-        # 1. Vérifier les doublons
-        if is_duplicate_frame(last_frame, curr):
+        if duplicate:
             duplicates_skipped += 1
+            profiler.count('duplicates')
+            log.append(True)
             print(f"Frame {frame_count}: Duplicate skipped ({duplicates_skipped} total)")
             frame_count += 1
-            last_frame = curr.copy()
             continue
         
-        # Convertir en niveaux de gris
-        curr_gray = cv2.cvtColor(curr, cv2.COLOR_BGR2GRAY)
+        # 2. Rejouer le résultat enregistré tant que les décisions d'ajout sont identiques
+        from_cache = False
+        if cached and not diverged:
+            match_y = cache.match_y[index]
+            max_val = cache.max_val[index]
+            rows = cache.rows[index]
+            if params.accepts(max_val, rows) == cache.accepted(index):
+                from_cache = True
+                replayed += 1
+                profiler.count('frames_replayed')
+            else:
+                # Le panorama diffère à partir d'ici: matching réel pour la suite
+                diverged = True
+                print(f"Frame {frame_count}: Cache diverges, matching from here")
         
-        # 2. Template matching - utiliser le bas du panorama comme template
-        if panorama.shape[0] < template_height:
-            template = panorama
-        else:
-            template = panorama[-template_height:, :]
-        
-        template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        if not from_cache:
+            if curr is None:
+                curr = read_band(cap, frame_width, params, profiler)
+                if curr is None:
+                    break
+            
+            # Template matching - utiliser le bas du panorama comme template
+            template = panorama.tail(params.template_height)
+            
+            # Convertir en niveaux de gris
+            with profiler.stage('grayscale'):
+                curr_gray = cv2.cvtColor(curr, cv2.COLOR_BGR2GRAY)
+                template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+            
+            # Chercher le template dans toute la frame courante (algorithme original)
+            with profiler.stage('matchTemplate'):
+                result = cv2.matchTemplate(curr_gray, template_gray, cv2.TM_CCOEFF_NORMED)
+            with profiler.stage('minMaxLoc'):
+                _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            match_y = max_loc[1]
+            
+            # Lignes sous la région matchée
+            rows = curr.shape[0] - (match_y + template_gray.shape[0])
         
-        # Chercher le template dans toute la frame courante (algorithme original)
-        result = cv2.matchTemplate(curr_gray, template_gray, cv2.TM_CCOEFF_NORMED)
-        _, max_val, _, max_loc = cv2.minMaxLoc(result)
-        match_y = max_loc[1]
+        log.append(False, match_y, max_val, rows)
         
-        # Calculer le scroll
-        scroll_amount = match_y
-        
-        # 3. Ajouter le nouveau contenu
+        # 3. Ajouter le nouveau contenu (décodé seulement s'il contribue)
         content_added = 0
-        if max_val > min_match_quality:
-            # Contenu sous la région matchée
-            content_start = match_y + template_gray.shape[0]
-            if content_start < curr.shape[0]:
-                new_content = curr[content_start:, :]
-                if new_content.shape[0] > min_scroll:
-                    panorama = np.vstack((panorama, new_content))
-                    content_added = new_content.shape[0]
+        if params.accepts(max_val, rows):
+            if curr is None:
+                curr = read_band(cap, frame_width, params, profiler)
+            if curr is not None:
+                new_content = curr[curr.shape[0] - rows:, :]
+                with profiler.stage('append'):
+                    panorama.append(new_content)
+                content_added = new_content.shape[0]
+                profiler.count('bytes_appended', new_content.nbytes)
+        elif max_val <= params.min_match_quality:
+            profiler.count('low_quality')
         
         # Status
-        status = f"Match: {max_val:.2f}, Scroll: {scroll_amount}px"
+        status = f"Match: {max_val:.2f}, Scroll: {match_y}px"
         if content_added:
             status += f", Added: {content_added}px"
         else:
             status += ", No new content"
+        if from_cache:
+            status += " (cached)"
         print(f"Frame {frame_count}: {status}")
         
-        # Mise à jour
-        last_frame = curr.copy()
         frame_count += 1
         
         # Progression toutes les 10 frames
@@ -154,21 +546,216 @@ def main():
             print(f"Progress: {frame_count}/{total_frames} frames | "
                   f"Elapsed: {elapsed:.1f}s | "
                   f"FPS: {fps_processed:.1f} | "
-                  f"Height: {panorama.shape[0]}px")
+                  f"Height: {panorama.height}px")
+    
+    stats = {
+        'frames': frame_count,
+        'duplicates_skipped': duplicates_skipped,
+        'replayed': replayed,
+        'elapsed': time.time() - start_time,
+    }
+    with profiler.stage('concatenate'):
+        panorama = panorama.to_array()
+    return panorama, log, stats
+
+
+def merge_partials(partials, template_height=100, min_match_quality=0.8, search_rows=0):
+    """
+    Fusionne des panoramas partiels assemblés sur des plages de frames
+    chevauchantes.
+    
+    Le bas de chaque partiel est recherché (template matching) dans le haut
+    du suivant, qui reprend quelques frames avant la fin du précédent; seules
+    les lignes situées sous la correspondance sont ajoutées.
+    
+    Args:
+        partials: Panoramas partiels dans l'ordre de la vidéo
+        template_height: Hauteur du template de raccord
+        min_match_quality: Qualité minimale d'un raccord
+        search_rows: Lignes du partiel suivant où chercher (0 = tout)
+    
+    Returns:
+        Tuple (panorama ou None si un raccord échoue, qualités des raccords)
+    """
+    panorama = PanoramaBuffer(partials[0])
+    qualities = []
+    
+    for part in partials[1:]:
+        template = panorama.tail(template_height)
+        region = part[:search_rows] if search_rows > 0 else part
+        if region.shape[0] < template.shape[0]:
+            return None, qualities
+        
+        result = cv2.matchTemplate(
+            cv2.cvtColor(region, cv2.COLOR_BGR2GRAY),
+            cv2.cvtColor(template, cv2.COLOR_BGR2GRAY),
+            cv2.TM_CCOEFF_NORMED
+        )
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        qualities.append(max_val)
+        if max_val < min_match_quality:
+            return None, qualities
+        
+        panorama.append(part[max_loc[1] + template.shape[0]:])
+    
+    return panorama.to_array(), qualities
+
+
+def merge_main(output_file, partial_files):
+    """Fusionne des panoramas partiels (python panorama.py --merge ...)"""
+    start_time = time.time()
+    params = StitchParams.from_environ()
+    search_rows = int(os.environ.get('MERGE_SEARCH_ROWS', 0))
+    
+    partials = []
+    for path in partial_files:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"Error: Could not read {path}")
+            sys.exit(1)
+        partials.append(image)
+    
+    if len({image.shape[1] for image in partials}) != 1:
+        print("Error: Partial panoramas have different widths")
+        sys.exit(1)
+    
+    panorama, qualities = merge_partials(
+        partials, params.template_height, params.min_match_quality, search_rows
+    )
+    for i, quality in enumerate(qualities, 1):
+        print(f"Seam {i}: Match: {quality:.2f}")
+    if panorama is None:
+        print("Error: Partial panoramas could not be joined", file=sys.stderr)
+        sys.exit(1)
+    
+    write_image(output_file, panorama, bgr=True, options=EncodeOptions.from_environ())
+    save_strips(output_file, panorama, params, os.environ.get('SOURCE_VIDEO', ''))
+    print(f"\nSaved panorama to {output_file}")
+    print(f"Final dimensions: {panorama.shape[1]}x{panorama.shape[0]} pixels")
+    print(f"Processing time: {time.time() - start_time:.1f} seconds")
+    print_peak_memory()
+
+
+def main():
+    # --profile: résumé des temps par étape (équivaut à PANORAMA_PROFILE=1)
+    args = sys.argv[1:]
+    profile = '--profile' in args
+    if profile:
+        args.remove('--profile')
+    
+    if len(args) < 1:
+        print("Usage: python panorama.py [--profile] <input_video>")
+        print("   ou: python panorama.py --detect-bands <input_video>")
+        print("   ou: python panorama.py --merge <output> <partiel1> <partiel2> ...")
+        sys.exit(1)
+    
+    if args[0] == '--detect-bands':
+        if len(args) < 2:
+            print("Usage: python panorama.py --detect-bands <input_video>")
+            sys.exit(1)
+        print_scrolling_region(args[1])
+        return
     
+    if args[0] == '--merge':
+        if len(args) < 3:
+            print("Usage: python panorama.py --merge <output> <partiel1> <partiel2> ...")
+            sys.exit(1)
+        merge_main(args[1], args[2:])
+        return
+    
+    input_video = args[0]
+    profiler = StageProfiler.from_environ(enabled=profile)
+    output_file = os.environ.get('OUTPUT_FILE') or os.path.splitext(input_video)[0] + '.png'
+    
+    cap = cv2.VideoCapture(input_video)
+    if not cap.isOpened():
+        print("Error: Could not open video file")
+        sys.exit(1)
+    
+    # Propriétés vidéo
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    
+    # Paramètres (depuis environnement ou valeurs par défaut)
+    params = StitchParams.from_environ()
+    
+    # Plage de frames (assemblage découpé): le cache couvre la vidéo entière
+    frame_limit = 0
+    if params.frame_start or params.frame_end:
+        end = params.frame_end if params.frame_end > 0 else total_frames
+        print(f"Frame range: {params.frame_start} to {end}")
+        cap.set(cv2.CAP_PROP_POS_FRAMES, params.frame_start)
+        total_frames = frame_limit = max(end - params.frame_start, 1)
+        params.use_cache = False
+    
+    print(f"Processing: {input_video}")
+    print(f"Resolution: {frame_width}px wide, Frames: {total_frames}, FPS: {fps:.1f}")
+    
+    # Lire la première frame
+    ret, prev = cap.read()
+    if not ret:
+        print("Error: Failed to read first frame")
+        sys.exit(1)
+    
+    # Bandes fixes: détection automatique si demandée
+    if params.roi_auto:
+        params.roi_top, params.roi_bottom, cached = detect_scrolling_region(
+            input_video, cap, params.roi_samples, params.static_variance
+        )
+        source = " (cached)" if cached else ""
+        print(f"Static bands detected: top={params.roi_top}px, bottom={params.roi_bottom}px{source}")
+    
+    # La bande restante doit pouvoir contenir le template et du défilement
+    band_height = prev.shape[0] - params.roi_top - params.roi_bottom
+    if (params.roi_top or params.roi_bottom) and band_height < params.template_height + params.min_scroll:
+        print(f"Warning: scrolling band too small ({band_height}px), ROI disabled")
+        params.roi_top, params.roi_bottom = 0, 0
+    
+    # Initialiser le panorama avec la bande qui défile uniquement
+    prev = crop_band(prev, params.roi_top, params.roi_bottom)
+    
+    # Résultats de matching d'une exécution précédente
+    cache_key = MatchLog.cache_key(params, frame_width)
+    cache = MatchLog.load(input_video, cache_key) if params.use_cache else None
+    
+    print(f"Parameters: template_height={params.template_height}, quality={params.min_match_quality}")
+    if params.roi_top or params.roi_bottom:
+        print(f"ROI: rows {params.roi_top} to -{params.roi_bottom} ({band_height}px band)")
+    if cache is not None:
+        print(f"Match cache: {len(cache)} frames")
+    print("Processing frames...")
+    start_time = time.time()
+    
+    panorama, log, stats = stitch(
+        cap, prev, frame_width, total_frames, params, cache, frame_limit, profiler
+    )
     cap.release()
     
     if panorama.size == 0:
         print("Error: Empty panorama generated")
         sys.exit(1)
     
+    if params.use_cache:
+        log.save(input_video, cache_key)
+    
     # Sauvegarder
-    cv2.imwrite(output_file, panorama)
+    with profiler.stage('imwrite'):
+        write_image(output_file, panorama, bgr=True, options=EncodeOptions.from_environ())
+    with profiler.stage('strips'):
+        save_strips(output_file, panorama, params, os.path.basename(input_video))
     print(f"\nSaved panorama to {output_file}")
     print(f"Final dimensions: {panorama.shape[1]}x{panorama.shape[0]} pixels")
-    print(f"Duplicates skipped: {duplicates_skipped}")
+    print(f"Duplicates skipped: {stats['duplicates_skipped']}")
+    if cache is not None:
+        print(f"Frames replayed from cache: {stats['replayed']}")
+    mean_quality, min_quality, matches = log.quality_summary()
+    if matches:
+        print(f"Match quality: mean {mean_quality:.3f}, min {min_quality:.3f} ({matches} matches)")
     print(f"Processing time: {time.time() - start_time:.1f} seconds")
+    print_peak_memory()
+    profiler.report()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
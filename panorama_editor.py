@@ -4,10 +4,12 @@ Module 2 : Édition des panoramas
 Version améliorée avec meilleure gestion d'erreurs
 """
 
-from PIL import Image, ImageDraw
+import threading
+from dataclasses import replace
 from tkinter import messagebox
 
 from config import config
+from seam_detector import detect_seams
 
 
 class PanoramaEditor:
@@ -15,6 +17,9 @@ class PanoramaEditor:
     
     def __init__(self, parent):
         self.parent = parent
+        # Lignes répétées proposées (coordonnées de la vue affichée)
+        self.seams = []
+        self.seam_index = -1
     
     def start_crop_drag(self, event):
         """Démarre le drag pour définir une zone à enlever"""
@@ -134,8 +139,21 @@ class PanoramaEditor:
             self.parent.display_image_in_canvas()
             self.parent.log(f"🔍 Zoom ajusté à {int(optimal_zoom)}%")
     
+    def _locked(self):
+        """
+        Édition et sauvegarde suspendues pendant l'application d'un préréglage:
+        ses écritures ne doivent pas croiser celles de l'éditeur (l'image
+        affichée est de toute façon rechargée à la fin).
+        """
+        if self.parent.preset_running():
+            self.parent.log("ℹ️  Préréglage en cours d'application: édition suspendue")
+            return True
+        return False
+    
     def apply_crop(self):
         """Applique le recadrage"""
+        if self._locked():
+            return
         if not self.parent.current_panorama:
             self.parent.log("ℹ️  Aucune image chargée")
             return
@@ -160,32 +178,16 @@ class PanoramaEditor:
                 return
             
             old_height = h
+            self.parent.current_panorama.remove_rows(y_top, y_bottom)
+            self.parent.display_image_in_canvas()
             
-            try:
-                # Découper et recoller
-                top_part = self.parent.current_panorama.crop((0, 0, w, y_top))
-                bottom_part = self.parent.current_panorama.crop((0, y_bottom, w, h))
-                
-                new_height = top_part.height + bottom_part.height
-                new_image = Image.new('RGB', (w, new_height))
-                new_image.paste(top_part, (0, 0))
-                new_image.paste(bottom_part, (0, top_part.height))
-                
-                self.parent.current_panorama = new_image
-                self.parent.display_image_in_canvas()
-                
-                w, h = self.parent.current_panorama.size
-                self.parent.info_label.config(text=f"Taille: {w}x{h}px")
-                
-                pixels_removed = old_height - h
-                self.parent.log(f"✂️ Zone du milieu enlevée: {self.parent.current_day}")
-                self.parent.log(f"   Enlevé de {y_top}px à {y_bottom}px")
-                self.parent.log(f"   {pixels_removed}px supprimés (nouvelle hauteur: {h}px)")
+            w, h = self.parent.current_panorama.size
+            self.parent.info_label.config(text=f"Taille: {w}x{h}px")
             
-            except Exception as e:
-                self.parent.log(f"❌ Erreur lors du crop: {e}")
-                messagebox.showerror("Erreur", f"Erreur lors du recadrage:\n{e}")
-                return
+            pixels_removed = old_height - h
+            self.parent.log(f"✂️ Zone du milieu enlevée: {self.parent.current_day}")
+            self.parent.log(f"   Enlevé de {y_top}px à {y_bottom}px")
+            self.parent.log(f"   {pixels_removed}px supprimés (nouvelle hauteur: {h}px)")
         
         elif bottom_px > 0:
             # Une seule ligne : coupe en bas
@@ -197,70 +199,65 @@ class PanoramaEditor:
                 return
             
             old_height = h
+            self.parent.current_panorama.remove_rows(bottom, h)
+            self.parent.display_image_in_canvas()
             
-            try:
-                self.parent.current_panorama = self.parent.current_panorama.crop((0, 0, w, bottom))
-                self.parent.display_image_in_canvas()
-                
-                w, h = self.parent.current_panorama.size
-                self.parent.info_label.config(text=f"Taille: {w}x{h}px")
-                
-                pixels_removed = old_height - h
-                self.parent.log(f"✂️ Recadrage appliqué (bas): {self.parent.current_day}")
-                self.parent.log(f"   {pixels_removed}px supprimés (nouvelle hauteur: {h}px)")
+            w, h = self.parent.current_panorama.size
+            self.parent.info_label.config(text=f"Taille: {w}x{h}px")
             
-            except Exception as e:
-                self.parent.log(f"❌ Erreur lors du crop: {e}")
-                messagebox.showerror("Erreur", f"Erreur lors du recadrage:\n{e}")
-                return
+            pixels_removed = old_height - h
+            self.parent.log(f"✂️ Recadrage appliqué (bas): {self.parent.current_day}")
+            self.parent.log(f"   {pixels_removed}px supprimés (nouvelle hauteur: {h}px)")
         else:
             self.parent.log("ℹ️  Aucune ligne définie")
             return
         
+        # Propositions restantes décalées par la suppression
+        self._shift_seams(*self.parent.current_panorama.ops[-1])
+        
         # Réinitialiser
         self.parent.crop_top.set(0)
         self.parent.crop_bottom.set(0)
         self.parent.crop_drag_start = None
     
     def save_edited_panorama(self):
-        """Sauvegarde le panorama édité"""
+        """Sauvegarde le panorama édité (en arrière-plan, voir on_save_done)"""
+        if self._locked():
+            return
         if not self.parent.current_panorama or not self.parent.current_day:
             self.parent.log("ℹ️  Aucune image à sauvegarder")
             return
         
-        try:
-            output_path = self.parent.panorama_files[self.parent.current_day]
-            self.parent.current_panorama.save(output_path)
-            
-            # Mettre à jour l'original
-            self.parent.original_panorama = self.parent.current_panorama.copy()
-            
-            w, h = self.parent.current_panorama.size
-            self.parent.log(f"💾 Sauvegardé: {self.parent.current_day}.png ({w}x{h}px)")
-            
-            # Notification visuelle
-            self.parent.info_label.config(text=f"✅ Sauvegardé!\nTaille: {w}x{h}px")
-            self.parent.root.after(2000, lambda: self.parent.info_label.config(text=f"Taille: {w}x{h}px"))
-        
-        except PermissionError:
-            self.parent.log(f"❌ Permission refusée pour sauvegarder")
-            messagebox.showerror("Erreur", "Permission refusée pour sauvegarder le fichier")
-        
-        except IOError as e:
-            self.parent.log(f"❌ Erreur I/O: {e}")
-            messagebox.showerror("Erreur", f"Erreur d'écriture:\n{e}")
-        
-        except Exception as e:
-            self.parent.log(f"❌ Erreur lors de la sauvegarde: {e}")
-            messagebox.showerror("Erreur", f"Impossible de sauvegarder:\n{e}")
+        output_path = self.parent.panorama_files[self.parent.current_day]
+        if self.parent.panorama_saver.save(self.parent.current_panorama, output_path):
+            self.parent.log(f"💾 Sauvegarde en cours: {self.parent.current_day}.png")
+        else:
+            self.parent.log(f"💾 Sauvegarde de {self.parent.current_day}.png remplacée par la plus récente")
     
-    def undo_changes(self):
-        """Annule les modifications"""
-        if not self.parent.original_panorama:
-            self.parent.log("ℹ️  Rien à annuler")
+    def on_save_done(self, path, size, error):
+        """Fin d'une sauvegarde en arrière-plan (thread Tk)"""
+        if error is not None:
+            self.parent.log(f"❌ Erreur lors de la sauvegarde de {path.name}: {error}")
+            messagebox.showerror("Erreur", f"Impossible de sauvegarder {path.name}:\n{error}")
             return
         
-        self.parent.current_panorama = self.parent.original_panorama.copy()
+        w, h = size
+        self.parent.log(f"💾 Sauvegardé: {path.name} ({w}x{h}px)")
+        
+        # Notification visuelle si le panorama sauvegardé est affiché
+        current = self.parent.panorama_files.get(self.parent.current_day)
+        if current is not None and path == current and self.parent.current_panorama:
+            self.parent.info_label.config(text=f"✅ Sauvegardé!\nTaille: {w}x{h}px")
+            self.parent.root.after(2000, self._show_size)
+    
+    def _show_size(self):
+        if self.parent.current_panorama:
+            w, h = self.parent.current_panorama.size
+            self.parent.info_label.config(text=f"Taille: {w}x{h}px")
+    
+    def _refresh_after_history(self, message):
+        """Réaffiche la vue après annuler/rétablir"""
+        self.clear_seams()
         self.parent.crop_top.set(0)
         self.parent.crop_bottom.set(0)
         self.parent.crop_drag_start = None
@@ -268,8 +265,127 @@ class PanoramaEditor:
         
         w, h = self.parent.current_panorama.size
         self.parent.info_label.config(text=f"Taille: {w}x{h}px")
+        self.parent.log(message)
+    
+    def undo_changes(self):
+        """Annule le dernier recadrage"""
+        if self._locked():
+            return
+        view = self.parent.current_panorama
+        if not view or not view.undo():
+            self.parent.log("ℹ️  Rien à annuler")
+            return
+        
+        self._refresh_after_history(f"↩️  Recadrage annulé ({len(view.ops)} restant(s))")
+    
+    def redo_changes(self):
+        """Rétablit le dernier recadrage annulé"""
+        if self._locked():
+            return
+        view = self.parent.current_panorama
+        if not view or not view.redo():
+            self.parent.log("ℹ️  Rien à rétablir")
+            return
+        
+        self._refresh_after_history(f"↪️  Recadrage rétabli ({len(view.redo_ops)} annulé(s))")
+    
+    # ===== LIGNES RÉPÉTÉES =====
+    
+    def clear_seams(self):
+        """Oublie les propositions (autre image ou vue modifiée)"""
+        self.seams = []
+        self.seam_index = -1
+    
+    def detect_repeated_rows(self):
+        """Cherche les lignes répétées par l'assemblage (hors du thread Tk)"""
+        view = self.parent.current_panorama
+        if not view:
+            self.parent.log("ℹ️  Aucune image chargée")
+            return
+        
+        snapshot = view.snapshot()
+        load_id = self.parent.panorama_load_id
+        self.parent.log(f"🔎 Recherche des lignes répétées ({snapshot.height} lignes)...")
+        
+        def worker():
+            try:
+                seams, error = detect_seams(snapshot), None
+            except Exception as e:
+                seams, error = [], str(e)
+            self.parent.update_queue.put(('seams_found', load_id, snapshot.ops, seams, error))
         
-        self.parent.log("↩️  Modifications annulées")
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def on_seams_found(self, load_id, ops, seams, error):
+        """Résultat de la détection (thread Tk)"""
+        view = self.parent.current_panorama
+        if load_id != self.parent.panorama_load_id or not view or view.ops != ops:
+            self.parent.log("ℹ️  Détection ignorée: l'image a changé entre-temps")
+            return
+        
+        if error is not None:
+            self.parent.log(f"❌ Erreur lors de la détection: {error}")
+            return
+        
+        self.seams = seams
+        self.seam_index = -1
+        if not seams:
+            self.parent.log("✅ Aucune ligne répétée détectée")
+            return
+        
+        self.parent.log(f"🔎 {len(seams)} répétition(s) détectée(s), {sum(seam.rows for seam in seams)}px au total")
+        self.next_seam()
+    
+    def next_seam(self):
+        """Affiche la proposition suivante comme zone à enlever"""
+        view = self.parent.current_panorama
+        if not view or not self.seams:
+            self.parent.log("ℹ️  Aucune répétition proposée")
+            return
+        
+        self.seam_index = (self.seam_index + 1) % len(self.seams)
+        seam = self.seams[self.seam_index]
+        h = view.height
+        
+        if seam.end >= h:
+            # Répétition en bas de l'image: simple coupe basse
+            self.parent.crop_top.set(0)
+            self.parent.crop_bottom.set(h - seam.start)
+        else:
+            self.parent.crop_top.set(seam.start)
+            self.parent.crop_bottom.set(h - seam.end)
+        self.parent.display_image_in_canvas()
+        
+        self.parent.edit_canvas.update_idletasks()
+        self.parent.edit_canvas.yview_moveto(max(seam.start - seam.offset, 0) / h)
+        
+        self.parent.log(f"🔎 Répétition {self.seam_index + 1}/{len(self.seams)}: lignes {seam.start}-{seam.end} "
+                        f"({seam.rows}px, copie des lignes {seam.start - seam.offset}-{seam.end - seam.offset})")
+        self.parent.log("   ✂️ Appliquer recadrage pour l'enlever")
+    
+    def _shift_seams(self, start, end):
+        """
+        Met à jour les propositions après la suppression des lignes [start, end).
+        Une proposition dont la copie d'origine a été (même en partie)
+        supprimée est abandonnée: elle serait désormais la seule copie.
+        """
+        removed = end - start
+        remaining = []
+        for index, seam in enumerate(self.seams):
+            source_start, source_end = seam.start - seam.offset, seam.end - seam.offset
+            if seam.start < end and seam.end > start or source_start < end and source_end > start:
+                if index <= self.seam_index:
+                    self.seam_index -= 1  # La proposition suivante reste la suivante
+            elif seam.end <= start:
+                remaining.append(seam)
+            elif source_end <= start:
+                # Copie d'origine avant la coupe, proposition après: l'écart diminue
+                remaining.append(replace(seam, start=seam.start - removed, end=seam.end - removed,
+                                         offset=seam.offset - removed))
+            else:
+                remaining.append(replace(seam, start=seam.start - removed, end=seam.end - removed))
+        self.seams = remaining
+        self.seam_index = min(self.seam_index, len(remaining) - 1)
     
     def zoom_image(self, event):
         """Zoom avec la molette"""
@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Exécution de panorama.py en sous-processus
+Partagé entre l'interface graphique et le traitement par lots
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import config
+from build_manifest import fingerprint, input_metadata
+from image_io import EncodeOptions
+from run_history import RunHistory
+from strip_store import strips_path_for
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def detect_day_from_filename(filename, days=None):
+    """
+    Détecte le jour depuis le nom d'un fichier (sans extension).
+    
+    Returns:
+        'semaine', un jour de `days` (défaut: config.days) ou None
+    """
+    if days is None:
+        days = config.days
+    
+    filename_lower = filename.lower()
+    if 'semaine' in filename_lower:
+        return 'semaine'
+    for day in days:
+        if day in filename_lower:
+            return day
+    return None
+
+
+def find_panorama_script():
+    """Chemin de panorama.py (dossier courant puis dossier du module), ou None"""
+    script_path = Path('panorama.py')
+    if script_path.exists():
+        return script_path
+    
+    script_path = Path(__file__).parent / 'panorama.py'
+    if script_path.exists():
+        return script_path
+    
+    return None
+
+
+def stitch_parameters(template_height=None, quality_threshold=None,
+                      roi_top=None, roi_bottom=None, roi_auto=None):
+    """
+    Paramètres d'assemblage transmis à panorama.py (variables d'environnement).
+    Les valeurs non fournies sont prises dans la configuration.
+    """
+    if template_height is None:
+        template_height = config.template_height
+    if quality_threshold is None:
+        quality_threshold = config.quality_threshold
+    if roi_top is None:
+        roi_top = config.roi_top
+    if roi_bottom is None:
+        roi_bottom = config.roi_bottom
+    if roi_auto is None:
+        roi_auto = config.roi_auto
+    
+    return {
+        'TEMPLATE_HEIGHT': str(int(template_height)),
+        'QUALITY_THRESHOLD': str(quality_threshold),
+        'MIN_SCROLL': str(config.min_scroll),
+        'DUPLICATE_THRESHOLD': str(config.duplicate_threshold),
+        'ROI_TOP': str(int(roi_top)),
+        'ROI_BOTTOM': str(int(roi_bottom)),
+        'ROI_AUTO': '1' if roi_auto else '0',
+        'ROI_SAMPLES': str(config.roi_samples),
+        'STATIC_BAND_VARIANCE': str(config.static_band_variance),
+    }
+
+
+def video_fingerprint(video_path, params):
+    """Empreinte: métadonnées de la vidéo + paramètres d'assemblage"""
+    return fingerprint({'video': input_metadata(video_path), 'params': params})
+
+
+def probe_video(video_path):
+    """
+    Lit les propriétés d'une vidéo sans la décoder.
+    
+    Returns:
+        Dict {frames, width, height, fps, size} (0 si indisponible)
+    """
+    video_path = Path(video_path)
+    info = {'frames': 0, 'width': 0, 'height': 0, 'fps': 0.0, 'size': 0}
+    
+    try:
+        info['size'] = video_path.stat().st_size
+    except OSError:
+        return info
+    
+    try:
+        import cv2
+        cap = cv2.VideoCapture(str(video_path))
+        if cap.isOpened():
+            info['frames'] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            info['width'] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            info['height'] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            info['fps'] = cap.get(cv2.CAP_PROP_FPS)
+        cap.release()
+    except ImportError:
+        pass
+    
+    return info
+
+
+def estimate_job_cost(video_path):
+    """
+    Coût relatif d'un assemblage: pixels à traiter (frames × largeur × hauteur),
+    ou taille du fichier si les propriétés de la vidéo sont illisibles.
+    """
+    info = probe_video(video_path)
+    pixels = info['frames'] * info['width'] * info['height']
+    return pixels if pixels > 0 else info['size']
+
+
+def estimate_job_memory_mb(video_path, history=None, info=None, parts=1):
+    """
+    Estime le pic mémoire d'un assemblage (Mo).
+    
+    Le panorama (hauteur estimée = frames × taux de défilement historique)
+    est conservé en mémoire puis concaténé à la fin: il compte deux fois,
+    plus quelques frames décodées et le coût fixe du processus (un par
+    morceau si la vidéo est découpée).
+    """
+    if info is None:
+        info = probe_video(video_path)
+    if not info['width'] or not info['frames']:
+        return config.job_memory_mb
+    
+    rate = history.scroll_rate() if history else None
+    if rate is None:
+        rate = config.default_scroll_rate
+    
+    height = max(info['height'], info['frames'] * rate)
+    panorama_mb = height * info['width'] * 3 / 2**20
+    frames_mb = 4 * info['width'] * info['height'] * 3 / 2**20
+    return int(parts * (config.base_job_memory_mb + frames_mb) + 2 * panorama_mb)
+
+
+def parse_summary(line, stats):
+    """Complète `stats` avec le résumé affiché par panorama.py"""
+    try:
+        if line.startswith("Resolution:") and "Frames:" in line:
+            stats['total_frames'] = int(line.split("Frames:")[1].split(",")[0])
+        elif line.startswith("Progress:"):
+            stats['frames'] = parse_progress(line)[0]
+        elif line.startswith("Final dimensions:"):
+            width, height = line.split(":")[1].split()[0].split("x")
+            stats['width'], stats['height'] = int(width), int(height)
+        elif line.startswith("Duplicates skipped:"):
+            stats['duplicates'] = int(line.split(":")[1])
+        elif line.startswith("Processing time:"):
+            stats['elapsed'] = float(line.split(":")[1].split()[0])
+        elif line.startswith("Match quality:"):
+            values = line.split(":")[1].replace(",", " ").split()
+            stats['quality_mean'] = float(values[1])
+            stats['quality_min'] = float(values[3])
+            stats['matches'] = int(values[4].lstrip("("))
+        elif line.startswith("Peak memory:"):
+            stats['peak_rss_mb'] = float(line.split(":")[1].split()[0])
+    except (ValueError, IndexError, TypeError):
+        pass
+
+
+def parse_progress(line):
+    """
+    Extrait la progression d'une ligne "Progress: X/Y frames".
+    
+    Returns:
+        Tuple (current, total) ou None
+    """
+    if "Progress:" not in line and "/" not in line:
+        return None
+    
+    try:
+        parts = line.split("/")
+        current_str = ''.join(filter(str.isdigit, parts[0].split()[-1]))
+        total_str = ''.join(filter(str.isdigit, parts[1].split()[0]))
+    except IndexError:
+        return None
+    
+    if not current_str or not total_str or int(total_str) == 0:
+        return None
+    return int(current_str), int(total_str)
+
+
+def split_parts_for(video_path, parts, info=None):
+    """
+    Nombre de morceaux réellement utilisés pour une vidéo: au plus `parts`,
+    chaque morceau gardant au moins config.split_min_frames frames.
+    """
+    if parts <= 1:
+        return 1
+    if info is None:
+        info = probe_video(video_path)
+    return max(1, min(parts, info['frames'] // max(config.split_min_frames, 1)))
+
+
+def split_ranges(total_frames, parts, overlap=None):
+    """
+    Découpe [0, total_frames) en plages de frames chevauchantes.
+    
+    Returns:
+        Liste de tuples (début, fin) - chaque plage sauf la dernière déborde
+        de `overlap` frames sur la suivante
+    """
+    if overlap is None:
+        overlap = config.split_overlap_frames
+    
+    step = total_frames / parts
+    ranges = []
+    for i in range(parts):
+        start = int(i * step)
+        end = total_frames if i == parts - 1 else min(total_frames, int((i + 1) * step) + overlap)
+        ranges.append((start, end))
+    return ranges
+
+
+class JobCancelled(Exception):
+    """Assemblage interrompu à la demande de l'utilisateur"""
+
+
+def _kill(process):
+    """Tue le processus et attend sa fin (mémoire libérée)"""
+    try:
+        process.kill()
+        process.wait(timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+
+
+def _pump(stream, sink):
+    """Recopie les lignes d'un flux dans `sink` (None en fin de flux)"""
+    for line in stream:
+        sink.put(line)
+    sink.put(None)
+
+
+def _run_script(args, params, stats, on_progress=None, cancelled=None):
+    """
+    Exécute panorama.py avec `args` et les paramètres `params`.
+    
+    La sortie est lue par un thread: la boucle de surveillance reste active
+    même si le processus ne produit plus rien. Le processus est tué si
+    `cancelled()` devient vrai ou s'il n'écrit plus rien pendant
+    config.process_timeout secondes.
+    
+    Returns:
+        Tuple (returncode, stderr)
+    
+    Raises:
+        JobCancelled: Annulation demandée
+        subprocess.TimeoutExpired: Aucune progression pendant le délai
+    """
+    script_path = find_panorama_script()
+    if script_path is None:
+        raise FileNotFoundError(2, "Script panorama.py introuvable", 'panorama.py')
+    
+    cmd = [sys.executable, str(script_path), *args]
+    env = os.environ.copy()
+    env.update(EncodeOptions.from_config().to_environ())
+    env['STRIP_STORE'] = '1' if config.strip_store else '0'
+    env.update(params)
+    env['PYTHONUNBUFFERED'] = '1'  # Progression transmise ligne par ligne
+    
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+        bufsize=1,
+        universal_newlines=True
+    )
+    
+    lines = queue.Queue()
+    errors = []
+    threading.Thread(target=_pump, args=(process.stdout, lines), daemon=True).start()
+    stderr_reader = threading.Thread(target=lambda: errors.extend(process.stderr), daemon=True)
+    stderr_reader.start()
+    
+    last_output = time.monotonic()
+    while True:
+        try:
+            line = lines.get(timeout=0.5)
+        except queue.Empty:
+            line = ''
+        if line is None:
+            break
+        
+        if line:
+            last_output = time.monotonic()
+            line = line.strip()
+            parse_summary(line, stats)
+            if on_progress:
+                progress = parse_progress(line)
+                if progress:
+                    on_progress(*progress)
+        
+        # Surveillance: annulation et absence de progression
+        if cancelled is not None and cancelled():
+            _kill(process)
+            raise JobCancelled()
+        if time.monotonic() - last_output > config.process_timeout:
+            _kill(process)
+            raise subprocess.TimeoutExpired(cmd, config.process_timeout)
+    
+    process.wait()
+    stderr_reader.join(timeout=5)
+    return process.returncode, ''.join(errors)
+
+
+def _script_error(returncode, stderr):
+    return stderr[:200] if stderr else f"Code de retour {returncode}"
+
+
+def _run_split(video_path, output_path, params, parts, on_progress=None, cancel_event=None):
+    """
+    Assemble une vidéo en `parts` morceaux parallèles puis les fusionne.
+    L'échec d'un morceau arrête les autres.
+    
+    Returns:
+        Tuple (success, stats, error)
+    
+    Raises:
+        JobCancelled, subprocess.TimeoutExpired: voir _run_script
+    """
+    info = probe_video(video_path)
+    ranges = split_ranges(info['frames'], parts)
+    partial_paths = [
+        output_path.with_name(f"{output_path.stem}.part{i}.png") for i in range(len(ranges))
+    ]
+    
+    lock = threading.Lock()
+    progress = [0] * len(ranges)
+    abort = threading.Event()
+    
+    def cancelled():
+        return abort.is_set() or (cancel_event is not None and cancel_event.is_set())
+    
+    def run_part(i):
+        start, end = ranges[i]
+        part_params = dict(
+            params, FRAME_START=str(start), FRAME_END=str(end),
+            OUTPUT_FILE=str(partial_paths[i]), MATCH_CACHE='0', STRIP_STORE='0'
+        )
+        if params.get('PANORAMA_TRACE'):
+            trace = Path(params['PANORAMA_TRACE'])
+            part_params['PANORAMA_TRACE'] = str(trace.with_name(f"{trace.stem}.part{i}{trace.suffix}"))
+        
+        def part_progress(current, total):
+            with lock:
+                progress[i] = current
+                done = sum(progress)
+            if on_progress:
+                on_progress(min(done, info['frames']), info['frames'])
+        
+        part_stats = {}
+        try:
+            returncode, stderr = _run_script(
+                [str(video_path)], part_params, part_stats, part_progress, cancelled
+            )
+        except Exception:
+            abort.set()
+            raise
+        if returncode != 0:
+            abort.set()
+        return returncode, stderr, part_stats
+    
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            futures = [executor.submit(run_part, i) for i in range(len(ranges))]
+        
+        # Cause première de l'échec (les autres morceaux ont été arrêtés)
+        if cancel_event is not None and cancel_event.is_set():
+            raise JobCancelled()
+        for future in futures:
+            if future.exception() is not None and not isinstance(future.exception(), JobCancelled):
+                raise future.exception()
+        
+        stats = {'frames': 0, 'duplicates': 0, 'matches': 0, 'parts': len(ranges)}
+        quality_sum = 0.0
+        for future, path in zip(futures, partial_paths):
+            if future.exception() is not None:
+                continue
+            returncode, stderr, part_stats = future.result()
+            if returncode != 0 or not path.exists():
+                return False, stats, _script_error(returncode, stderr)
+            stats['frames'] += part_stats.get('frames', 0)
+            stats['duplicates'] += part_stats.get('duplicates', 0)
+            stats['elapsed'] = max(stats.get('elapsed', 0.0), part_stats.get('elapsed', 0.0))
+            
+            # Métriques par processus: pic mémoire le plus haut, qualité pondérée
+            if 'peak_rss_mb' in part_stats:
+                stats['peak_rss_mb'] = max(stats.get('peak_rss_mb', 0.0), part_stats['peak_rss_mb'])
+            if part_stats.get('matches'):
+                stats['matches'] += part_stats['matches']
+                quality_sum += part_stats['quality_mean'] * part_stats['matches']
+                stats['quality_min'] = min(stats.get('quality_min', 1.0), part_stats['quality_min'])
+        if stats['matches']:
+            stats['quality_mean'] = quality_sum / stats['matches']
+        # Frames de la vidéo (les chevauchements sont lus deux fois)
+        stats['frames'] = info['frames'] or stats['frames']
+        
+        # Le haut de chaque morceau couvre au plus `overlap` frames du précédent
+        merge_params = dict(
+            params, MERGE_SEARCH_ROWS=str(info['height'] * (config.split_overlap_frames + 1)),
+            SOURCE_VIDEO=video_path.name
+        )
+        merge_stats = {}
+        returncode, stderr = _run_script(
+            ['--merge', str(output_path), *map(str, partial_paths)], merge_params, merge_stats,
+            cancelled=cancelled
+        )
+        if returncode != 0 or not output_path.exists():
+            return False, stats, _script_error(returncode, stderr)
+        
+        stats['width'] = merge_stats.get('width', 0)
+        stats['height'] = merge_stats.get('height', 0)
+        stats['elapsed'] = stats.get('elapsed', 0.0) + merge_stats.get('elapsed', 0.0)
+        if 'peak_rss_mb' in merge_stats:
+            stats['peak_rss_mb'] = max(stats.get('peak_rss_mb', 0.0), merge_stats['peak_rss_mb'])
+        return True, stats, None
+    
+    finally:
+        for path in partial_paths:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def run_panorama(video_path, output_path, params, on_progress=None, parts=1, cancel_event=None):
+    """
+    Lance panorama.py sur une vidéo et place le résultat dans output_path.
+    
+    Args:
+        video_path: Vidéo source
+        output_path: Panorama à produire (ex: <dossier>/<jour>.png)
+        params: Variables d'environnement (voir stitch_parameters)
+        on_progress: Callback(current, total) appelé à chaque ligne de progression
+        parts: Morceaux assemblés en parallèle (voir split_parts_for); en cas
+            d'échec de la fusion, la vidéo est réassemblée d'un seul tenant
+        cancel_event: threading.Event qui, une fois levé, tue l'assemblage
+    
+    Returns:
+        Tuple (success: bool, stats: dict, error: str ou None)
+        stats: frames, width, height, duplicates, elapsed, quality_mean, quality_min,
+            matches, peak_rss_mb (selon la sortie du script)
+    """
+    video_path = Path(video_path)
+    output_path = Path(output_path)
+    stats = {}
+    
+    if find_panorama_script() is None:
+        return False, stats, "Script panorama.py introuvable"
+    
+    try:
+        success = False
+        if parts > 1:
+            success, stats, error = _run_split(
+                video_path, output_path, params, parts, on_progress, cancel_event
+            )
+            if not success:
+                print(f"Assemblage découpé impossible ({video_path.name}): {error}")
+                stats = {}
+        
+        if not success:
+            cancelled = cancel_event.is_set if cancel_event is not None else None
+            returncode, stderr = _run_script([str(video_path)], params, stats, on_progress, cancelled)
+            
+            # Vérifier le résultat
+            expected = video_path.with_suffix('.png')
+            if returncode != 0 or not expected.exists():
+                return False, stats, _script_error(returncode, stderr)
+            if expected != output_path:
+                shutil.move(str(expected), str(output_path))
+                strips = strips_path_for(expected)
+                if strips.exists():
+                    shutil.move(str(strips), str(strips_path_for(output_path)))
+        
+        # Historique pour les estimations suivantes
+        stats.setdefault('frames', stats.get('total_frames', 0))
+        if stats.get('height'):
+            RunHistory().record_job(
+                stats['frames'], stats['width'], stats['height'], stats.get('elapsed', 0.0),
+                parts=stats.get('parts', 1), peak_rss_mb=stats.get('peak_rss_mb')
+            )
+        return True, stats, None
+    
+    except JobCancelled:
+        return False, stats, "Annulé"
+    
+    except subprocess.TimeoutExpired:
+        return False, stats, f"Aucune progression depuis {config.process_timeout}s, arrêté"
+    
+    except FileNotFoundError as e:
+        return False, stats, f"Fichier non trouvé: {e.filename}"
+    
+    except PermissionError as e:
+        return False, stats, f"Permission refusée: {e}"
+    
+    except Exception as e:
+        return False, stats, f"{type(e).__name__}: {str(e)[:80]}"
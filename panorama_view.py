@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Panorama en cours d'édition
+L'image source n'est jamais modifiée: les recadrages sont une liste de
+suppressions de plages de lignes, appliquées à la demande (affichage,
+sauvegarde par bandes). Annuler/rétablir ne coûte qu'une entrée de liste.
+"""
+
+import itertools
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from image_io import StreamingPNGWriter, write_image
+from strip_store import export_image, open_strips, remove_rows, strips_path_for
+
+
+class PanoramaView:
+    """
+    Vue d'un panorama après une suite de suppressions de lignes.
+    
+    Chaque opération (début, fin) retire les lignes [début, fin) de la vue
+    telle qu'elle était au moment de l'opération.
+    """
+    
+    def __init__(self, source, ops=()):
+        self.source = source
+        self.ops = list(ops)
+        self.redo_ops = []
+        self._segments = None
+        self._scaled = None  # (zoom, source redimensionnée)
+    
+    @property
+    def width(self):
+        return self.source.width
+    
+    @property
+    def height(self):
+        return sum(end - start for start, end in self.segments())
+    
+    @property
+    def size(self):
+        return self.width, self.height
+    
+    @property
+    def mode(self):
+        return self.source.mode
+    
+    def segments(self):
+        """Plages de lignes de la source conservées, dans l'ordre [(début, fin), ...]"""
+        if self._segments is None:
+            segments = [(0, self.source.height)]
+            for start, end in self.ops:
+                segments = _remove(segments, start, end)
+            self._segments = segments
+        return self._segments
+    
+    def source_row(self, row):
+        """Ligne de la source affichée à la ligne `row` de la vue"""
+        offset = 0
+        for start, end in self.segments():
+            if row < offset + end - start:
+                return start + row - offset
+            offset += end - start
+        return None
+    
+    # ===== OPÉRATIONS =====
+    
+    def remove_rows(self, start, end):
+        """Retire les lignes [start, end) de la vue"""
+        start, end = max(start, 0), min(end, self.height)
+        if start >= end:
+            return False
+        self.ops.append((start, end))
+        self.redo_ops.clear()
+        self._segments = None
+        return True
+    
+    def undo(self):
+        """Annule la dernière opération"""
+        if not self.ops:
+            return False
+        self.redo_ops.append(self.ops.pop())
+        self._segments = None
+        return True
+    
+    def redo(self):
+        """Rétablit la dernière opération annulée"""
+        if not self.redo_ops:
+            return False
+        self.ops.append(self.redo_ops.pop())
+        self._segments = None
+        return True
+    
+    def reset(self):
+        """Revient à la source (les opérations peuvent être rétablies une à une)"""
+        while self.undo():
+            pass
+    
+    def snapshot(self):
+        """Copie figée de la vue (même source, opérations copiées)"""
+        return PanoramaView(self.source, self.ops)
+    
+    # ===== RENDU =====
+    
+    def render(self, zoom=1.0):
+        """
+        Image affichée au zoom donné. La source n'est redimensionnée qu'une
+        fois par zoom: après une opération, seuls les morceaux sont recollés.
+        """
+        if zoom == 1.0:
+            scaled = self.source
+        elif self._scaled is not None and self._scaled[0] == zoom:
+            scaled = self._scaled[1]
+        else:
+            size = (max(1, int(self.source.width * zoom)), max(1, int(self.source.height * zoom)))
+            scaled = self.source.resize(size, Image.Resampling.LANCZOS)
+            self._scaled = (zoom, scaled)
+        
+        pieces = []
+        for start, end in self.segments():
+            top, bottom = round(start * zoom), round(end * zoom)
+            if bottom > top:
+                pieces.append(scaled.crop((0, top, scaled.width, bottom)))
+        
+        result = Image.new(scaled.mode, (scaled.width, max(1, sum(p.height for p in pieces))))
+        y = 0
+        for piece in pieces:
+            result.paste(piece, (0, y))
+            y += piece.height
+        return result
+    
+    def iter_bands(self, band_rows=512):
+        """Lignes de la vue par bandes (tableaux (n, largeur[, canaux]))"""
+        source = self.source
+        if source.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+            mode = 'RGBA' if 'A' in source.mode or 'transparency' in source.info else 'RGB'
+        else:
+            mode = source.mode
+        
+        for start, end in self.segments():
+            for top in range(start, end, band_rows):
+                band = source.crop((0, top, source.width, min(top + band_rows, end)))
+                yield np.asarray(band if band.mode == mode else band.convert(mode))
+    
+    def materialize(self):
+        """Image PIL complète de la vue"""
+        return Image.fromarray(np.concatenate(list(self.iter_bands())))
+    
+    def save(self, path, options=None, progress=None):
+        """
+        Écrit la vue sans la matérialiser (PNG par bandes; autres formats:
+        image complète). `progress(lignes écrites, lignes totales)` est
+        appelé après chaque bande.
+        """
+        path = Path(path)
+        if path.suffix.lower() != '.png':
+            write_image(path, self.materialize(), options=options)
+            return
+        
+        height = self.height
+        bands = self.iter_bands()
+        first = next(bands)
+        channels = first.shape[2] if first.ndim == 3 else 1
+        with StreamingPNGWriter(path, self.width, height, channels, options) as writer:
+            done = 0
+            for band in itertools.chain([first], bands):
+                writer.write_rows(band)
+                done += band.shape[0]
+                if progress:
+                    progress(done, height)
+
+
+def write_view(view, output_path, saved_ops=(), progress=None):
+    """
+    Écrit une vue dans le fichier de son panorama (écriture atomique).
+    
+    `saved_ops` sont les opérations de la vue déjà présentes dans le fichier.
+    Avec un stockage par bandes à jour, seules les bandes touchées par les
+    opérations suivantes sont réécrites, puis le PNG est réexporté depuis le
+    stockage. Sinon la vue est écrite bande par bande depuis la source.
+    `progress(lignes écrites, lignes totales)` suit l'écriture du PNG.
+    """
+    saved_ops = list(saved_ops)
+    saved = len(saved_ops)
+    new_ops = view.ops[saved:] if view.ops[:saved] == saved_ops else None
+    
+    reader = open_strips(output_path) if new_ops is not None else None
+    if reader is not None:
+        with reader:
+            height = reader.height
+        if height - sum(end - start for start, end in new_ops) == view.height:
+            strips = strips_path_for(output_path)
+            for start, end in new_ops:
+                remove_rows(strips, start, end)
+            export_image(strips, output_path, progress=progress)
+            return
+    
+    # Pas de stockage, stockage divergent ou annulation au-delà de la
+    # dernière sauvegarde: réécrire l'image depuis la source
+    view.save(output_path, progress=progress)
+    # Un stockage plus ancien que l'image ne la reflète plus
+    strips_path_for(output_path).unlink(missing_ok=True)
+
+
+class BackgroundSaver:
+    """
+    Sauvegardes de panoramas dans un thread dédié, pour ne pas bloquer
+    l'interface. Une seule sauvegarde en attente par fichier: une nouvelle
+    demande remplace celle qui n'a pas encore commencé.
+    
+    `on_event` est appelé depuis le thread d'écriture:
+        on_event('progress', chemin, lignes écrites, lignes totales)
+        on_event('done', chemin, (largeur, hauteur), erreur ou None)
+    """
+    
+    def __init__(self, on_event=None):
+        self.on_event = on_event or (lambda *event: None)
+        self._condition = threading.Condition()
+        self._pending = {}  # chemin -> vue figée (dernière demande)
+        self._order = deque()
+        self._active = None
+        self._thread = None
+        self._disk_ops = {}  # chemin -> opérations déjà écrites dans le fichier
+    
+    def loaded(self, path):
+        """Le fichier vient d'être chargé: ses opérations repartent de zéro"""
+        with self._condition:
+            self._disk_ops[Path(path)] = []
+    
+    def save(self, view, path):
+        """
+        Demande la sauvegarde d'une vue (figée à l'instant de l'appel).
+        
+        Returns:
+            False si la demande a remplacé une sauvegarde en attente
+        """
+        path = Path(path)
+        with self._condition:
+            coalesced = path in self._pending
+            self._pending[path] = view.snapshot()
+            if not coalesced:
+                self._order.append(path)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return not coalesced
+    
+    def busy(self, path=None):
+        """Sauvegarde en attente ou en cours (pour ce fichier, ou n'importe lequel)"""
+        with self._condition:
+            return self._busy_locked(path)
+    
+    def wait(self, path=None, timeout=None):
+        """Attend la fin des sauvegardes (de ce fichier, ou de toutes)"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._busy_locked(path), timeout)
+    
+    def _busy_locked(self, path):
+        if path is None:
+            return bool(self._pending) or self._active is not None
+        path = Path(path)
+        return path in self._pending or self._active == path
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._order:
+                    self._thread = None
+                    self._condition.notify_all()
+                    return
+                path = self._order.popleft()
+                view = self._pending.pop(path)
+                self._active = path
+                saved_ops = self._disk_ops.get(path, [])
+            
+            last_percent = [-1]
+            
+            def progress(done, total):
+                percent = done * 100 // max(total, 1)
+                if percent != last_percent[0]:
+                    last_percent[0] = percent
+                    self.on_event('progress', path, done, total)
+            
+            error = None
+            try:
+                write_view(view, path, saved_ops, progress)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            
+            with self._condition:
+                if error is None:
+                    self._disk_ops[path] = list(view.ops)
+                self._active = None
+                self._condition.notify_all()
+            self.on_event('done', path, view.size, error)
+
+
+def _remove(segments, start, end):
+    """Retire les lignes [start, end) (coordonnées de la vue) d'une liste de plages"""
+    result = []
+    offset = 0
+    for seg_start, seg_end in segments:
+        length = seg_end - seg_start
+        # Partie de la plage retirée qui tombe dans ce morceau
+        cut_start = min(max(start - offset, 0), length)
+        cut_end = min(max(end - offset, 0), length)
+        if cut_start > 0:
+            result.append((seg_start, seg_start + cut_start))
+        if cut_end < length:
+            result.append((seg_start + cut_end, seg_end))
+        offset += length
+    return result
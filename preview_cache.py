@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Cache des aperçus de panoramas
+Aperçus réduits en WebP, identifiés par le chemin, la date de modification
+et la taille du panorama (un panorama modifié a un nouvel aperçu). Taille
+totale plafonnée: les aperçus les moins récemment utilisés sont supprimés.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+from config import config
+
+
+WEBP_MAX_DIMENSION = 16383
+
+
+def preview_dir():
+    """Dossier du cache (config.preview_cache_dir, défaut ~/.lastwar_cache/previews)"""
+    if config.preview_cache_dir:
+        return Path(config.preview_cache_dir)
+    return Path.home() / '.lastwar_cache' / 'previews'
+
+
+class PreviewCache:
+    """Aperçus WebP des panoramas, avec éviction LRU (thread-safe)"""
+    
+    _lock = threading.Lock()
+    
+    def __init__(self, folder=None, max_mb=None, scale=None):
+        self.folder = Path(folder) if folder else preview_dir()
+        self.max_bytes = (config.preview_cache_mb if max_mb is None else max_mb) * 2**20
+        self.scale = config.preview_scale if scale is None else scale
+    
+    def path_for(self, image_path):
+        """Fichier d'aperçu d'un panorama dans son état actuel"""
+        image_path = Path(image_path).resolve()
+        stat = image_path.stat()
+        key = f"{image_path}|{stat.st_mtime_ns}|{stat.st_size}|{self.scale}"
+        return self.folder / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.webp"
+    
+    def get(self, image_path):
+        """
+        Aperçu d'un panorama, ou None s'il n'est pas en cache.
+        Un aperçu lu devient le plus récemment utilisé.
+        """
+        try:
+            path = self.path_for(image_path)
+            with Image.open(path) as preview:
+                preview.load()
+            os.utime(path)
+            return preview
+        except (OSError, ValueError):
+            return None
+    
+    def put(self, image_path, image=None):
+        """
+        Crée l'aperçu d'un panorama (depuis `image` si fournie, sinon en
+        chargeant le panorama), puis applique le plafond de taille.
+        
+        Returns:
+            Chemin de l'aperçu, ou None en cas d'erreur
+        """
+        try:
+            path = self.path_for(image_path)
+            if image is None:
+                from strip_store import load_panorama
+                image = load_panorama(image_path)
+            
+            w, h = image.size
+            scale = min(self.scale, WEBP_MAX_DIMENSION / max(w, h))
+            size = (max(1, round(w * scale)), max(1, round(h * scale)))
+            preview = image.convert('RGBA' if 'A' in image.mode else 'RGB').resize(size, Image.Resampling.BOX)
+            
+            self.folder.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            preview.save(tmp_path, format='WEBP', quality=80, method=4)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError) as e:
+            print(f"Aperçu non créé ({Path(image_path).name}): {e}")
+            return None
+        
+        self.evict()
+        return path
+    
+    def evict(self):
+        """Supprime les aperçus les moins récemment utilisés au-delà du plafond"""
+        with PreviewCache._lock:
+            try:
+                entries = [(entry.stat(), entry) for entry in self.folder.glob('*.webp')]
+            except OSError:
+                return 0
+            total = sum(stat.st_size for stat, _ in entries)
+            removed = 0
+            for stat, entry in sorted(entries, key=lambda item: item[0].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    entry.unlink()
+                    total -= stat.st_size
+                    removed += 1
+                except OSError:
+                    pass
+            return removed
+    
+    def warm(self, image_paths):
+        """Crée les aperçus manquants (à appeler hors du thread de l'interface)"""
+        for image_path in image_paths:
+            try:
+                if not self.path_for(image_path).exists():
+                    self.put(image_path)
+            except OSError:
+                continue
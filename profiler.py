@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Profilage par étape de l'assemblage
+Chronomètres nommés et compteurs, résumé en tableau et trace au format
+Chrome (chrome://tracing, Perfetto). Désactivé, le coût se limite à un appel
+de méthode vide par mesure.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+
+class NullProfiler:
+    """Profileur désactivé: toutes les mesures sont ignorées"""
+    
+    enabled = False
+    _null = nullcontext()
+    
+    def stage(self, name):
+        return self._null
+    
+    def count(self, name, value=1):
+        pass
+    
+    def report(self):
+        pass
+
+
+class _Stage:
+    """Mesure d'une étape (gestionnaire de contexte)"""
+    
+    __slots__ = ('profiler', 'name', 'start')
+    
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+class StageProfiler:
+    """
+    Temps cumulés par étape, compteurs et, si demandé, trace des événements.
+    
+    Usage:
+        with profiler.stage('decode'):
+            ...
+        profiler.count('bytes_appended', rows.nbytes)
+    """
+    
+    enabled = True
+    
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.stages = {}  # nom -> [appels, total, min, max]
+        self.counters = {}
+        self.events = [] if trace_path else None
+        self.origin = time.perf_counter()
+    
+    @classmethod
+    def from_environ(cls, environ=None, enabled=False):
+        """
+        Profileur selon l'environnement: PANORAMA_PROFILE=1 pour le résumé,
+        PANORAMA_TRACE=<fichier.json> pour la trace (active aussi le résumé).
+        Retourne un NullProfiler si rien n'est demandé.
+        """
+        if environ is None:
+            environ = os.environ
+        trace_path = environ.get('PANORAMA_TRACE') or None
+        if enabled or trace_path or environ.get('PANORAMA_PROFILE', '0') == '1':
+            return cls(trace_path)
+        return NullProfiler()
+    
+    def stage(self, name):
+        """Chronomètre une étape: `with profiler.stage('match'):`"""
+        return _Stage(self, name)
+    
+    def add(self, name, start, end):
+        """Enregistre une mesure (instants time.perf_counter())"""
+        elapsed = end - start
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [1, elapsed, elapsed, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if elapsed < entry[2]:
+                entry[2] = elapsed
+            if elapsed > entry[3]:
+                entry[3] = elapsed
+        
+        if self.events is not None:
+            self.events.append((name, start, elapsed, threading.get_ident()))
+    
+    def count(self, name, value=1):
+        """Incrémente un compteur"""
+        self.counters[name] = self.counters.get(name, 0) + value
+    
+    def summary_lines(self):
+        """Tableau des étapes (plus coûteuses d'abord) et des compteurs"""
+        total = sum(entry[1] for entry in self.stages.values()) or 1.0
+        lines = [
+            f"{'Stage':<20}{'Calls':>9}{'Total (s)':>11}{'Mean (ms)':>11}{'Max (ms)':>10}{'%':>7}"
+        ]
+        for name, (calls, elapsed, _, longest) in sorted(
+            self.stages.items(), key=lambda item: item[1][1], reverse=True
+        ):
+            lines.append(
+                f"{name:<20}{calls:>9}{elapsed:>11.3f}{elapsed / calls * 1000:>11.3f}"
+                f"{longest * 1000:>10.2f}{elapsed / total * 100:>6.1f}%"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<20}{value:>9}")
+        return lines
+    
+    def write_trace(self, path=None):
+        """Écrit la trace au format Chrome Trace Event (JSON)"""
+        path = path or self.trace_path
+        pid = os.getpid()
+        events = [
+            {
+                'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': round((start - self.origin) * 1e6, 1), 'dur': round(elapsed * 1e6, 1),
+            }
+            for name, start, elapsed, tid in self.events or ()
+        ]
+        end = round((time.perf_counter() - self.origin) * 1e6, 1)
+        events.extend(
+            {'name': name, 'ph': 'C', 'pid': pid, 'ts': end, 'args': {name: value}}
+            for name, value in self.counters.items()
+        )
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    
+    def report(self):
+        """Affiche le résumé et écrit la trace si demandée"""
+        print("\nProfile:")
+        for line in self.summary_lines():
+            print(f"  {line}")
+        
+        if self.trace_path:
+            try:
+                self.write_trace()
+                print(f"Trace written to {self.trace_path}")
+            except OSError as e:
+                print(f"Warning: could not write trace: {e}")
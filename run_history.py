@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Historique des assemblages
+Conserve, par machine, les dimensions et durées des derniers traitements
+pour estimer la mémoire et la durée des suivants
+"""
+
+import json
+import os
+import platform
+import statistics
+import threading
+from pathlib import Path
+
+
+class RunHistory:
+    """Historique des traitements, persisté dans le dossier utilisateur"""
+    
+    MAX_JOBS = 200
+    _lock = threading.Lock()
+    
+    def __init__(self, path=None):
+        self.path = Path(path) if path else Path.home() / '.lastwar_history.json'
+        self.machine = platform.node() or 'local'
+        self.data = {'machines': {}}
+        self.load()
+    
+    def load(self):
+        """Charge l'historique (vide s'il est absent ou illisible)"""
+        if not self.path.exists():
+            return False
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+            self.data.setdefault('machines', {})
+            return True
+        except (OSError, ValueError) as e:
+            print(f"Historique ignoré: {e}")
+            self.data = {'machines': {}}
+            return False
+    
+    def save(self):
+        """Écrit l'historique de façon atomique"""
+        tmp_path = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f)
+            os.replace(tmp_path, self.path)
+            return True
+        except OSError as e:
+            print(f"Erreur sauvegarde historique: {e}")
+            return False
+    
+    def jobs(self):
+        """Traitements enregistrés pour cette machine"""
+        return self.data['machines'].get(self.machine, {}).get('jobs', [])
+    
+    def record_job(self, frames, width, height, elapsed, **extra):
+        """
+        Ajoute un traitement terminé et sauvegarde.
+        
+        Args:
+            frames: Frames lues
+            width, height: Dimensions du panorama produit
+            elapsed: Durée de l'assemblage en secondes
+            extra: Valeurs supplémentaires (ex: peak_rss_mb)
+        """
+        if frames <= 0 or width <= 0 or height <= 0:
+            return
+        
+        with RunHistory._lock:
+            # Relire pour ne pas écraser les ajouts d'un autre processus
+            self.load()
+            machine = self.data['machines'].setdefault(self.machine, {'jobs': []})
+            machine['jobs'].append(dict(
+                frames=frames, width=width, height=height, elapsed=round(elapsed, 2), **extra
+            ))
+            machine['jobs'] = machine['jobs'][-self.MAX_JOBS:]
+            self.save()
+    
+    def scroll_rate(self):
+        """
+        Taux de défilement médian (lignes de panorama par frame), ou None
+        si aucun traitement n'a encore été enregistré.
+        """
+        rates = [job['height'] / job['frames'] for job in self.jobs() if job.get('frames')]
+        if not rates:
+            return None
+        return statistics.median(rates)
+    
+    def throughput(self):
+        """
+        Débit médian d'un worker (frames/s par processus panorama.py), ou
+        None si aucun traitement n'a encore été enregistré.
+        """
+        rates = [
+            job['frames'] / job.get('parts', 1) / job['elapsed']
+            for job in self.jobs() if job.get('elapsed')
+        ]
+        if not rates:
+            return None
+        return statistics.median(rates)
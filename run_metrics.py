@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Métriques d'un traitement de vidéos
+Une ligne par vidéo (durée, frames, débit, doublons, qualité des matchs,
+hauteur, pic mémoire), exportée en JSON et CSV à chaque traitement et,
+si configuré, au format texte Prometheus (node_exporter textfile collector)
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from config import config
+
+
+FIELDS = (
+    'week', 'day', 'status', 'duration_s', 'frames', 'fps', 'duplicates',
+    'quality_mean', 'quality_min', 'width', 'height', 'peak_rss_mb', 'parts', 'error',
+)
+
+# Métriques Prometheus par vidéo: (champ, nom, description)
+PROMETHEUS_GAUGES = (
+    ('duration_s', 'lastwar_video_duration_seconds', "Durée de l'assemblage"),
+    ('frames', 'lastwar_video_frames', "Frames lues"),
+    ('fps', 'lastwar_video_fps', "Frames assemblées par seconde"),
+    ('duplicates', 'lastwar_video_duplicates', "Frames ignorées (doublons)"),
+    ('quality_mean', 'lastwar_video_match_quality_mean', "Qualité moyenne des matchs"),
+    ('quality_min', 'lastwar_video_match_quality_min', "Qualité minimale des matchs"),
+    ('height', 'lastwar_video_output_height_pixels', "Hauteur du panorama"),
+    ('peak_rss_mb', 'lastwar_video_peak_rss_megabytes', "Pic mémoire de l'assemblage"),
+)
+
+
+def metrics_dir():
+    """Dossier des métriques (config.metrics_dir, défaut ~/.lastwar_metrics)"""
+    if config.metrics_dir:
+        return Path(config.metrics_dir)
+    return Path.home() / '.lastwar_metrics'
+
+
+def _atomic_write(path, write):
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+class RunMetrics:
+    """Métriques des vidéos d'un traitement (thread-safe)"""
+    
+    def __init__(self, source='gui'):
+        self.source = source
+        self.started = datetime.now()
+        self._start_time = time.time()
+        self._lock = threading.Lock()
+        self.videos = []
+    
+    def add_video(self, week, day, status, duration, stats=None, error=None):
+        """
+        Ajoute le résultat d'une vidéo.
+        
+        Args:
+            week: Dossier semaine
+            day: Jour
+            status: 'done', 'failed', 'skipped' ou 'cancelled'
+            duration: Durée totale du traitement (secondes)
+            stats: Statistiques retournées par run_panorama
+        """
+        stats = stats or {}
+        frames = stats.get('frames') or 0
+        row = {
+            'week': week,
+            'day': day,
+            'status': status,
+            'duration_s': round(duration, 2),
+            'frames': frames,
+            'fps': round(frames / duration, 2) if frames and duration > 0 else None,
+            'duplicates': stats.get('duplicates'),
+            'quality_mean': stats.get('quality_mean'),
+            'quality_min': stats.get('quality_min'),
+            'width': stats.get('width'),
+            'height': stats.get('height'),
+            'peak_rss_mb': stats.get('peak_rss_mb'),
+            'parts': stats.get('parts', 1),
+            'error': error,
+        }
+        with self._lock:
+            self.videos.append(row)
+        return row
+    
+    def summary(self):
+        """Totaux du traitement"""
+        with self._lock:
+            videos = list(self.videos)
+        statuses = [row['status'] for row in videos]
+        frames = sum(row['frames'] or 0 for row in videos if row['status'] == 'done')
+        elapsed = time.time() - self._start_time
+        return {
+            'source': self.source,
+            'started': self.started.isoformat(timespec='seconds'),
+            'elapsed_s': round(elapsed, 2),
+            'videos': len(videos),
+            'done': statuses.count('done'),
+            'failed': statuses.count('failed'),
+            'skipped': statuses.count('skipped'),
+            'cancelled': statuses.count('cancelled'),
+            'frames': frames,
+            'fps': round(frames / elapsed, 2) if elapsed > 0 else None,
+        }
+    
+    def write(self, folder=None, prometheus_file=None):
+        """
+        Écrit metrics_<date>.json et metrics_<date>.csv, et le fichier
+        Prometheus si demandé (défaut: config.metrics_prometheus_file).
+        
+        Returns:
+            Chemin du fichier JSON, ou None en cas d'erreur
+        """
+        folder = Path(folder) if folder else metrics_dir()
+        if prometheus_file is None:
+            prometheus_file = config.metrics_prometheus_file
+        stamp = self.started.strftime('%Y%m%d_%H%M%S')
+        
+        with self._lock:
+            videos = list(self.videos)
+        data = {'run': self.summary(), 'videos': videos}
+        
+        try:
+            folder.mkdir(parents=True, exist_ok=True)
+            json_path = folder / f"metrics_{stamp}.json"
+            _atomic_write(json_path, lambda f: json.dump(data, f, indent=2, ensure_ascii=False))
+            
+            def write_csv(f):
+                writer = csv.DictWriter(f, fieldnames=FIELDS)
+                writer.writeheader()
+                writer.writerows(videos)
+            _atomic_write(folder / f"metrics_{stamp}.csv", write_csv)
+            
+            if prometheus_file:
+                self.write_prometheus(Path(prometheus_file), data)
+            return json_path
+        except OSError as e:
+            print(f"Erreur écriture métriques: {e}")
+            return None
+    
+    def write_prometheus(self, path, data=None):
+        """Écrit les métriques au format texte Prometheus (remplacées à chaque traitement)"""
+        if data is None:
+            data = {'run': self.summary(), 'videos': list(self.videos)}
+        run = data['run']
+        
+        lines = []
+        for key, name, description in (
+            ('elapsed_s', 'lastwar_run_duration_seconds', "Durée du dernier traitement"),
+            ('done', 'lastwar_run_videos_done', "Vidéos assemblées"),
+            ('failed', 'lastwar_run_videos_failed', "Vidéos en échec"),
+            ('skipped', 'lastwar_run_videos_skipped', "Vidéos déjà à jour"),
+            ('fps', 'lastwar_run_fps', "Frames assemblées par seconde (traitement entier)"),
+        ):
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+            lines.append(f'{name}{{source="{_label(self.source)}"}} {run[key] or 0}')
+        lines += [
+            "# HELP lastwar_run_timestamp_seconds Début du dernier traitement",
+            "# TYPE lastwar_run_timestamp_seconds gauge",
+            f'lastwar_run_timestamp_seconds{{source="{_label(self.source)}"}} {self.started.timestamp():.0f}',
+        ]
+        
+        for key, name, description in PROMETHEUS_GAUGES:
+            rows = [row for row in data['videos'] if row.get(key) is not None]
+            if not rows:
+                continue
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+            for row in rows:
+                labels = f'week="{_label(row["week"])}",day="{_label(row["day"])}",status="{row["status"]}"'
+                lines.append(f"{name}{{{labels}}} {row[key]}")
+        
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _atomic_write(path, lambda f: f.write('\n'.join(lines) + '\n'))
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Détection des lignes répétées dans un panorama
+Quand la correspondance échoue en cours de vidéo, l'assemblage peut ajouter
+des lignes déjà présentes plus haut. Chaque ligne est résumée par la
+moyenne de quelques colonnes, les blocs de lignes sont hachés (hachage
+glissant en NumPy), puis les blocs identiques à écart constant forment les
+plages répétées, vérifiées sur les résumés avant d'être proposées.
+
+Usage:
+    python seam_detector.py <panorama.png>
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import config
+
+
+DESCRIPTOR_BINS = 64  # Colonnes du résumé d'une ligne (vérification)
+HASH_BINS = 8  # Colonnes hachées: peu nombreuses, donc peu sensibles au bruit
+QUANTIZATION = 8  # Niveaux de gris regroupés avant hachage
+MIN_TEXTURE = 2.0  # Écart type minimal d'un bloc (les blocs unis se ressemblent tous)
+
+
+@dataclass
+class Seam:
+    """Lignes [start, end) répétant les lignes situées `offset` plus haut"""
+    
+    start: int
+    end: int
+    offset: int
+    difference: float = 0.0
+    
+    @property
+    def rows(self):
+        return self.end - self.start
+
+
+def row_descriptors(bands, bins=DESCRIPTOR_BINS):
+    """
+    Résumé de chaque ligne: niveau de gris moyen de `bins` groupes de colonnes.
+    
+    Args:
+        bands: Tableaux (n, largeur[, canaux]) successifs (voir PanoramaView.iter_bands)
+    
+    Returns:
+        Tableau (lignes, bins) float32
+    """
+    descriptors = []
+    for band in bands:
+        gray = band[..., :3].mean(axis=2, dtype=np.float32) if band.ndim == 3 else band.astype(np.float32)
+        columns = gray.shape[1] // bins * bins
+        if columns == 0:
+            descriptors.append(gray)
+            continue
+        descriptors.append(gray[:, :columns].reshape(gray.shape[0], bins, -1).mean(axis=2))
+    if not descriptors:
+        return np.empty((0, bins), dtype=np.float32)
+    return np.concatenate(descriptors)
+
+
+def block_hashes(descriptors, block_rows):
+    """
+    Hachage de chaque bloc de `block_rows` lignes consécutives (hachage
+    polynomial glissant, arithmétique modulo 2**64). Les lignes sont
+    réduites à HASH_BINS colonnes: une copie légèrement bruitée garde ainsi
+    assez de blocs identiques pour être repérée.
+    
+    Returns:
+        Tableau (lignes - block_rows + 1,) uint64
+    """
+    rows, bins = descriptors.shape
+    if bins % HASH_BINS == 0:
+        descriptors = descriptors.reshape(rows, HASH_BINS, -1).mean(axis=2)
+    quantized = (descriptors // QUANTIZATION).astype(np.uint64)
+    weights = np.random.default_rng(0).integers(1, 2**63, size=quantized.shape[1], dtype=np.uint64)
+    row_hash = quantized @ weights
+    
+    count = rows - block_rows + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    factor = 1
+    for j in range(block_rows - 1, -1, -1):
+        hashes += row_hash[j:j + count] * np.uint64(factor)
+        factor = factor * 1_000_003 % 2**64
+    return hashes
+
+
+def _match_extent(descriptors, start, end, offset, tolerance, chunk=256):
+    """
+    Étend la plage [start, end) tant que chaque ligne ressemble à celle
+    située `offset` plus bas (différence moyenne <= tolerance).
+    """
+    rows = descriptors.shape[0]
+    while end + offset < rows:
+        stop = min(end + chunk, rows - offset)
+        difference = np.abs(descriptors[end:stop] - descriptors[end + offset:stop + offset]).mean(axis=1)
+        bad = np.flatnonzero(difference > tolerance)
+        if bad.size:
+            end += int(bad[0])
+            break
+        end = stop
+    
+    while start > 0:
+        begin = max(start - chunk, 0)
+        difference = np.abs(descriptors[begin:start] - descriptors[begin + offset:start + offset]).mean(axis=1)
+        bad = np.flatnonzero(difference > tolerance)
+        if bad.size:
+            start = begin + int(bad[-1]) + 1
+            break
+        start = begin
+    return start, end
+
+
+def find_seams(descriptors, block_rows=None, min_rows=None, max_offset=None, tolerance=None):
+    """
+    Plages répétées d'un panorama, à partir des résumés de lignes.
+    
+    Pour une plage [a, a+L) répétée `d` lignes plus bas, la proposition est
+    la copie: [a+d, a+d+L) si les deux copies sont disjointes, sinon une
+    période de d lignes (contenu répété en boucle).
+    
+    Returns:
+        Liste de Seam sans chevauchement, triée par position
+    """
+    block_rows = config.seam_block_rows if block_rows is None else block_rows
+    min_rows = config.seam_min_rows if min_rows is None else min_rows
+    max_offset = config.seam_max_offset if max_offset is None else max_offset
+    tolerance = config.seam_tolerance if tolerance is None else tolerance
+    
+    if descriptors.shape[0] < block_rows * 2:
+        return []
+    
+    hashes = block_hashes(descriptors, block_rows)
+    
+    # Blocs unis (fond, séparateurs) exclus: ils se répètent légitimement
+    texture = descriptors.std(axis=1)
+    cumulative = np.concatenate([[0.0], np.cumsum(texture, dtype=np.float64)])
+    textured = (cumulative[block_rows:] - cumulative[:-block_rows]) / block_rows >= MIN_TEXTURE
+    
+    # Occurrences successives d'un même hachage (tri stable: indices croissants)
+    order = np.argsort(hashes, kind='stable')
+    sorted_hashes = hashes[order]
+    same = sorted_hashes[1:] == sorted_hashes[:-1]
+    first, second = order[:-1][same], order[1:][same]
+    offset = second - first
+    keep = (offset >= block_rows) & (offset <= max_offset) & textured[first]
+    first, offset = first[keep], offset[keep]
+    if first.size == 0:
+        return []
+    
+    # Chaque bloc identique est une amorce: la plage est étendue ligne par
+    # ligne, les amorces déjà couvertes (même écart) sont ignorées
+    order = np.lexsort((first, offset))
+    first, offset = first[order], offset[order]
+    
+    seams = []
+    covered = (None, 0)  # (écart, fin de la dernière plage)
+    for seed, d in zip(first.tolist(), offset.tolist()):
+        if covered[0] == d and seed < covered[1]:
+            continue
+        
+        block = np.abs(descriptors[seed:seed + block_rows] - descriptors[seed + d:seed + d + block_rows])
+        if block.mean(axis=1).max() > tolerance:
+            continue
+        
+        start, end = _match_extent(descriptors, seed, seed + block_rows, d, tolerance)
+        covered = (d, end)
+        length = end - start
+        if length < min_rows:
+            continue
+        
+        difference = float(np.abs(descriptors[start:end] - descriptors[start + d:end + d]).mean())
+        seams.append(Seam(start + max(length, d), start + max(length, d) + min(length, d), d, difference))
+    
+    # Chevauchements: la plus longue proposition l'emporte
+    selected = []
+    for seam in sorted(seams, key=lambda seam: -seam.rows):
+        if all(seam.end <= other.start or seam.start >= other.end for other in selected):
+            selected.append(seam)
+    return sorted(selected, key=lambda seam: seam.start)
+
+
+def detect_seams(view, **options):
+    """Plages répétées d'une vue (PanoramaView), lue par bandes"""
+    return find_seams(row_descriptors(view.iter_bands()), **options)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python seam_detector.py <panorama.png>")
+        sys.exit(1)
+    
+    from panorama_view import PanoramaView
+    from strip_store import load_panorama
+    
+    start = time.time()
+    view = PanoramaView(load_panorama(sys.argv[1]))
+    seams = detect_seams(view)
+    print(f"{view.height} rows analysed in {time.time() - start:.1f} seconds")
+    for seam in seams:
+        print(f"Repeated rows {seam.start}-{seam.end} ({seam.rows}px, copy of rows "
+              f"{seam.start - seam.offset}-{seam.end - seam.offset}, difference {seam.difference:.2f})")
+    if not seams:
+        print("No repeated rows found")
+
+
+if __name__ == "__main__":
+    main()
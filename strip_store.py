@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Stockage des panoramas par bandes (<jour>.strips)
+Bandes de lignes compressées indépendamment, précédées d'un en-tête JSON
+(dimensions, vidéo source, paramètres d'assemblage) et suivies d'un index
+des positions: une plage de lignes se lit sans décoder le reste de l'image,
+et retirer des lignes ne réécrit que les bandes touchées.
+
+Format:
+    MAGIC | longueur (uint32) | en-tête JSON
+    bande 0 | bande 1 | ...                 (zlib, lignes RGB[A] brutes)
+    index: (position uint64, longueur uint32, lignes uint32) par bande
+    fin: position de l'index (uint64), nombre de bandes (uint32), INDEX_MAGIC
+"""
+
+import bisect
+import json
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from config import config
+
+
+MAGIC = b'LWSTRIP1'
+INDEX_MAGIC = b'LWINDEX1'
+HEADER_LENGTH = struct.Struct('<I')
+INDEX_ENTRY = struct.Struct('<QII')
+FOOTER = struct.Struct('<QI8s')
+STRIPS_SUFFIX = '.strips'
+MODES = {1: 'L', 2: 'LA', 3: 'RGB', 4: 'RGBA'}
+
+
+def strips_path_for(image_path):
+    """Chemin du stockage par bandes associé à un panorama (<jour>.strips)"""
+    return Path(image_path).with_suffix(STRIPS_SUFFIX)
+
+
+def _compress(rows, level, bgr):
+    if bgr and rows.shape[2] >= 3:
+        rows = rows[..., [2, 1, 0, 3][:rows.shape[2]]]
+    return zlib.compress(np.ascontiguousarray(rows).tobytes(), level)
+
+
+class StripWriter:
+    """
+    Écrit un stockage par bandes ligne par ligne (nom temporaire puis
+    renommage à la fermeture). Les bandes sont compressées en parallèle.
+    
+    Usage:
+        with StripWriter(path, width, channels=3, metadata={...}) as writer:
+            writer.write_rows(rows)
+    """
+    
+    def __init__(self, path, width, channels=3, metadata=None, strip_rows=None,
+                 compression=None, bgr=False, threads=None):
+        if channels not in MODES:
+            raise ValueError(f"Nombre de canaux non supporté: {channels}")
+        
+        self.path = Path(path)
+        self.width = width
+        self.channels = channels
+        self.strip_rows = strip_rows or config.strip_rows
+        self.compression = config.strip_compression if compression is None else compression
+        self.bgr = bgr
+        self.index = []
+        
+        self._buffer = []
+        self._buffered = 0
+        self._pending = deque()
+        workers = threads or os.cpu_count() or 1
+        self._workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        
+        header = dict(metadata or {})
+        header.update(width=width, channels=channels, strip_rows=self.strip_rows, order='RGB')
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        
+        self._tmp_path = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(MAGIC + HEADER_LENGTH.pack(len(header_bytes)) + header_bytes)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+    
+    @property
+    def height(self):
+        return sum(entry[2] for entry in self.index) + sum(p[1] for p in self._pending) + self._buffered
+    
+    def write_rows(self, rows):
+        """Ajoute des lignes (tableau (n, largeur, canaux) ou (n, largeur) uint8)"""
+        rows = np.asarray(rows, dtype=np.uint8)
+        if rows.ndim == 2:
+            rows = rows[:, :, None]
+        if rows.shape[1:] != (self.width, self.channels):
+            raise ValueError(f"Lignes de forme {rows.shape[1:]}, attendu {(self.width, self.channels)}")
+        
+        rows = rows.copy()  # Compressée plus tard: l'appelant peut réutiliser son tableau
+        self._buffer.append(rows)
+        self._buffered += rows.shape[0]
+        while self._buffered >= self.strip_rows:
+            self._submit(self._take(self.strip_rows))
+    
+    def write_compressed(self, data, rows):
+        """Recopie telle quelle une bande déjà compressée (voir StripReader.raw_strip)"""
+        self.flush()
+        self._pending.append((None, rows, data))
+        self._drain(0)
+    
+    def flush(self):
+        """Termine la bande en cours, même incomplète"""
+        if self._buffered:
+            self._submit(self._take(self._buffered))
+    
+    def _take(self, count):
+        rows = np.concatenate(self._buffer) if len(self._buffer) > 1 else self._buffer[0]
+        strip, rest = rows[:count], rows[count:]
+        self._buffer = [rest] if rest.shape[0] else []
+        self._buffered = rest.shape[0]
+        return strip
+    
+    def _submit(self, strip):
+        args = (strip, self.compression, self.bgr)
+        if self._executor is None:
+            self._pending.append((None, strip.shape[0], _compress(*args)))
+        else:
+            self._pending.append((self._executor.submit(_compress, *args), strip.shape[0], None))
+        self._drain(2 * self._workers)
+    
+    def _drain(self, keep):
+        """Écrit les bandes terminées dans l'ordre (au plus `keep` en attente)"""
+        while len(self._pending) > keep:
+            future, rows, data = self._pending.popleft()
+            if future is not None:
+                data = future.result()
+            self.index.append((self._file.tell(), len(data), rows))
+            self._file.write(data)
+    
+    def close(self):
+        """Écrit l'index et met le fichier en place"""
+        try:
+            self.flush()
+            self._drain(0)
+            
+            index_offset = self._file.tell()
+            for entry in self.index:
+                self._file.write(INDEX_ENTRY.pack(*entry))
+            self._file.write(FOOTER.pack(index_offset, len(self.index), INDEX_MAGIC))
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+    
+    def abort(self):
+        """Abandonne l'écriture (fichier temporaire supprimé)"""
+        for future, _, _ in self._pending:
+            if future is not None:
+                future.cancel()
+        self._pending.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        try:
+            self._file.close()
+            self._tmp_path.unlink()
+        except OSError:
+            pass
+
+
+class StripReader:
+    """
+    Lecture d'un stockage par bandes: seules les bandes couvrant les lignes
+    demandées sont lues et décompressées.
+    """
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._last = None
+        self._file = open(self.path, 'rb')
+        try:
+            self._read_layout()
+        except BaseException:
+            self._file.close()
+            raise
+    
+    def _read_layout(self):
+        f = self._file
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{self.path.name}: pas un stockage par bandes")
+        (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+        self.metadata = json.loads(f.read(length).decode('utf-8'))
+        self.width = self.metadata['width']
+        self.channels = self.metadata['channels']
+        
+        f.seek(-FOOTER.size, os.SEEK_END)
+        index_offset, count, magic = FOOTER.unpack(f.read(FOOTER.size))
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{self.path.name}: index absent (fichier tronqué?)")
+        f.seek(index_offset)
+        raw = f.read(count * INDEX_ENTRY.size)
+        self.index = [INDEX_ENTRY.unpack_from(raw, i * INDEX_ENTRY.size) for i in range(count)]
+        
+        # Première ligne de chaque bande
+        self.starts = [0]
+        for _, _, rows in self.index:
+            self.starts.append(self.starts[-1] + rows)
+        self.height = self.starts[-1]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+        return False
+    
+    def close(self):
+        self._file.close()
+    
+    @property
+    def size(self):
+        return self.width, self.height
+    
+    @property
+    def mode(self):
+        return MODES[self.channels]
+    
+    def raw_strip(self, i):
+        """Données compressées de la bande i"""
+        offset, length, _ = self.index[i]
+        self._file.seek(offset)
+        return self._file.read(length)
+    
+    def _decode(self, data, rows):
+        return np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(rows, self.width, self.channels)
+    
+    def read_strip(self, i):
+        """Lignes de la bande i (tableau (lignes, largeur, canaux), lecture seule)"""
+        return self._decode(self.raw_strip(i), self.index[i][2])
+    
+    def strips_for(self, start, end):
+        """Indices des bandes couvrant les lignes [start, end)"""
+        if start >= end:
+            return range(0)
+        first = bisect.bisect_right(self.starts, start) - 1
+        last = bisect.bisect_left(self.starts, end)
+        return range(max(first, 0), min(last, len(self.index)))
+    
+    def read_rows(self, start, end, threads=None):
+        """
+        Lignes [start, end) du panorama (RGB[A]), en ne décompressant que
+        les bandes concernées (en parallèle si `threads` > 1).
+        """
+        start = max(start, 0)
+        end = min(end, self.height)
+        out = np.empty((max(end - start, 0), self.width, self.channels), dtype=np.uint8)
+        strips = self.strips_for(start, end)
+        if not strips:
+            return out
+        
+        # Dernière bande décodée conservée: une lecture séquentielle par
+        # paquets ne décompresse chaque bande qu'une fois
+        decoded = {}
+        if self._last is not None and self._last[0] in strips:
+            decoded[self._last[0]] = self._last[1]
+        todo = [i for i in strips if i not in decoded]
+        raws = [self.raw_strip(i) for i in todo]
+        workers = threads or os.cpu_count() or 1
+        if workers > 1 and len(raws) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                decoded.update(zip(todo, executor.map(self._decode, raws, [self.index[i][2] for i in todo])))
+        else:
+            decoded.update((i, self._decode(raw, self.index[i][2])) for raw, i in zip(raws, todo))
+        self._last = (strips[-1], decoded[strips[-1]])
+        
+        for i in strips:
+            rows = decoded[i]
+            strip_start = self.starts[i]
+            a = max(start, strip_start)
+            b = min(end, strip_start + rows.shape[0])
+            out[a - start:b - start] = rows[a - strip_start:b - strip_start]
+        return out
+    
+    def iter_bands(self, band_rows=None):
+        """Parcourt le panorama par bandes de `band_rows` lignes (défaut: bandes stockées)"""
+        if band_rows is None:
+            for i in range(len(self.index)):
+                yield self.read_strip(i)
+            return
+        for start in range(0, self.height, band_rows):
+            yield self.read_rows(start, start + band_rows, threads=1)
+    
+    def to_array(self):
+        return self.read_rows(0, self.height)
+    
+    def to_image(self):
+        """Panorama entier en image PIL"""
+        from PIL import Image
+        
+        array = self.to_array()
+        if self.channels == 1:
+            array = array[:, :, 0]
+        return Image.fromarray(array, self.mode)
+
+
+def write_strips(path, image, metadata=None, bgr=False):
+    """Écrit un tableau (hauteur, largeur[, canaux]) ou une image PIL en stockage par bandes"""
+    if hasattr(image, 'mode'):
+        if image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode else 'RGB')
+        image = np.asarray(image)
+        bgr = False
+    image = np.asarray(image)
+    channels = image.shape[2] if image.ndim == 3 else 1
+    
+    with StripWriter(path, image.shape[1], channels, metadata, bgr=bgr) as writer:
+        for start in range(0, image.shape[0], writer.strip_rows):
+            writer.write_rows(image[start:start + writer.strip_rows])
+    return Path(path)
+
+
+def remove_rows(path, start, end):
+    """
+    Retire les lignes [start, end) d'un stockage par bandes. Les bandes hors
+    de la plage sont recopiées sans être décompressées; seules les (au plus
+    deux) bandes coupées sont réencodées.
+    
+    Returns:
+        Nombre de bandes réencodées
+    """
+    path = Path(path)
+    reader = StripReader(path)
+    try:
+        start = max(start, 0)
+        end = min(end, reader.height)
+        if start >= end:
+            return 0
+        
+        metadata = {k: v for k, v in reader.metadata.items()
+                    if k not in ('width', 'channels', 'strip_rows', 'order')}
+        metadata['edits'] = metadata.get('edits', []) + [{'remove': [start, end]}]
+        writer = StripWriter(path, reader.width, reader.channels, metadata,
+                             strip_rows=reader.metadata.get('strip_rows'), threads=1)
+        
+        reencoded = 0
+        try:
+            for i, (_, _, rows) in enumerate(reader.index):
+                strip_start = reader.starts[i]
+                strip_end = strip_start + rows
+                if strip_end <= start or strip_start >= end:
+                    writer.write_compressed(reader.raw_strip(i), rows)
+                    continue
+                
+                # Bande coupée: garder ce qui précède et ce qui suit la plage
+                data = reader.read_strip(i)
+                keep = [data[:max(start - strip_start, 0)], data[max(end - strip_start, 0):]]
+                keep = [part for part in keep if part.shape[0]]
+                if keep:
+                    writer.write_rows(np.concatenate(keep))
+                    writer.flush()
+                    reencoded += 1
+        except BaseException:
+            writer.abort()
+            raise
+    finally:
+        reader.close()
+    
+    # Lecteur fermé avant le remplacement du fichier (Windows)
+    writer.close()
+    return reencoded
+
+
+def open_strips(image_path):
+    """
+    StripReader du panorama s'il existe un stockage par bandes à jour
+    (pas plus ancien que l'image), sinon None.
+    """
+    image_path = Path(image_path)
+    path = strips_path_for(image_path)
+    try:
+        if image_path.exists() and path.stat().st_mtime < image_path.stat().st_mtime:
+            return None
+        return StripReader(path)
+    except (OSError, ValueError):
+        return None
+
+
+def load_panorama(image_path):
+    """Panorama en image PIL, depuis son stockage par bandes s'il est à jour"""
+    reader = open_strips(image_path)
+    if reader is None:
+        from PIL import Image
+        return Image.open(image_path)
+    with reader:
+        return reader.to_image()
+
+
+def _pil_rows(image):
+    if image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.mode or 'transparency' in image.info else 'RGB')
+    array = np.asarray(image)
+    return array[:, :, None] if array.ndim == 2 else array
+
+
+class PanoramaRows:
+    """
+    Lecture séquentielle des lignes d'un panorama, de haut en bas.
+    
+    Source: image PIL, ou chemin d'un panorama lu depuis son stockage par
+    bandes s'il est à jour, sinon ligne par ligne depuis le PNG
+    (PNGRowReader). Un PNG que PNGRowReader ne sait pas lire (filtres
+    avg/paeth d'un autre encodeur) est décodé en entier.
+    """
+    
+    def __init__(self, source):
+        from image_io import PNGRowReader
+        
+        self.position = 0
+        self._strips = self._png = self._array = None
+        
+        if hasattr(source, 'mode'):
+            self._array = _pil_rows(source)
+        else:
+            path = Path(source)
+            self._strips = open_strips(path)
+            if self._strips is None:
+                try:
+                    self._png = PNGRowReader(path)
+                except ValueError:
+                    self._load(path)
+        
+        backend = self._strips or self._png
+        if backend is not None:
+            self.width, self.height, self.channels = backend.width, backend.height, backend.channels
+        else:
+            self.height, self.width, self.channels = self._array.shape
+    
+    def _load(self, path):
+        from PIL import Image
+        with Image.open(path) as image:
+            self._array = _pil_rows(image)
+    
+    def read(self, count):
+        """Lignes suivantes (au plus `count`, tableau (n, largeur, canaux))"""
+        start = self.position
+        end = min(start + count, self.height)
+        self.position = end
+        
+        if self._strips is not None:
+            return self._strips.read_rows(start, end, threads=1)
+        if self._png is not None:
+            try:
+                return self._png.read_rows(end - start)
+            except ValueError:
+                path = self._png.path
+                self._png.close()
+                self._png = None
+                self._load(path)
+        return self._array[start:end]
+    
+    def close(self):
+        for backend in (self._strips, self._png):
+            if backend is not None:
+                backend.close()
+        self._array = None
+
+
+def export_image(strips_path, image_path, options=None, progress=None):
+    """
+    Réécrit le panorama (PNG) à partir du stockage par bandes, bande par bande.
+    `progress(lignes écrites, lignes totales)` est appelé après chaque bande.
+    """
+    from image_io import StreamingPNGWriter
+    
+    strips_path = Path(strips_path)
+    with StripReader(strips_path) as reader:
+        with StreamingPNGWriter(image_path, reader.width, reader.height, reader.channels, options) as writer:
+            done = 0
+            for rows in reader.iter_bands():
+                writer.write_rows(rows)
+                done += rows.shape[0]
+                if progress:
+                    progress(done, reader.height)
+    # Le stockage reste la référence: pas plus ancien que l'image exportée
+    os.utime(strips_path)
@@ -4,12 +4,132 @@ Module de génération de tableaux
 Factorisation du code commun entre concat.py et main.py
 """
 
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
+import numpy as np
 from datetime import datetime, timedelta
 import re
 
 from config import config
+from build_manifest import BuildManifest, fingerprint, input_metadata
+from image_io import EncodeOptions, StreamingPNGWriter, decode_png_strip, read_png_strip, write_image
+from strip_store import PanoramaRows, strips_path_for
+from video_cache import load_sidecar, save_sidecar, sidecar_path
+
+
+def _column_key(image):
+    """Empreinte d'une colonne (fichier panorama et stockage par bandes), None pour une image PIL"""
+    if hasattr(image, 'mode'):
+        return None
+    path = Path(image)
+    strips = strips_path_for(path)
+    return fingerprint({
+        'image': input_metadata(path),
+        'strips': input_metadata(strips) if strips.exists() else None,
+    })
+
+
+def _rows_hash(rows):
+    """Empreinte des lignes d'une colonne dans une bande"""
+    return hashlib.blake2b(np.ascontiguousarray(rows).tobytes(), digest_size=16).hexdigest()
+
+
+EMPTY_HASH = hashlib.blake2b(b'', digest_size=16).hexdigest()
+
+FONT_CANDIDATES = (
+    "arial.ttf",
+    "Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+)
+
+
+@lru_cache(maxsize=None)
+def _truetype(font_path, size):
+    """Police chargée une seule fois par chemin et taille (None si introuvable)"""
+    try:
+        return ImageFont.truetype(font_path, size)
+    except (OSError, IOError):
+        return None
+
+
+@lru_cache(maxsize=None)
+def _find_font(size):
+    # Essayer plusieurs polices
+    for font_path in FONT_CANDIDATES:
+        font = _truetype(font_path, size)
+        if font is not None:
+            return font
+    
+    # Fallback
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=64)
+def _render_header(widths, headers, header_height, transparent_bg, font_size):
+    """Bande d'en-tête dessinée (en cache: ne pas modifier l'image retournée)"""
+    header_bg = (240, 240, 240, 255) if not transparent_bg else (255, 255, 255, 255)
+    header_img = Image.new('RGBA', (sum(widths), header_height), header_bg)
+    draw = ImageDraw.Draw(header_img)
+    
+    # Charger la police
+    font = TableGenerator.load_font(font_size)
+    
+    # Dessiner les en-têtes
+    x_offset = 0
+    for width, header in zip(widths, headers):
+        # Centrer le texte
+        bbox = draw.textbbox((0, 0), header, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        
+        x = x_offset + (width - text_width) // 2
+        y = (header_height - text_height) // 2
+        
+        draw.text((x, y), header, fill=(0, 0, 0, 255), font=font)
+        x_offset += width
+    
+    return header_img
+
+
+def _paste_rgba(target, rows):
+    """Copie des lignes L/LA/RGB/RGBA dans une bande RGBA (comme un paste PIL après convert)"""
+    channels = rows.shape[2]
+    if channels in (1, 2):
+        target[..., :3] = rows[..., :1]
+    else:
+        target[..., :3] = rows[..., :3]
+    target[..., 3] = rows[..., -1] if channels in (2, 4) else 255
+
+
+class _ImageBands:
+    """Réunit les bandes pour les formats sans encodeur par bandes (ex: WebP)"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.bands = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            write_image(self.path, np.concatenate(self.bands))
+        return False
+    
+    def write_rows(self, rows):
+        self.bands.append(rows.copy())
+
+
+def _table_writer(path, width, height, options):
+    if path.suffix.lower() == '.png':
+        return StreamingPNGWriter(path, width, height, channels=4, options=options)
+    return _ImageBands(path)
 
 
 class TableGenerator:
@@ -76,42 +196,56 @@ class TableGenerator:
     
     @staticmethod
     def load_font(size=None):
-        """Charge une police appropriée"""
+        """Charge une police appropriée (mise en cache par taille pour tout le processus)"""
         if size is None:
             size = config.header_font_size
+        return _find_font(size)
+    
+    @staticmethod
+    def render_header(widths, headers, header_height=None, transparent_bg=False):
+        """
+        Dessine la bande d'en-tête (un titre centré par colonne). Les bandes
+        déjà dessinées sont réutilisées (mêmes titres, largeurs, hauteur, fond
+        et taille de police).
         
-        # Essayer plusieurs polices
-        font_candidates = [
-            "arial.ttf",
-            "Arial.ttf",
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-            "DejaVuSans-Bold.ttf",
-            "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
-        ]
-        
-        for font_path in font_candidates:
-            try:
-                return ImageFont.truetype(font_path, size)
-            except (OSError, IOError):
-                continue
-        
-        # Fallback
-        return ImageFont.load_default()
+        Returns:
+            Image RGBA (somme des largeurs x header_height)
+        """
+        if header_height is None:
+            header_height = config.header_height
+        return _render_header(
+            tuple(widths), tuple(headers), header_height, transparent_bg, config.header_font_size
+        ).copy()
     
     @staticmethod
-    def generate(images, headers, output_path, header_height=None, transparent_bg=False):
+    def generate(images, headers, output_path, header_height=None, transparent_bg=False, progress=None):
         """
         Génère un tableau combiné à partir d'images.
         
+        Le tableau est écrit bande par bande (bandes de l'encodeur PNG):
+        chaque colonne est lue au fur et à mesure, sans canevas complet ni
+        conversion RGBA des images entières. Les colonnes sont décodées en
+        parallèle (un thread par jour, zlib libère le GIL), une bande
+        d'avance sur la composition et l'encodage.
+        
+        Un tableau PNG garde sa mise en page à côté de lui
+        (<tableau>.layout.json: largeurs, hauteurs, empreinte de chaque
+        colonne et de ses lignes dans chaque bande). Si seules certaines
+        colonnes ont changé, à largeur égale, seules elles sont relues: les
+        bandes qu'elles ne modifient pas sont recopiées du PNG précédent sans
+        réencodage, les autres sont décodées depuis ce PNG et corrigées.
+        
         Args:
-            images: Liste d'objets PIL.Image
+            images: Liste d'objets PIL.Image ou de chemins de panoramas
+                (lus par bandes, voir PanoramaRows)
             headers: Liste des en-têtes (même longueur que images)
             output_path: Chemin de sortie (Path ou str)
             header_height: Hauteur de l'en-tête (défaut: config.header_height)
             transparent_bg: Si True, fond transparent
+            progress: Callback(lignes écrites, lignes totales) appelé après chaque bande
         
         Returns:
-            Tuple (success: bool, result_image: Image ou None, error: str ou None)
+            Tuple (success: bool, size: (largeur, hauteur) ou None, error: str ou None)
         """
         if not images:
             return False, None, "Aucune image fournie"
@@ -122,73 +256,171 @@ class TableGenerator:
         if header_height is None:
             header_height = config.header_height
         
+        output_path = Path(output_path)
+        options = EncodeOptions.from_config()
+        count = len(images)
+        
+        # Mise en page du tableau précédent, si elle permet de le corriger
+        keys = [_column_key(img) for img in images]
+        cacheable = output_path.suffix.lower() == '.png' and options.filter != 'up' and None not in keys
+        expected = {
+            'header': fingerprint({
+                'headers': headers, 'header_height': header_height,
+                'font_size': config.header_font_size, 'transparent_bg': transparent_bg,
+            }),
+            'strip_rows': options.strip_rows,
+            # Bandes recopiées telles quelles: mêmes réglages d'encodage requis
+            'filter': options.filter,
+            'compression': options.compression,
+            'count': count,
+        }
+        layout = load_sidecar(output_path, 'layout', expected) if cacheable else None
+        
+        columns = {}
+        executor = ThreadPoolExecutor(max_workers=count)
+        
+        def open_columns(indices):
+            # Ouverture en parallèle (un PNG non lisible par bandes est décodé en entier)
+            opening = {i: executor.submit(PanoramaRows, images[i]) for i in indices}
+            for future in opening.values():
+                future.exception()
+            for i, future in opening.items():
+                if future.exception() is None:
+                    columns[i] = future.result()
+            for future in opening.values():
+                if future.exception() is not None:
+                    raise future.exception()
+        
+        old_file = None
         try:
+            open_columns([i for i in range(count) if layout is None or keys[i] != layout['columns'][i]])
+            
             # Calculer les dimensions
-            max_height = max(img.height for img in images)
-            total_width = sum(img.width for img in images)
+            widths = [columns[i].width if i in columns else layout['widths'][i] for i in range(count)]
+            if layout is not None and widths != layout['widths']:
+                # Largeur modifiée: tout recomposer
+                layout = None
+                open_columns([i for i in range(count) if i not in columns])
+            heights = [columns[i].height if i in columns else layout['heights'][i] for i in range(count)]
+            offsets = [sum(widths[:i]) for i in range(count)]
+            max_height = max(heights)
+            total_width = sum(widths)
             total_height = max_height + header_height
             
-            # Créer l'image résultat
             bg_color = (255, 255, 255, 0) if transparent_bg else (255, 255, 255, 255)
-            result = Image.new('RGBA', (total_width, total_height), bg_color)
+            if layout is None:
+                header = np.asarray(TableGenerator.render_header(widths, headers, header_height, transparent_bg))
+            else:
+                old_file = open(output_path, 'rb')
+            old_strips = layout['strips'] if layout is not None else []
             
-            # Créer l'en-tête
-            header_bg = (240, 240, 240, 255) if not transparent_bg else (255, 255, 255, 255)
-            header_img = Image.new('RGBA', (total_width, header_height), header_bg)
-            draw = ImageDraw.Draw(header_img)
+            strip_rows = options.strip_rows
+            strip_count = -(-total_height // strip_rows)
+            band = np.empty((strip_rows, total_width, 4), dtype=np.uint8)
+            strip_hashes = []
+            reused = 0
             
-            # Charger la police
-            font = TableGenerator.load_font()
+            def read_strip(k):
+                start = k * strip_rows
+                end = min(start + strip_rows, total_height)
+                rows = max(end - max(start, header_height), 0)
+                return {i: executor.submit(column.read, rows) for i, column in columns.items()}
             
-            # Dessiner les en-têtes
-            x_offset = 0
-            for img, header in zip(images, headers):
-                # Centrer le texte
-                bbox = draw.textbbox((0, 0), header, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                
-                x = x_offset + (img.width - text_width) // 2
-                y = (header_height - text_height) // 2
+            with _table_writer(output_path, total_width, total_height, options) as writer:
+                pending = read_strip(0)
+                for k in range(strip_count):
+                    start = k * strip_rows
+                    end = min(start + strip_rows, total_height)
+                    top = max(header_height - start, 0)
+                    bands = {i: future.result() for i, future in pending.items()}
+                    # Bande suivante décodée pendant la composition de celle-ci
+                    if k + 1 < strip_count:
+                        pending = read_strip(k + 1)
+                    
+                    old = old_strips[k] if k < len(old_strips) else None
+                    last = k == strip_count - 1
+                    if cacheable:
+                        # Colonne inchangée: mêmes lignes que dans la bande k précédente
+                        hashes = [
+                            _rows_hash(bands[i]) if i in bands else old[5][i] if old else EMPTY_HASH
+                            for i in range(count)
+                        ]
+                        strip_hashes.append(hashes)
+                        if (old is not None and old[4] == end - start and old[6] == last
+                                and old[5] == hashes):
+                            writer.write_encoded(read_png_strip(old_file, old[0], old[1]), old[2], old[3], end - start)
+                            reused += 1
+                            if progress:
+                                progress(end, total_height)
+                            continue
+                    
+                    rows_out = band[:end - start]
+                    rows_out[:] = bg_color
+                    if layout is None:
+                        rows_out[:top] = header[start:start + top]
+                    elif old is not None:
+                        previous = decode_png_strip(read_png_strip(old_file, old[0], old[1]), total_width, 4)
+                        # Tableau raccourci: l'ancienne bande peut dépasser la nouvelle fin
+                        kept = min(previous.shape[0], end - start)
+                        rows_out[:kept] = previous[:kept]
+                    
+                    for i, rows in bands.items():
+                        region = rows_out[top:, offsets[i]:offsets[i] + widths[i]]
+                        region[:] = bg_color
+                        _paste_rgba(region[:rows.shape[0]], rows)
+                    writer.write_rows(rows_out)
+                    
+                    if progress:
+                        progress(end, total_height)
                 
-                draw.text((x, y), header, fill=(0, 0, 0, 255), font=font)
-                x_offset += img.width
+                if old_file is not None:
+                    old_file.close()
             
-            # Coller l'en-tête
-            result.paste(header_img, (0, 0))
-            
-            # Coller les images
-            x_offset = 0
-            for img in images:
-                # Convertir en RGBA si nécessaire
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                result.paste(img, (x_offset, header_height))
-                x_offset += img.width
-            
-            # Sauvegarder
-            output_path = Path(output_path)
-            result.save(output_path)
-            
-            return True, result, None
+            if cacheable:
+                save_sidecar(output_path, 'layout', dict(
+                    expected, columns=keys, widths=widths, heights=heights,
+                    strips=[
+                        [*info, hashes, k == strip_count - 1]
+                        for k, (info, hashes) in enumerate(zip(writer.strips, strip_hashes))
+                    ],
+                ))
+            if layout is not None:
+                print(f"Tableau corrigé: {len(columns)} colonne(s) relue(s), {reused}/{strip_count} bandes recopiées")
             
+            return True, (total_width, total_height), None
+        
         except Exception as e:
+            # Mise en page peut-être inutilisable: la prochaine génération repart de zéro
+            sidecar_path(output_path, 'layout').unlink(missing_ok=True)
             return False, None, str(e)
+        
+        finally:
+            executor.shutdown(wait=True)
+            if old_file is not None:
+                old_file.close()
+            for column in columns.values():
+                column.close()
     
     @staticmethod
-    def generate_from_folder(folder_path, output_name=None, days=None):
+    def generate_from_folder(folder_path, output_name=None, days=None, force=False, progress=None):
         """
         Génère un tableau à partir d'un dossier contenant les panoramas.
         
+        Le tableau n'est reconstruit que si l'une de ses entrées (panoramas,
+        en-têtes, options) a changé depuis la dernière génération, sauf si
+        `force` est vrai.
+        
         Args:
             folder_path: Chemin du dossier
             output_name: Nom du fichier de sortie (défaut: nom du dossier)
             days: Liste des jours à inclure (défaut: lundi à samedi)
+            force: Regénérer même si le tableau est à jour
+            progress: Callback(lignes écrites, lignes totales), voir generate
         
         Returns:
             Tuple (success: bool, output_path: Path ou None, error: str ou None)
         """
-        folder_path = Path(folder_path)
+        folder_path = Path(folder_path).resolve()
         
         if not folder_path.is_dir():
             return False, None, f"Dossier invalide: {folder_path}"
@@ -196,19 +428,36 @@ class TableGenerator:
         if days is None:
             days = list(config.days)  # Exclure 'semaine'
         
-        # Charger les images
+        if output_name is None:
+            output_name = f"{folder_path.name}.png"
+        output_path = folder_path / output_name
+        
+        # Vérifier si le tableau est à jour
+        manifest = BuildManifest(folder_path)
+        manifest_key = f"table:{output_name}"
+        inputs = [folder_path / f"{day}.png" for day in days]
+        inputs = [p for p in inputs if p.exists()]
+        current = fingerprint({
+            'folder': folder_path.name,
+            'inputs': [input_metadata(p) for p in inputs],
+            'header_height': config.header_height,
+            'header_font_size': config.header_font_size,
+            'transparent_bg': True,
+        })
+        
+        if not force and inputs and manifest.is_up_to_date(manifest_key, current, output_path, inputs):
+            print(f"Tableau à jour: {output_path.name}")
+            return True, output_path, None
+        
+        # Panoramas lus par bandes pendant la composition
         images = []
         valid_days = []
         
         for day in days:
             img_path = folder_path / f"{day}.png"
             if img_path.exists():
-                try:
-                    img = Image.open(img_path)
-                    images.append(img)
-                    valid_days.append(day)
-                except Exception as e:
-                    print(f"Erreur chargement {img_path}: {e}")
+                images.append(img_path)
+                valid_days.append(day)
         
         if not images:
             return False, None, "Aucune image trouvée dans le dossier"
@@ -218,22 +467,120 @@ class TableGenerator:
         start_date = TableGenerator.parse_folder_dates(folder_name)
         headers = TableGenerator.generate_headers(start_date, valid_days)
         
-        # Nom de sortie
-        if output_name is None:
-            output_name = f"{folder_name}.png"
-        
-        output_path = folder_path / output_name
-        
         # Générer le tableau
         success, result, error = TableGenerator.generate(
-            images, headers, output_path, transparent_bg=True
+            images, headers, output_path, transparent_bg=True, progress=progress
         )
         
-        # Fermer les images
-        for img in images:
-            img.close()
-        
         if success:
+            manifest.record(manifest_key, current, output_path)
             return True, output_path, None
         else:
             return False, None, error
+    
+    @staticmethod
+    def find_week_folders(root):
+        """
+        Dossiers semaine ('sXwY dd-mm dd-mm') d'une racine.
+        Si la racine est elle-même un dossier semaine, elle est seule retournée.
+        """
+        root = Path(root).resolve()
+        if TableGenerator.parse_folder_dates(root.name):
+            return [root]
+        
+        return sorted(
+            path for path in root.iterdir()
+            if path.is_dir() and TableGenerator.parse_folder_dates(path.name)
+        )
+    
+    @staticmethod
+    def generate_season(root, workers=None, force=False, overview_path=None, on_week=None):
+        """
+        Génère les tableaux de tous les dossiers semaine d'une racine, en
+        parallèle dans des processus, et si demandé une vue d'ensemble de la
+        saison (tableaux réduits à config.season_overview_width, côte à côte).
+        
+        Args:
+            root: Dossier saison contenant les dossiers semaine
+            workers: Processus simultanés (défaut: nombre de cœurs)
+            force: Regénérer même les tableaux à jour
+            overview_path: Image de la vue d'ensemble (None = pas de vue)
+            on_week: Callback(résultat) appelé à la fin de chaque semaine
+        
+        Returns:
+            Tuple (success: bool, results: liste de dicts folder/success/output/error,
+                error: str ou None)
+        """
+        weeks = TableGenerator.find_week_folders(root)
+        if not weeks:
+            return False, [], f"Aucun dossier semaine dans {root}"
+        
+        thumb_width = config.season_overview_width if overview_path else 0
+        workers = max(1, min(workers or os.cpu_count() or 1, len(weeks)))
+        results = {}
+        thumbnails = {}
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_season_week, str(folder), force, thumb_width): folder
+                for folder in weeks
+            }
+            for future in as_completed(futures):
+                folder = futures[future]
+                try:
+                    success, output_path, error, thumbnail = future.result()
+                except Exception as e:
+                    success, output_path, error, thumbnail = False, None, f"{type(e).__name__}: {e}", None
+                
+                result = {
+                    'folder': folder.name,
+                    'success': success,
+                    'output': output_path,
+                    'error': error,
+                }
+                results[folder] = result
+                if thumbnail is not None:
+                    thumbnails[folder] = thumbnail
+                if on_week:
+                    on_week(result)
+        
+        results = [results[folder] for folder in weeks]
+        failed = [result['folder'] for result in results if not result['success']]
+        error = f"{len(failed)} semaine(s) en échec: {', '.join(failed)}" if failed else None
+        
+        if overview_path and thumbnails:
+            names = [folder.name for folder in weeks if folder in thumbnails]
+            images = [Image.fromarray(thumbnails[folder], 'RGBA') for folder in weeks if folder in thumbnails]
+            success, _, overview_error = TableGenerator.generate(images, names, overview_path)
+            if not success:
+                error = f"Vue d'ensemble: {overview_error}" if error is None else f"{error}; vue d'ensemble: {overview_error}"
+        
+        return error is None, results, error
+
+
+def _table_thumbnail(path, width):
+    """
+    Tableau réduit à environ `width` pixels de large (facteur entier, boîte),
+    lu et réduit par bandes.
+    """
+    rows = PanoramaRows(path)
+    try:
+        factor = max(1, round(rows.width / width))
+        bands = []
+        while rows.position < rows.height:
+            band = rows.read(factor * 64)
+            # Bandes multiples du facteur: même résultat qu'une réduction de l'image entière
+            image = Image.fromarray(band[:, :, 0] if band.shape[2] == 1 else band)
+            bands.append(np.asarray(image.convert('RGBA').reduce(factor)))
+        return np.concatenate(bands)
+    finally:
+        rows.close()
+
+
+def _season_week(folder, force, thumb_width):
+    """Tableau d'un dossier semaine (exécuté dans un processus de generate_season)"""
+    success, output_path, error = TableGenerator.generate_from_folder(folder, force=force)
+    thumbnail = None
+    if success and thumb_width:
+        thumbnail = _table_thumbnail(output_path, thumb_width)
+    return success, output_path, error, thumbnail
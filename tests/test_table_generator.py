@@ -0,0 +1,74 @@
+"""Régénération partielle du tableau: identique à une reconstruction complète"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from table_generator import TableGenerator
+
+
+HEADERS = ['lundi', 'mardi', 'mercredi']
+HEIGHTS = [1500, 2300, 1800]
+
+
+def _write_columns(folder, heights):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i, height in enumerate(heights):
+        path = folder / f"c{i}.png"
+        Image.fromarray(rng.integers(0, 255, (height, 300, 3), dtype=np.uint8)).save(path)
+        paths.append(path)
+    return paths
+
+
+def _regenerate_and_compare(tmp_path, paths):
+    table = tmp_path / 'table.png'
+    success, _, error = TableGenerator.generate(paths, HEADERS, table)
+    assert success, error
+    
+    full = tmp_path / 'full.png'
+    success, _, error = TableGenerator.generate(paths, HEADERS, full)
+    assert success, error
+    assert np.array_equal(np.asarray(Image.open(table)), np.asarray(Image.open(full)))
+
+
+@pytest.mark.parametrize('height', [1963, 1200])
+def test_shrinking_crop_matches_full_rebuild(tmp_path, height):
+    paths = _write_columns(tmp_path, HEIGHTS)
+    success, _, error = TableGenerator.generate(paths, HEADERS, tmp_path / 'table.png')
+    assert success, error
+    
+    # Recadrage du jour le plus haut: le tableau raccourcit
+    Image.open(paths[1]).crop((0, 0, 300, height)).save(paths[1])
+    _regenerate_and_compare(tmp_path, paths)
+
+
+def test_growing_crop_matches_full_rebuild(tmp_path):
+    paths = _write_columns(tmp_path, HEIGHTS)
+    success, _, error = TableGenerator.generate(paths, HEADERS, tmp_path / 'table.png')
+    assert success, error
+    
+    rng = np.random.default_rng(1)
+    Image.fromarray(rng.integers(0, 255, (2900, 300, 3), dtype=np.uint8)).save(paths[0])
+    _regenerate_and_compare(tmp_path, paths)
+
+
+def test_encoding_change_matches_full_rebuild(tmp_path, monkeypatch):
+    from config import config
+    
+    paths = _write_columns(tmp_path, HEIGHTS)
+    success, _, error = TableGenerator.generate(paths, HEADERS, tmp_path / 'table.png')
+    assert success, error
+    
+    # Bandes encodées avec l'ancien niveau: elles ne doivent pas être recopiées
+    monkeypatch.setattr(config, 'png_compression', 6)
+    success, _, error = TableGenerator.generate(paths, HEADERS, tmp_path / 'table.png')
+    assert success, error
+    success, _, error = TableGenerator.generate(paths, HEADERS, tmp_path / 'full.png')
+    assert success, error
+    assert (tmp_path / 'table.png').read_bytes() == (tmp_path / 'full.png').read_bytes()
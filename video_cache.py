@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Cache des résultats d'analyse par vidéo
+Fichiers annexes (sidecar) stockés à côté de la vidéo, invalidés
+automatiquement si la vidéo change (chemin, date de modification, taille)
+"""
+
+import json
+import os
+from pathlib import Path
+
+
+def file_signature(path):
+    """
+    Signature d'un fichier: chemin absolu, date de modification et taille.
+    
+    Returns:
+        Dict sérialisable en JSON
+    """
+    path = Path(path)
+    stat = path.stat()
+    return {
+        'path': str(path.resolve()),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+    }
+
+
+def sidecar_path(video_path, kind, extension='json'):
+    """Chemin du fichier annexe `<nom>.<kind>.<extension>` à côté de la vidéo"""
+    video_path = Path(video_path)
+    return video_path.with_name(f"{video_path.stem}.{kind}.{extension}")
+
+
+def load_sidecar(video_path, kind, expected=None):
+    """
+    Charge un fichier annexe JSON s'il est encore valide.
+    
+    Args:
+        video_path: Vidéo source
+        kind: Type d'annexe (ex: 'bands')
+        expected: Paramètres qui doivent être identiques à ceux enregistrés
+    
+    Returns:
+        Le contenu du fichier ou None (absent, périmé ou illisible)
+    """
+    path = sidecar_path(video_path, kind)
+    if not path.exists():
+        return None
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        if data.get('signature') != file_signature(video_path):
+            return None
+        
+        for key, value in (expected or {}).items():
+            if data.get(key) != value:
+                return None
+        
+        return data
+    except (OSError, ValueError):
+        return None
+
+
+def save_sidecar(video_path, kind, data):
+    """
+    Enregistre un fichier annexe JSON avec la signature de la vidéo.
+    
+    Returns:
+        True si l'écriture a réussi
+    """
+    path = sidecar_path(video_path, kind)
+    data = dict(data, signature=file_signature(video_path))
+    tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"Erreur sauvegarde cache {path.name}: {e}")
+        return False
@@ -11,8 +11,10 @@ import numpy as np
 from pathlib import Path
 import threading
 import time
+import json
 
 from config import config
+from video_cache import sidecar_path
 
 try:
     import mss
@@ -236,6 +238,8 @@ class VideoCapture:
         self.record_thread = None
         self.start_time = None
         self.frame_count = 0
+        self.skipped_frames = 0
+        self.frame_timestamps = []
         self.region_selector = None
         self.current_output_path = None
         self._recording_lock = threading.Lock()
@@ -317,6 +321,8 @@ class VideoCapture:
                 self.recording = True
             self.start_time = time.time()
             self.frame_count = 0
+            self.skipped_frames = 0
+            self.frame_timestamps = []
             self.current_output_path = output_path
             
             # Démarrer le thread d'enregistrement
@@ -353,6 +359,8 @@ class VideoCapture:
         try:
             import mss as mss_module
             sct = mss_module.mss()
+            last_signature = None
+            grabbed = 0
             
             while True:
                 with self._recording_lock:
@@ -361,17 +369,31 @@ class VideoCapture:
                 
                 # Capturer l'écran
                 screenshot = sct.grab(self.monitor)
+                timestamp = time.time() - self.start_time
+                grabbed += 1
                 
                 # Convertir en numpy array BGR
                 frame = np.array(screenshot)
                 frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
                 
-                # Écrire la frame
-                self.writer.write(frame)
-                self.frame_count += 1
+                # Ignorer les frames identiques (classement en pause)
+                write_frame = True
+                if config.capture_skip_duplicates:
+                    signature = self._frame_signature(frame)
+                    if self._is_unchanged(signature, last_signature):
+                        write_frame = False
+                        self.skipped_frames += 1
+                    else:
+                        last_signature = signature
+                
+                if write_frame:
+                    # Écrire la frame et garder son horodatage
+                    self.writer.write(frame)
+                    self.frame_count += 1
+                    self.frame_timestamps.append(round(timestamp, 3))
                 
                 # Mise à jour UI périodique
-                if self.frame_count % 30 == 0:
+                if grabbed % 30 == 0:
                     elapsed = time.time() - self.start_time
                     
                     if self.region_selector:
@@ -404,6 +426,48 @@ class VideoCapture:
                 except Exception:
                     pass
     
+    def _frame_signature(self, frame):
+        """Miniature en niveaux de gris utilisée pour détecter les frames inchangées"""
+        height, width = frame.shape[:2]
+        thumb_width = min(config.capture_thumbnail_width, width)
+        thumb_height = max(1, int(height * thumb_width / width))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+    
+    def _is_unchanged(self, signature, last_signature):
+        """Vrai si la miniature n'a pas changé depuis la dernière frame écrite"""
+        if last_signature is None or signature.shape != last_signature.shape:
+            return False
+        diff = cv2.absdiff(signature, last_signature)
+        return float(np.mean(diff)) < config.capture_change_threshold
+    
+    def timestamp_index_path(self, video_path=None):
+        """Chemin de l'index des horodatages associé à une vidéo"""
+        return sidecar_path(video_path or self.current_output_path, 'timestamps')
+    
+    def _write_timestamp_index(self):
+        """
+        Sauvegarde l'horodatage de chaque frame écrite.
+        
+        Les frames inchangées n'étant pas encodées, la vidéo ne suit plus
+        le FPS nominal: cet index permet de reconstruire la chronologie.
+        """
+        if not self.current_output_path:
+            return
+        
+        index = {
+            'fps': self.fps,
+            'frames_written': self.frame_count,
+            'frames_skipped': self.skipped_frames,
+            'timestamps': self.frame_timestamps,
+        }
+        
+        try:
+            with open(self.timestamp_index_path(), 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+        except OSError as e:
+            self.parent.log(f"⚠️ Index des horodatages non sauvegardé: {e}")
+    
     def stop_recording(self):
         """Arrête l'enregistrement et sauvegarde"""
         with self._recording_lock:
@@ -423,8 +487,11 @@ class VideoCapture:
         # Finaliser
         elapsed = time.time() - self.start_time if self.start_time else 0
         self.cleanup()
+        self._write_timestamp_index()
         
         self.parent.log(f"⏹️ Enregistrement arrêté: {self.frame_count} frames en {elapsed:.1f}s")
+        if self.skipped_frames:
+            self.parent.log(f"⏭️ Frames inchangées ignorées: {self.skipped_frames}")
         self.parent.log(f"💾 Sauvegardé: {self.current_output_path}")
         
         return True
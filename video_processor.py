@@ -4,15 +4,20 @@ Module 1 : Traitement parallèle des vidéos
 Version améliorée avec thread safety et estimation du temps restant
 """
 
-import subprocess
 import threading
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import CancelledError, as_completed
 import time
-import shutil
-import os
 
-from config import config
+from build_manifest import BuildManifest
+from panorama_runner import (
+    estimate_job_cost, estimate_job_memory_mb, probe_video, run_panorama, split_parts_for,
+    stitch_parameters, video_fingerprint
+)
+from eta import EtaEstimator, format_duration
+from run_history import RunHistory
+from run_metrics import RunMetrics
+from job_scheduler import JobScheduler
 
 
 class VideoProcessor:
@@ -23,6 +28,14 @@ class VideoProcessor:
         self._processing_lock = threading.Lock()
         self._processing_active = False
         self._video_times = []  # Pour estimer le temps restant
+        self._manifests = {}  # Manifeste de construction par dossier
+        self._manifest_lock = threading.Lock()
+        self._job_start_times = {}
+        self.scheduler = JobScheduler()
+        self.eta = None  # Estimation du temps restant du traitement en cours
+        self.cancel_event = threading.Event()
+        self._futures = {}
+        self.metrics = None  # Métriques du traitement en cours (RunMetrics)
     
     @property
     def processing_active(self):
@@ -69,44 +82,71 @@ class VideoProcessor:
         
         self.processing_active = True
         self._video_times = []  # Reset des temps
+        self.cancel_event = threading.Event()
         
         thread = threading.Thread(target=self.run_parallel_processing, args=(days,))
         thread.daemon = True
         thread.start()
     
-    def _estimate_remaining_time(self, completed, total, max_workers):
-        """Estime le temps restant basé sur les temps précédents"""
-        if not self._video_times or completed == 0:
-            return None
+    def cancel_processing(self):
+        """Annule le traitement: vidéos en file retirées, assemblages en cours tués"""
+        if not self.processing_active:
+            return
         
-        avg_time = sum(self._video_times) / len(self._video_times)
-        remaining_videos = total - completed
+        self.parent.log("⛔ Annulation demandée...")
+        self.cancel_event.set()
+        for future in list(self._futures):
+            future.cancel()
+    
+    def _estimate_remaining_time(self):
+        """Temps restant estimé (débit en frames/s et durée des vidéos restantes)"""
+        if self.eta is None:
+            return None
+        return self.eta.remaining_seconds()
+    
+    def _stitch_parameters(self):
+        """Paramètres d'assemblage choisis dans l'interface"""
+        return stitch_parameters(
+            template_height=self.parent.template_height.get(),
+            quality_threshold=self.parent.quality_threshold.get(),
+            roi_top=self.parent.roi_top.get(),
+            roi_bottom=self.parent.roi_bottom.get(),
+            roi_auto=self.parent.roi_auto.get(),
+        )
+    
+    def _manifest_for(self, video_path):
+        """Manifeste du dossier contenant la vidéo (chargé une fois par traitement)"""
+        folder = Path(video_path).parent
+        with self._manifest_lock:
+            if folder not in self._manifests:
+                self._manifests[folder] = BuildManifest(folder)
+            return self._manifests[folder]
+    
+    def is_day_up_to_date(self, day, stitch_params):
+        """Vrai si <jour>.png est plus récent que la vidéo et les paramètres n'ont pas changé"""
+        video_path = self.parent.video_files[day]
+        output_path = video_path.parent / f"{day}.png"
         
-        # Estimation tenant compte du parallélisme
-        batches_remaining = remaining_videos / max_workers
-        estimated_seconds = batches_remaining * avg_time
+        try:
+            current = video_fingerprint(video_path, stitch_params)
+        except OSError:
+            return False
         
-        return estimated_seconds
+        return self._manifest_for(video_path).is_up_to_date(
+            f"day:{day}", current, output_path, inputs=[video_path]
+        )
     
     def _format_time(self, seconds):
         """Formate les secondes en string lisible"""
-        if seconds is None:
-            return "..."
-        
-        if seconds < 60:
-            return f"{int(seconds)}s"
-        elif seconds < 3600:
-            minutes = int(seconds // 60)
-            secs = int(seconds % 60)
-            return f"{minutes}m{secs:02d}s"
-        else:
-            hours = int(seconds // 3600)
-            minutes = int((seconds % 3600) // 60)
-            return f"{hours}h{minutes:02d}m"
+        return format_duration(seconds)
     
     def run_parallel_processing(self, days):
         """Exécute le traitement en parallèle dans un thread"""
         max_workers = self.parent.max_workers.get()
+        stitch_params = self._stitch_parameters()
+        force = self.parent.force_reprocess.get()
+        split_parts = self.parent.split_parts.get()
+        self._manifests = {}
         
         self.parent.log("=" * 50)
         self.parent.log(f"🚀 DÉMARRAGE DU TRAITEMENT PARALLÈLE")
@@ -120,65 +160,113 @@ class VideoProcessor:
         
         completed = 0
         failed = 0
+        cancelled = 0
+        skipped = 0
         start_time = time.time()
-        video_start_times = {}
+        self._job_start_times = {}
         
         try:
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = {}
-                for day in days:
-                    if day in self.parent.video_files:
-                        video_start_times[day] = time.time()
-                        future = executor.submit(self.process_single_video, day)
-                        futures[future] = day
-                        self.parent.log(f"📤 Job soumis: {day}")
-                        self.parent.update_queue.put(('status', day, '🔄 Démarrage...', '0%'))
-                
-                for future in as_completed(futures):
-                    day = futures[future]
+            # File persistante: les vidéos les plus longues démarrent en premier
+            self.scheduler.set_max_workers(max_workers)
+            history = RunHistory()
+            self.eta = EtaEstimator(self.scheduler.capacity, history)
+            self.metrics = RunMetrics('gui')
+            futures = self._futures = {}
+            for day in days:
+                if day in self.parent.video_files:
+                    # Ignorer les jours déjà à jour
+                    if not force and self.is_day_up_to_date(day, stitch_params):
+                        skipped += 1
+                        self.parent.log(f"⏭️ {day}: À jour, ignoré")
+                        self.parent.update_queue.put(('status', day, '✅ À jour', '100%'))
+                        self.metrics.add_video(
+                            self.parent.video_files[day].parent.name, day, 'skipped', 0.0
+                        )
+                        self.parent.panorama_files[day] = self.parent.video_files[day].parent / f"{day}.png"
+                        continue
                     
-                    # Calculer le temps de ce traitement
-                    video_time = time.time() - video_start_times.get(day, time.time())
+                    video_path = self.parent.video_files[day]
+                    info = probe_video(video_path)
+                    parts = split_parts_for(video_path, split_parts, info)
+                    memory_mb = estimate_job_memory_mb(video_path, history, info, parts)
+                    self.eta.add_job(day, info['frames'], parts)
+                    if self.cancel_event.is_set():
+                        break
+                    future = self.scheduler.submit(
+                        self.process_single_video, day, stitch_params, parts,
+                        cost=estimate_job_cost(video_path), memory_mb=memory_mb,
+                        name=day, slots=parts
+                    )
+                    futures[future] = day
+                    split_info = f", {parts} morceaux" if parts > 1 else ""
+                    self.parent.log(f"📤 Job soumis: {day} (~{memory_mb} Mo{split_info})")
+                    self.parent.update_queue.put(('status', day, '⏳ En file', '0%'))
+            
+            if futures:
+                eta_str = self._format_time(self._estimate_remaining_time())
+                self.parent.update_status(f"Progression: 0/{len(futures)} | ETA: {eta_str}")
+            
+            for future in as_completed(futures):
+                day = futures[future]
+                
+                # Calculer le temps de ce traitement
+                video_time = time.time() - self._job_start_times.get(day, time.time())
+                if day in self._job_start_times:
                     self._video_times.append(video_time)
+                
+                try:
+                    success = future.result()
+                    completed += 1
                     
-                    try:
-                        success = future.result(timeout=config.process_timeout)
-                        completed += 1
-                        
-                        if success:
-                            self.parent.log(f"✅ {day}: Terminé avec succès ({video_time:.1f}s)")
-                            self.parent.update_queue.put(('status', day, '✅ Terminé', '100%'))
-                        else:
-                            failed += 1
-                            self.parent.log(f"❌ {day}: Échec")
-                            self.parent.update_queue.put(('status', day, '❌ Erreur', ''))
-                    
-                    except subprocess.TimeoutExpired:
-                        failed += 1
-                        completed += 1
-                        self.parent.log(f"❌ {day}: Timeout après {config.process_timeout}s")
-                        self.parent.update_queue.put(('status', day, '❌ Timeout', ''))
-                    
-                    except Exception as e:
+                    if success:
+                        self.parent.log(f"✅ {day}: Terminé avec succès ({video_time:.1f}s)")
+                        self.parent.update_queue.put(('status', day, '✅ Terminé', '100%'))
+                    elif self.cancel_event.is_set():
+                        cancelled += 1
+                        self.parent.log(f"⛔ {day}: Annulé")
+                        self.parent.update_queue.put(('status', day, '⛔ Annulé', ''))
+                    else:
                         failed += 1
-                        completed += 1
-                        self.parent.log(f"❌ {day}: Exception - {str(e)}")
-                        self.parent.update_queue.put(('status', day, '❌ Exception', ''))
-                    
-                    # Mise à jour du statut avec estimation
-                    eta = self._estimate_remaining_time(completed, len(days), max_workers)
-                    eta_str = self._format_time(eta)
-                    self.parent.update_status(f"Progression: {completed}/{len(days)} | ETA: {eta_str}")
+                        self.parent.log(f"❌ {day}: Échec")
+                        self.parent.update_queue.put(('status', day, '❌ Erreur', ''))
+                
+                except CancelledError:
+                    # Retiré de la file avant d'avoir démarré
+                    cancelled += 1
+                    completed += 1
+                    self.metrics.add_video(
+                        self.parent.video_files[day].parent.name, day, 'cancelled', 0.0
+                    )
+                    self.parent.log(f"⛔ {day}: Annulé")
+                    self.parent.update_queue.put(('status', day, '⛔ Annulé', ''))
+                
+                except Exception as e:
+                    failed += 1
+                    completed += 1
+                    self.parent.log(f"❌ {day}: Exception - {str(e)}")
+                    self.parent.update_queue.put(('status', day, '❌ Exception', ''))
+                
+                # Mise à jour du statut avec estimation
+                eta_str = self._format_time(self._estimate_remaining_time())
+                self.parent.update_status(f"Progression: {completed}/{len(futures)} | ETA: {eta_str}")
         
         finally:
             elapsed = time.time() - start_time
             self.parent.log("=" * 50)
             self.parent.log(f"🏁 TRAITEMENT TERMINÉ")
             self.parent.log(f"⏱️ Temps total: {elapsed:.1f}s")
-            self.parent.log(f"📊 Succès: {completed - failed}/{completed}")
+            self.parent.log(f"📊 Succès: {completed - failed - cancelled}/{completed}")
+            if cancelled:
+                self.parent.log(f"⛔ Annulées: {cancelled}")
+            if skipped:
+                self.parent.log(f"⏭️ Déjà à jour: {skipped}")
             if self._video_times:
                 avg = sum(self._video_times) / len(self._video_times)
                 self.parent.log(f"⏱️ Temps moyen par vidéo: {avg:.1f}s")
+            if self.metrics is not None and self.metrics.videos:
+                metrics_path = self.metrics.write()
+                if metrics_path:
+                    self.parent.log(f"📈 Métriques: {metrics_path}")
             self.parent.log("=" * 50)
             
             self.processing_active = False
@@ -190,119 +278,71 @@ class VideoProcessor:
                 self.parent.refresh_panorama_list()
             
             from tkinter import messagebox
-            if failed == 0:
+            if cancelled:
+                messagebox.showinfo("Annulé", f"Traitement annulé\n{completed - failed - cancelled} vidéos terminées")
+            elif failed == 0:
                 messagebox.showinfo("Succès", f"Traitement terminé!\n{completed} vidéos en {elapsed:.1f}s")
             else:
                 messagebox.showwarning("Terminé avec erreurs", f"{completed-failed} succès, {failed} erreurs")
     
-    def process_single_video(self, day):
-        """Traite une seule vidéo"""
+    def process_single_video(self, day, stitch_params=None, parts=1):
+        """Traite une seule vidéo (découpée en `parts` morceaux parallèles si > 1)"""
+        if stitch_params is None:
+            stitch_params = self._stitch_parameters()
         video_path = self.parent.video_files[day]
         output_path = video_path.parent / f"{day}.png"
+        self._job_start_times[day] = time.time()
+        if self.eta is not None:
+            self.eta.start(day)
         
         worker_id = threading.get_ident() % 100
         self.parent.update_queue.put(('log', f"🎬 Début: {day} [Worker-{worker_id}]"))
         self.parent.update_queue.put(('status', day, '🔄 En cours...', '0%'))
         
-        success = False
-        try:
-            # Trouver le script panorama.py
-            script_path = Path('panorama.py')
-            if not script_path.exists():
-                script_path = Path(__file__).parent / 'panorama.py'
-                if not script_path.exists():
-                    self.parent.update_queue.put(('status', day, '❌ Script manquant', ''))
-                    return False
-            
-            # Préparer la commande
-            cmd = [os.sys.executable, str(script_path), str(video_path)]
-            
-            # Variables d'environnement pour les paramètres
-            env = os.environ.copy()
-            env['TEMPLATE_HEIGHT'] = str(int(self.parent.template_height.get()))
-            env['QUALITY_THRESHOLD'] = str(self.parent.quality_threshold.get())
-            env['MIN_SCROLL'] = str(config.min_scroll)
-            env['DUPLICATE_THRESHOLD'] = str(config.duplicate_threshold)
-            
-            # Lancer le processus
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                env=env,
-                bufsize=1,
-                universal_newlines=True
-            )
+        progress_state = {'last_update': time.time(), 'last_percent': 0}
+        
+        def on_progress(current, total):
+            if self.eta is not None:
+                self.eta.update(day, current, total)
             
-            last_update = time.time()
-            last_percent = 0
+            # Limiter les mises à jour UI
+            current_time = time.time()
+            if current_time - progress_state['last_update'] <= 0.5:
+                return
             
-            # Lire la sortie
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    break
+            percent = int((current / total) * 100)
+            if percent != progress_state['last_percent']:
+                self.parent.update_queue.put(('status', day, '🔄 En cours...', f'{percent}%'))
+                progress_state['last_percent'] = percent
+                progress_state['last_update'] = current_time
                 
-                if line:
-                    current_time = time.time()
-                    # Limiter les mises à jour UI
-                    if current_time - last_update > 0.5:
-                        line = line.strip()
-                        
-                        if "Progress:" in line or "/" in line:
-                            try:
-                                # Parser "Progress: X/Y frames"
-                                if "/" in line:
-                                    parts = line.split("/")
-                                    current_str = ''.join(filter(str.isdigit, parts[0].split()[-1]))
-                                    total_str = ''.join(filter(str.isdigit, parts[1].split()[0]))
-                                    
-                                    if current_str and total_str:
-                                        current = int(current_str)
-                                        total = int(total_str)
-                                        percent = int((current / total) * 100)
-                                        
-                                        if percent != last_percent:
-                                            self.parent.update_queue.put(
-                                                ('status', day, '🔄 En cours...', f'{percent}%')
-                                            )
-                                            last_percent = percent
-                                            last_update = current_time
-                            except (ValueError, IndexError):
-                                pass
-            
-            # Attendre la fin
-            stdout, stderr = process.communicate(timeout=config.process_timeout)
-            
-            # Vérifier le résultat
-            if process.returncode == 0:
-                expected = video_path.with_suffix('.png')
-                if expected.exists():
-                    if expected != output_path:
-                        shutil.move(str(expected), str(output_path))
-                    
-                    self.parent.panorama_files[day] = output_path
-                    success = True
-            
-            if not success and stderr:
-                self.parent.update_queue.put(('error', day, stderr[:200]))
-        
-        except subprocess.TimeoutExpired:
-            self.parent.update_queue.put(('error', day, f"Timeout après {config.process_timeout}s"))
-            try:
-                process.kill()
-            except:
-                pass
+                eta_str = self._format_time(self._estimate_remaining_time())
+                self.parent.update_queue.put(('status_bar', f"En cours: {day} {percent}% | ETA: {eta_str}"))
         
-        except FileNotFoundError as e:
-            self.parent.update_queue.put(('error', day, f"Fichier non trouvé: {e.filename}"))
-        
-        except PermissionError as e:
-            self.parent.update_queue.put(('error', day, f"Permission refusée: {e}"))
+        success, stats, error = run_panorama(
+            video_path, output_path, stitch_params, on_progress, parts, self.cancel_event
+        )
+        if self.eta is not None:
+            self.eta.finish(day, success)
+        if self.metrics is not None:
+            status = 'done' if success else 'cancelled' if self.cancel_event.is_set() else 'failed'
+            self.metrics.add_video(
+                video_path.parent.name, day, status,
+                time.time() - self._job_start_times[day], stats, error
+            )
         
-        except Exception as e:
-            self.parent.update_queue.put(('error', day, f"{type(e).__name__}: {str(e)[:80]}"))
+        if success:
+            self.parent.panorama_files[day] = output_path
+            
+            # Mémoriser l'empreinte pour les prochains traitements
+            self._manifest_for(video_path).record(
+                f"day:{day}", video_fingerprint(video_path, stitch_params), output_path
+            )
+        elif self.cancel_event.is_set():
+            # Statut final posé par run_parallel_processing
+            return False
+        elif error:
+            self.parent.update_queue.put(('error', day, error))
         
         # Mise à jour finale
         if success: